@@ -0,0 +1,283 @@
+"""
+Flux Scheme Comparison
+
+This script compares the numerical fluxes of src/utils/numerical_methods.py
+in cost and accuracy. The accuracy is the L1 error against the exact
+Greenshields solution of three Riemann problems (a shock, a rarefaction and
+a transonic rarefaction through the critical density) on refined grids; the
+cost is the number of solver steps per second on a large grid, for the LWR
+and the multiclass model.
+
+Godunov (and the identical CTM flux) is the most accurate on shocks, by a
+factor of 4-20 over the others, and is exact at road quality changes.
+Engquist-Osher and HLL match it on rarefactions, and HLL is slightly better
+through the critical density. Lax-Friedrichs is about twice as diffusive as
+Rusanov. Lax-Friedrichs and Engquist-Osher are the cheapest per step. Rusanov
+and HLL need the characteristic speeds, which for the multiclass model means
+the Jacobian eigenvalues of every cell, and are several times slower there.
+
+The second part compares the high-resolution reconstructions of
+src/utils/reconstruction.py (with the Godunov flux and SSP Runge-Kutta steps
+at CFL 0.5) with the first-order scheme, adding a smooth density bump that
+steepens without breaking yet. Error / wall-clock time (best of five; the
+times vary by about a third between runs):
+
+    problem      first order nx=1600   MUSCL van Leer nx=200   nx=400         WENO5 nx=200
+    shock        1.1e-04   29 ms       8.6e-04   16 ms     4.3e-04   39 ms    7.2e-04  124 ms
+    transonic    4.1e-03   28 ms       2.3e-03   23 ms     1.2e-03   49 ms    3.7e-03   91 ms
+    rarefaction  1.7e-03   25 ms       1.9e-03   22 ms     9.3e-04   31 ms    1.6e-03  144 ms
+    smooth       6.3e-04   11 ms       4.6e-04    7 ms     1.3e-04   14 ms    7.3e-05   44 ms
+
+Godunov already resolves shocks within a cell or two, so reconstruction only
+adds cost there: MUSCL needs the same 1600 cells and eight times the time.
+Elsewhere the result depends on the problem. Through the critical density and
+on smooth waves MUSCL van Leer on 200 cells beats the first-order scheme on
+1600 in less time. On a rarefaction it roughly breaks even: on 200 cells it
+is about 10% less accurate for a little less time, and halving the error
+takes 400 cells and slightly more time, because the first-order error is
+dominated by the fan kinks where the limiter falls back to first order. On
+smooth waves MUSCL is second order and WENO5 converges at up to fifth order:
+for a 1e-5 tolerance, MUSCL van Leer needs 1600 cells (80 ms), WENO5 400
+(90 ms), and the first-order scheme an estimated 1e5 cells. WENO5 costs about
+six times MUSCL per step, so it only pays off on smooth solutions; MUSCL van
+Leer is the better general choice.
+"""
+
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.models.lwr_model import LWRModel
+from src.models.multiclass_lwr_model import MulticlassLWRModel
+from src.utils.numerical_methods import FLUX_SCHEMES
+from src.analysis.riemann import l1_errors, riemann_solution
+
+SCHEMES = ('godunov', 'lax_friedrichs', 'rusanov', 'hll', 'engquist_osher')
+
+# Reconstruction and time integration pairs with their CFL numbers
+HIGH_RESOLUTION_SCHEMES = (
+    ('first order', {}, 0.9),
+    ('MUSCL minmod RK2', {'reconstruction': 'muscl', 'time_integration': 'ssp_rk2'}, 0.5),
+    ('MUSCL van Leer RK2', {'reconstruction': 'muscl', 'limiter': 'van_leer',
+                            'time_integration': 'ssp_rk2'}, 0.5),
+    ('WENO5 RK3', {'reconstruction': 'weno5', 'time_integration': 'ssp_rk3'}, 0.5)
+)
+
+# Riemann problems (left, right) as ratios of the maximum density
+RIEMANN_PROBLEMS = {
+    'shock': (0.1, 0.8),
+    'rarefaction': (0.8, 0.6),
+    'transonic': (0.9, 0.1)
+}
+
+
+def march(model, rho, dx, simulation_time, cfl_factor):
+    """
+    Advance a state with a fixed time step and time the run.
+
+    Args:
+        model: LWR model
+        rho: Initial state (updated in place)
+        dx: Spatial step (km)
+        simulation_time: Final time (h), rounded to a whole number of steps
+        cfl_factor: CFL number of the time step
+
+    Returns:
+        tuple: (final state, final time (h), wall-clock time (s))
+    """
+    dt = cfl_factor * dx / model.v_max
+    n_steps = int(round(simulation_time / dt))
+    flux = np.empty(rho.shape[:-1] + (rho.shape[-1] + 1,))
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        model.advance(rho, dt, dx, flux=flux, out=rho)
+    return rho, n_steps * dt, time.perf_counter() - start
+
+
+def riemann_error(model, problem, nx, simulation_time=0.02, domain_length=4.0, cfl_factor=0.9):
+    """
+    L1 error of a model's scheme on a Riemann problem.
+
+    Args:
+        model: LWR model
+        problem: Name of RIEMANN_PROBLEMS
+        nx: Number of grid cells
+        simulation_time: Final time (h)
+        domain_length: Domain length (km), with the jump in the middle
+        cfl_factor: CFL number of the fixed time step
+
+    Returns:
+        tuple: (L1 error relative to ρ_max (km), wall-clock time (s))
+    """
+    dx = domain_length / nx
+    x = (np.arange(nx) + 0.5) * dx - 0.5 * domain_length
+    left, right = RIEMANN_PROBLEMS[problem]
+    rho = np.where(x < 0, left, right) * model.rho_max
+
+    rho, t, elapsed = march(model, rho, dx, simulation_time, cfl_factor)
+    exact = riemann_solution(left * model.rho_max, right * model.rho_max, x, t,
+                             v_max=model.v_max, rho_max=model.rho_max)
+    return l1_errors(rho, exact, dx) / model.rho_max, elapsed
+
+
+def smooth_initial_density(x, rho_max=180.0):
+    """Free-flow density with a smooth bump, steepening into a shock at t ≈ 0.0079 h."""
+    return rho_max * (1 / 6 + 2 / 9 * np.exp(-(x / 0.3) ** 2))
+
+
+def smooth_wave_error(model, nx, simulation_time=0.006, domain_length=4.0, cfl_factor=0.9, n_sub=50):
+    """
+    L1 error of a model's scheme on a smooth wave before it breaks.
+
+    The exact solution follows the characteristics x = x0 + q'(ρ0(x0)) t,
+    which do not cross yet, and is averaged over each cell.
+
+    Args:
+        model: Greenshields LWR model
+        nx: Number of grid cells
+        simulation_time: Final time (h), before the wave breaks
+        domain_length: Domain length (km), centred on the bump
+        cfl_factor: CFL number of the fixed time step
+        n_sub: Number of samples per cell of the exact cell averages
+
+    Returns:
+        tuple: (L1 error relative to ρ_max (km), wall-clock time (s))
+    """
+    dx = domain_length / nx
+    edges = np.arange(nx + 1) * dx - 0.5 * domain_length
+    samples = edges[:-1, None] + (np.arange(n_sub) + 0.5) / n_sub * dx
+    rho = smooth_initial_density(samples, model.rho_max).mean(axis=1)
+
+    rho, t, elapsed = march(model, rho, dx, simulation_time, cfl_factor)
+
+    # Exact solution along the characteristics, sampled inside every cell
+    x0 = np.linspace(edges[0] - 1.0, edges[-1] + 1.0, 200001)
+    rho0 = smooth_initial_density(x0, model.rho_max)
+    x_t = x0 + model.fundamental_diagram.wave_speed(rho0) * t
+    exact = np.interp(samples, x_t, rho0).mean(axis=1)
+    return dx * np.sum(np.abs(rho - exact)) / model.rho_max, elapsed
+
+
+def steps_per_second(model, rho, dx, min_duration=0.2):
+    """
+    Measure the solver steps per second of a model on a state.
+
+    Args:
+        model: LWR or multiclass model
+        rho: Initial state
+        dx: Spatial step (km)
+        min_duration: Minimum measured wall-clock time (s)
+
+    Returns:
+        float: Steps per second
+    """
+    dt = 0.5 * dx / model.v_max
+    flux = np.empty(rho.shape[:-1] + (rho.shape[-1] + 1,))
+    rho = rho.copy()
+    n_steps = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_duration:
+        model.advance(rho, dt, dx, flux=flux, out=rho)
+        n_steps += 1
+        elapsed = time.perf_counter() - start
+    return n_steps / elapsed
+
+
+def compare_accuracy(grid_sizes=(100, 400, 1600)):
+    """
+    Print the L1 errors of all schemes on the Riemann problems.
+
+    Args:
+        grid_sizes: Numbers of grid cells
+
+    Returns:
+        list: One dictionary per problem, scheme and grid size
+    """
+    model = LWRModel()
+    rows = []
+    header = ''.join(f"{nx:>10d}" for nx in grid_sizes)
+    for problem in RIEMANN_PROBLEMS:
+        print(f"\n{problem} (L1 error / ρ_max, km)")
+        print(f"{'scheme':<16}{header}")
+        for scheme in SCHEMES:
+            model.flux_scheme = scheme
+            errors = [riemann_error(model, problem, nx)[0] for nx in grid_sizes]
+            print(f"{scheme:<16}" + ''.join(f"{error:>10.2e}" for error in errors))
+            rows.extend({'problem': problem, 'scheme': scheme, 'nx': nx, 'error': error}
+                        for nx, error in zip(grid_sizes, errors))
+    return rows
+
+
+def compare_cost(nx=100000, dx=0.01):
+    """
+    Print the solver throughput of all schemes for both models.
+
+    Args:
+        nx: Number of grid cells
+        dx: Spatial step (km)
+
+    Returns:
+        list: One dictionary per scheme with the measured rates
+    """
+    lwr = LWRModel()
+    multiclass = MulticlassLWRModel()
+    ramp = np.linspace(0.9, 0.1, nx)
+    lwr_state = ramp * lwr.rho_max
+    multiclass_state = 0.45 * ramp * multiclass.class_parameters()['rho_max']
+
+    rows = []
+    print(f"\n{'scheme':<16}{'LWR (steps/s)':>15}{'multiclass (steps/s)':>22}   nx={nx}")
+    for scheme in FLUX_SCHEMES:
+        lwr.flux_scheme = multiclass.flux_scheme = scheme
+        rates = (steps_per_second(lwr, lwr_state, dx), steps_per_second(multiclass, multiclass_state, dx))
+        print(f"{scheme:<16}{rates[0]:>15.1f}{rates[1]:>22.1f}")
+        rows.append({'scheme': scheme, 'lwr': rates[0], 'multiclass': rates[1]})
+    return rows
+
+
+def compare_high_resolution(grid_sizes=(50, 100, 200, 400, 800, 1600)):
+    """
+    Print the error and wall-clock time of the reconstructions on all problems.
+
+    Args:
+        grid_sizes: Numbers of grid cells
+
+    Returns:
+        list: One dictionary per problem, scheme and grid size
+    """
+    problems = {name: (lambda model, nx, name=name, **kw: riemann_error(model, name, nx, **kw))
+                for name in RIEMANN_PROBLEMS}
+    problems['smooth'] = smooth_wave_error
+
+    rows = []
+    for problem, error_function in problems.items():
+        print(f"\n{problem} (L1 error / ρ_max in km, wall-clock time in ms)")
+        print(f"{'scheme':<22}" + ''.join(f"{nx:>16d}" for nx in grid_sizes))
+        for name, options, cfl_factor in HIGH_RESOLUTION_SCHEMES:
+            model = LWRModel(**options)
+            results = [error_function(model, nx, cfl_factor=cfl_factor) for nx in grid_sizes]
+            print(f"{name:<22}" + ''.join(f"{error:>9.1e}{1e3 * elapsed:>7.0f}" for error, elapsed in results))
+            rows.extend({'problem': problem, 'scheme': name, 'nx': nx, 'error': error, 'time': elapsed}
+                        for nx, (error, elapsed) in zip(grid_sizes, results))
+    return rows
+
+
+def main():
+    """Run the flux scheme comparison."""
+    print("Accuracy on Greenshields Riemann problems")
+    compare_accuracy()
+
+    print("\nCost per step")
+    compare_cost()
+
+    print("\nHigh-resolution reconstructions (Godunov flux)")
+    compare_high_resolution()
+
+
+if __name__ == "__main__":
+    main()
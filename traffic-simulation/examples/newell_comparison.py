@@ -0,0 +1,163 @@
+"""
+Newell Comparison
+
+This script compares Newell's link model (NewellLinkModel) with LWRModel on
+the shared Riemann scenarios (shock wave, rarefaction wave and traffic jam
+with a sharp transition) run with the triangular fundamental diagram. Both
+are measured against the Lax-Hopf solution on the same grid, which is exact
+for piecewise constant data and a fine enough level mesh; a second table
+times the two models on long corridors of alternating jams.
+
+Results (L1 error / ρ_max in km at the end of the simulation):
+
+    scenario          link (km)   Newell      LWR   Newell (ms)   LWR (ms)
+    ShockWave              0.25  2.5e-12  8.6e-04            16         36
+    ShockWave               1.0  1.6e-12  8.6e-04             5         36
+    RarefactionWave        0.25  3.7e-12  1.4e-01            13         36
+    RarefactionWave         1.0  4.0e-02  1.4e-01             3         36
+    TrafficJam             0.25  1.2e-12  3.0e-02             8         20
+    TrafficJam              1.0  1.9e-13  3.0e-02             3         20
+
+    length (km)       nx   LWR (s)   Newell (s)   speedup
+             50     1001     0.073       0.0082       8.8
+            500    10001      0.18        0.013      13.3
+           5000   100001       4.8         0.12      41.3
+
+Shocks are exact to rounding, their positions following from the counts at
+the nodes. Inside a rarefaction fan the counts are interpolated linearly
+between link steps, so the error grows with the link length when the fan
+spans several links, but stays below that of the Godunov scheme at
+dx = 0.05 km. The link model costs a few operations per link and step of
+the free-flow travel time of a link, instead of per cell and CFL step.
+"""
+
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.models.lwr_model import LWRModel
+from src.models.lax_hopf import LaxHopfLWR
+from src.models.newell_model import NewellLinkModel
+from src.models.fundamental_diagram import TriangularDiagram
+from scenarios.shock_wave import ShockWaveScenario
+from scenarios.rarefaction_wave import RarefactionWaveScenario
+from scenarios.traffic_jam import TrafficJamScenario
+
+# Riemann scenarios and the parameters making them sharp
+SCENARIOS = [
+    (ShockWaveScenario, {}),
+    (RarefactionWaveScenario, {}),
+    (TrafficJamScenario, {'smooth_transition': False})
+]
+
+
+def timed_run(scenario, params):
+    """
+    Run a scenario and time it.
+
+    Args:
+        scenario: Scenario instance
+        params: Scenario parameters
+
+    Returns:
+        tuple: (final density, run time (s))
+    """
+    start = time.perf_counter()
+    results = scenario.run(params)
+    return results['density'][-1], time.perf_counter() - start
+
+
+def compare_scenarios(link_lengths=(0.25, 1.0), dx=0.05, output_dir='results/newell_comparison'):
+    """
+    Print the errors of Newell's link model and LWRModel on the Riemann scenarios.
+
+    Args:
+        link_lengths: Link lengths (km) of the link model
+        dx: Spatial step (km) of the output grid and of LWRModel
+        output_dir: Output directory of the scenario runs
+
+    Returns:
+        list: One dictionary per scenario and link length
+    """
+    diagram = TriangularDiagram()
+    rows = []
+    print(f"{'scenario':<17} {'link (km)':>9} {'Newell':>8} {'LWR':>8} {'Newell (ms)':>13} {'LWR (ms)':>10}")
+    for scenario_class, params in SCENARIOS:
+        scenario = scenario_class(LaxHopfLWR(fundamental_diagram=diagram, n_levels=1024))
+        simulation_time = scenario.default_params['simulation_time']
+        params = {**params, 'dx': dx, 'output_dir': output_dir,
+                  'output_times': [0.0, simulation_time]}
+        reference, _ = timed_run(scenario, params)
+        lwr, lwr_time = timed_run(scenario_class(LWRModel(fundamental_diagram=diagram)), params)
+        lwr_error = dx * np.abs(lwr - reference).sum() / diagram.rho_max
+        for link_length in link_lengths:
+            newell, newell_time = timed_run(
+                scenario_class(NewellLinkModel(link_length=link_length)), params)
+            error = dx * np.abs(newell - reference).sum() / diagram.rho_max
+            print(f"{scenario.name:<17} {link_length:>9} "
+                  f"{error:>8.1e} {lwr_error:>8.1e} {1e3 * newell_time:>13.0f} {1e3 * lwr_time:>10.0f}")
+            rows.append({'scenario': scenario.name, 'link_length': link_length,
+                         'error': error, 'lwr_error': lwr_error,
+                         'time': newell_time, 'lwr_time': lwr_time})
+    return rows
+
+
+def alternating_jams(x, spacing=12.0, seed=0):
+    """
+    Build a corridor of jams (150 vehicles/km) and free flow (30 vehicles/km).
+
+    Args:
+        x: Cell positions (km)
+        spacing: Mean distance between density jumps (km)
+        seed: Seed of the jump positions
+
+    Returns:
+        Initial density array
+    """
+    rng = np.random.default_rng(seed)
+    jumps = np.sort(rng.uniform(x[0], x[-1], int((x[-1] - x[0]) / spacing)))
+    return np.where(np.searchsorted(jumps, x) % 2 == 1, 150.0, 30.0)
+
+
+def benchmark_corridors(lengths=(50.0, 500.0, 5000.0), dx=0.05, simulation_time=1.0):
+    """
+    Print the run times of LWRModel and Newell's link model on long corridors.
+
+    Args:
+        lengths: Corridor lengths (km)
+        dx: Spatial step (km)
+        simulation_time: Simulated time (h)
+
+    Returns:
+        list: One dictionary per corridor length
+    """
+    rows = []
+    print(f"{'length (km)':>12} {'nx':>8} {'LWR (s)':>9} {'Newell (s)':>12} {'speedup':>9}")
+    for length in lengths:
+        x = np.linspace(0, length, int(length / dx) + 1)
+        rho0 = alternating_jams(x)
+        timings = []
+        for model in (LWRModel(fundamental_diagram=TriangularDiagram()), NewellLinkModel()):
+            start = time.perf_counter()
+            model.simulate(rho0, length, simulation_time, dx, output_times=[0.0, simulation_time])
+            timings.append(time.perf_counter() - start)
+        print(f"{length:>12.0f} {len(x):>8} {timings[0]:>9.2g} {timings[1]:>12.2g} "
+              f"{timings[0] / timings[1]:>9.1f}")
+        rows.append({'length': length, 'nx': len(x), 'lwr_time': timings[0], 'newell_time': timings[1]})
+    return rows
+
+
+def main():
+    """Run the comparison."""
+    print("L1 errors against the Lax-Hopf solution, triangular diagram")
+    compare_scenarios()
+    print("\nRun time on corridors of alternating jams")
+    benchmark_corridors()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Precision Comparison
+
+This script compares float32 and float64 runs of the built-in scenarios. For
+each scenario it reports the mass-balance (conservation) error of both
+precisions and the largest float32 deviation from the float64 solution.
+
+The conservation error is the relative mismatch between the change of the
+total number of vehicles and the net boundary inflow,
+
+    |M(T) - M(0) - sum_n dt (F_in^n - F_out^n)| / M(0),
+
+with M = dx * sum(rho) and the boundary fluxes evaluated in float64 from the
+stored state. A conservative scheme has zero error in exact arithmetic, so
+the value measures the rounding of the solver state alone.
+
+Results with the default scenario parameters and dt = 0.9 dx / v_max:
+
+    scenario                  model        float64     float32   max |Δρ|/ρ_max
+    RarefactionWave           lwr          7.8e-17     1.1e-08     2.8e-07
+    ShockWave                 lwr          7.1e-15     5.7e-08     1.4e-08
+    TrafficJam                lwr          2.7e-16     9.7e-08     5.0e-07
+    RedLight                  lwr          2.3e-16     1.3e-07     2.1e-08
+    RarefactionWave           multiclass   3.4e-17     2.7e-08     2.8e-06
+    ShockWave                 multiclass   2.7e-16     1.0e-07     6.4e-06
+    TrafficJam                multiclass   1.7e-16     1.8e-08     4.7e-07
+    RedLight                  multiclass   5.3e-17     8.5e-08     1.9e-08
+    MulticlassRedLight        multiclass   5.3e-17     8.5e-08     1.9e-08
+    DegradedRoad              multiclass   3.7e-17     1.6e-08     4.0e-07
+    GapFilling                multiclass   3.3e-16     7.6e-08     7.5e-07
+
+float32 keeps the conservation error at most about 1e-7 of the total mass
+and the densities within a few 1e-6 of ρ_max, well below the discretization
+error of the first-order scheme, while halving the memory of the state and
+the stored results.
+"""
+
+import sys
+import numpy as np
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.models.lwr_model import LWRModel
+from src.models.multiclass_lwr_model import MulticlassLWRModel
+from scenarios.rarefaction_wave import RarefactionWaveScenario
+from scenarios.shock_wave import ShockWaveScenario
+from scenarios.traffic_jam import TrafficJamScenario
+from scenarios.red_light import RedLightScenario
+from scenarios.multiclass_scenarios import (
+    MulticlassRedLightScenario, DegradedRoadScenario, GapFillingScenario
+)
+
+# Scenarios and the models they support
+SCENARIOS = [
+    (RarefactionWaveScenario, 'lwr'),
+    (ShockWaveScenario, 'lwr'),
+    (TrafficJamScenario, 'lwr'),
+    (RedLightScenario, 'lwr'),
+    (RarefactionWaveScenario, 'multiclass'),
+    (ShockWaveScenario, 'multiclass'),
+    (TrafficJamScenario, 'multiclass'),
+    (RedLightScenario, 'multiclass'),
+    (MulticlassRedLightScenario, 'multiclass'),
+    (DegradedRoadScenario, 'multiclass'),
+    (GapFillingScenario, 'multiclass'),
+]
+
+MODELS = {'lwr': LWRModel, 'multiclass': MulticlassLWRModel}
+
+
+def conservation_run(scenario, dtype, cfl_factor=0.9):
+    """
+    Run a scenario step by step and track its mass balance.
+
+    Args:
+        scenario: Scenario instance
+        dtype: Floating point precision of the run
+        cfl_factor: Safety factor of the fixed time step
+
+    Returns:
+        tuple: (relative conservation error, final state as float64)
+    """
+    # A fixed step bounded by the fastest free-flow speed; with the default
+    # output grid every yielded frame is then exactly one step apart
+    dx = scenario.default_params['dx']
+    dt = cfl_factor * dx / scenario.model.v_max
+    quality = scenario.model.road_quality_profile(scenario.get_road_quality(), scenario.get_grid())
+
+    initial_mass = None
+    boundary_inflow = 0.0
+    for _, state in scenario.iter_run({'dt': dt, 'dtype': dtype}):
+        rho = np.asarray(state, dtype=np.float64)
+        mass = dx * np.sum(rho)
+        if initial_mass is None:
+            initial_mass = mass
+        else:
+            boundary_inflow += dt * net_inflow
+
+        # Net inflow of the next step through the first and last interfaces
+        flux = scenario.model.interface_flux(rho, quality)
+        net_inflow = float(np.sum(flux[..., 0] - flux[..., -1]))
+
+    error = abs(mass - initial_mass - boundary_inflow) / initial_mass
+    return error, rho
+
+
+def compare_precisions():
+    """
+    Compare float64 and float32 runs of all built-in scenarios.
+
+    Returns:
+        list: One dictionary per scenario and model
+    """
+    rows = []
+    print(f"{'scenario':<25} {'model':<12} {'float64':>8} {'float32':>11} {'max |Δρ|/ρ_max':>15}")
+    for scenario_class, model_name in SCENARIOS:
+        errors = {}
+        states = {}
+        for dtype in ('float64', 'float32'):
+            scenario = scenario_class(MODELS[model_name]())
+            errors[dtype], states[dtype] = conservation_run(scenario, dtype)
+
+        deviation = np.max(np.abs(states['float32'] - states['float64'])) / scenario.model.rho_max
+        print(f"{scenario.name:<25} {model_name:<12} {errors['float64']:>8.1e} "
+              f"{errors['float32']:>11.1e} {deviation:>15.1e}")
+        rows.append({
+            'scenario': scenario.name,
+            'model': model_name,
+            'error_float64': errors['float64'],
+            'error_float32': errors['float32'],
+            'deviation': deviation
+        })
+    return rows
+
+
+def main():
+    """Run the precision comparison."""
+    print("Conservation error of float64 and float32 runs")
+    compare_precisions()
+
+
+if __name__ == "__main__":
+    main()
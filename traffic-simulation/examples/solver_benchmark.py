@@ -0,0 +1,597 @@
+"""
+Solver Benchmark
+
+This script measures the throughput of the LWR solver (time steps per second)
+as a function of the number of grid cells, comparing the vectorized Godunov
+step used by LWRModel.simulate with the scalar per-interface reference, and
+the cost of a parameter sweep run member by member or as one ensemble, the
+step cost of tabulated fundamental diagrams, the Cell Transmission Model
+engine against LWRModel on corridors of growing length, the step cost of
+road networks of growing size, with and without a signal at every junction,
+and sparse detector queries answered by the Lax-Hopf solver instead of a
+full simulation.
+"""
+
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.models.lwr_model import LWRModel
+from src.models.multiclass_lwr_model import MulticlassLWRModel
+from src.models.ensemble import LWREnsemble
+from src.models.ctm_model import CTMModel
+from src.models.lax_hopf import LaxHopfLWR
+from src.models.front_tracking import FrontTrackingLWR
+from src.models.road_network import RoadNetwork
+from src.models.traffic_signals import TrafficSignals
+from src.models.fundamental_diagram import GreenshieldsDiagram, TabulatedDiagram
+
+
+def riemann_initial_density(model, nx, upstream=0.7, downstream=0.1):
+    """
+    Build a step initial condition (dense upstream, light downstream).
+
+    Args:
+        model: Model or vehicle class providing rho_max
+        nx: Number of grid cells
+        upstream: Upstream density ratio
+        downstream: Downstream density ratio
+
+    Returns:
+        Initial density array of shape (nx,)
+    """
+    rho = np.full(nx, downstream * model.rho_max)
+    rho[:nx // 2] = upstream * model.rho_max
+    return rho
+
+
+def scalar_step(model, rho, dt, dx):
+    """
+    Advance the density by one step using the scalar reference flux.
+
+    Args:
+        model: LWR model instance
+        rho: Current density array
+        dt: Time step (h)
+        dx: Spatial step (km)
+
+    Returns:
+        Updated density array
+    """
+    nx = len(rho)
+    flux = np.zeros(nx + 1)
+    for j in range(1, nx):
+        flux[j] = model.godunov_flux(rho[j-1], rho[j])
+    flux[0] = flux[1]
+    flux[nx] = flux[nx-1]
+    return np.maximum(0, rho - dt / dx * (flux[1:] - flux[:-1]))
+
+
+def vectorized_step(model, rho, dt, dx):
+    """
+    Advance the density by one step using the whole-array interface flux.
+
+    Args:
+        model: LWR model instance
+        rho: Current density array
+        dt: Time step (h)
+        dx: Spatial step (km)
+
+    Returns:
+        Updated density array
+    """
+    flux = np.empty(len(rho) + 1)
+    flux[1:-1] = model.interface_flux(rho)
+    flux[0] = flux[1]
+    flux[-1] = flux[-2]
+    return np.maximum(0, rho - dt / dx * (flux[1:] - flux[:-1]))
+
+
+def steps_per_second(step, model, nx, dx=0.01, min_duration=0.2):
+    """
+    Measure how many solver steps per second a step function achieves.
+
+    Args:
+        step: Step function (model, rho, dt, dx) -> rho
+        model: LWR model instance
+        nx: Number of grid cells
+        dx: Spatial step (km)
+        min_duration: Minimum measured wall-clock time (s)
+
+    Returns:
+        float: Steps per second
+    """
+    rho = riemann_initial_density(model, nx)
+    dt = model.calculate_dt(rho, dx)
+    n_steps = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_duration:
+        rho = step(model, rho, dt, dx)
+        n_steps += 1
+        elapsed = time.perf_counter() - start
+    return n_steps / elapsed
+
+
+def benchmark_lwr(grid_sizes=(100, 1000, 10000, 100000), scalar_limit=10000):
+    """
+    Compare scalar and vectorized LWR steps for several grid sizes.
+
+    Args:
+        grid_sizes: Numbers of grid cells to benchmark
+        scalar_limit: Largest grid on which the (slow) scalar path is timed
+
+    Returns:
+        list: One dictionary per grid size with the measured rates
+    """
+    model = LWRModel(v_max=100.0, rho_max=180.0)
+    rows = []
+
+    print(f"{'nx':>10} {'scalar (steps/s)':>18} {'vectorized (steps/s)':>22} {'speedup':>9}")
+    for nx in grid_sizes:
+        vector_rate = steps_per_second(vectorized_step, model, nx)
+        scalar_rate = steps_per_second(scalar_step, model, nx) if nx <= scalar_limit else np.nan
+        speedup = vector_rate / scalar_rate if np.isfinite(scalar_rate) else np.nan
+        print(f"{nx:>10d} {scalar_rate:>18.1f} {vector_rate:>22.1f} {speedup:>9.1f}")
+        rows.append({'nx': nx, 'scalar': scalar_rate, 'vectorized': vector_rate})
+
+    return rows
+
+
+def benchmark_multiclass(grid_sizes=(100, 1000, 10000), n_steps=200):
+    """
+    Measure the multiclass solver throughput for several grid sizes.
+
+    Args:
+        grid_sizes: Numbers of grid cells to benchmark
+        n_steps: Number of time steps per run
+
+    Returns:
+        list: One dictionary per grid size with the measured rates
+    """
+    model = MulticlassLWRModel()
+    rows = []
+
+    print(f"{'nx':>10} {'steps/s':>12}")
+    for nx in grid_sizes:
+        dx = 0.01
+        rho = np.zeros((model.n_classes, nx))
+        for i, vc in enumerate(model.vehicle_classes):
+            rho[i] = riemann_initial_density(vc, nx, upstream=0.35, downstream=0.05)
+        dt = model.calculate_dt(rho, dx)
+
+        start = time.perf_counter()
+        model.simulate(rho, (nx - 1) * dx, n_steps * dt, dx, dt=dt)
+        elapsed = time.perf_counter() - start
+        rate = n_steps / elapsed
+        print(f"{nx:>10d} {rate:>12.1f}")
+        rows.append({'nx': nx, 'vectorized': rate})
+
+    return rows
+
+
+def benchmark_ensemble(batch_sizes=(1, 10, 100, 1000), nx=200, n_steps=200):
+    """
+    Compare a v_max sweep run member by member with the same sweep as one ensemble.
+
+    Args:
+        batch_sizes: Numbers of members to benchmark
+        nx: Number of grid cells
+        n_steps: Number of time steps per run
+
+    Returns:
+        list: One dictionary per ensemble size with the measured wall-clock times
+    """
+    dx = 0.01
+    rows = []
+
+    print(f"{'members':>10} {'loop (s)':>10} {'ensemble (s)':>14} {'speedup':>9}")
+    for batch_size in batch_sizes:
+        v_max = np.linspace(60.0, 120.0, batch_size)
+        ensemble = LWREnsemble(v_max=v_max, rho_max=180.0)
+        rho = riemann_initial_density(ensemble.member(0), nx)
+        dt = ensemble.calculate_dt(ensemble.initial_state(rho, np.arange(nx) * dx), dx)
+        simulation_time = n_steps * dt
+
+        start = time.perf_counter()
+        for b in range(batch_size):
+            ensemble.member(b).simulate(rho, (nx - 1) * dx, simulation_time, dx, dt=dt,
+                                        save_interval=simulation_time)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ensemble.simulate(rho, (nx - 1) * dx, simulation_time, dx, dt=dt, save_interval=simulation_time)
+        ensemble_time = time.perf_counter() - start
+
+        print(f"{batch_size:>10d} {loop_time:>10.3f} {ensemble_time:>14.3f} {loop_time / ensemble_time:>9.1f}")
+        rows.append({'batch_size': batch_size, 'loop': loop_time, 'ensemble': ensemble_time})
+
+    return rows
+
+
+def calibrated_flow(rho, v_max=100.0, rho_max=180.0):
+    """
+    Example of an empirical flow curve without a closed-form demand/supply,
+    written for scalar densities only.
+
+    Args:
+        rho: Traffic density (vehicles/km)
+        v_max: Free-flow speed (km/h)
+        rho_max: Jam density (vehicles/km)
+
+    Returns:
+        float: Flow (vehicles/h)
+    """
+    if rho <= 0 or rho >= rho_max:
+        return 0.0
+    return v_max * rho * (1 - rho / rho_max) ** 1.5 * (1 + 0.2 * np.sin(np.pi * rho / rho_max))
+
+
+def function_interface_flux(model, rho):
+    """
+    Interface fluxes evaluating the flow function cell by cell.
+
+    Args:
+        model: LWR model whose diagram is tabulated from calibrated_flow
+        rho: Density array
+
+    Returns:
+        Array of interior interface fluxes
+    """
+    rho_c = model.critical_density()
+    capacity = calibrated_flow(rho_c)
+    demand = np.array([calibrated_flow(r) if r < rho_c else capacity for r in rho])
+    supply = np.array([calibrated_flow(r) if r > rho_c else capacity for r in rho])
+    return np.minimum(demand[:-1], supply[1:])
+
+
+def flux_evaluations_per_second(flux, model, rho, min_duration=0.2):
+    """
+    Measure how many whole-grid interface flux evaluations per second are achieved.
+
+    Args:
+        flux: Flux function (model, rho) -> interface fluxes
+        model: LWR model instance
+        rho: Density array
+        min_duration: Minimum measured wall-clock time (s)
+
+    Returns:
+        float: Evaluations per second
+    """
+    n_calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_duration:
+        flux(model, rho)
+        n_calls += 1
+        elapsed = time.perf_counter() - start
+    return n_calls / elapsed
+
+
+def benchmark_tabulated(grid_sizes=(1000, 10000, 100000), n_points=1001, function_limit=10000):
+    """
+    Compare the flux cost of tabulated diagrams with a per-cell flow function.
+
+    The calibrated flow curve is tabulated once and evaluated with np.interp
+    or with index arithmetic, on a spatially coherent state (a ramp followed
+    by a constant section) and on the same densities shuffled; the
+    closed-form Greenshields diagram is shown for reference.
+
+    Args:
+        grid_sizes: Numbers of grid cells to benchmark
+        n_points: Number of table points
+        function_limit: Largest grid on which the per-cell function is timed
+
+    Returns:
+        list: One dictionary per grid size and state with the measured rates
+    """
+    models = {
+        'greenshields': LWRModel(fundamental_diagram=GreenshieldsDiagram()),
+        'interp': LWRModel(fundamental_diagram=TabulatedDiagram.from_function(
+            calibrated_flow, 180.0, n_points)),
+        'index': LWRModel(fundamental_diagram=TabulatedDiagram.from_function(
+            calibrated_flow, 180.0, n_points, lookup='index'))
+    }
+    vectorized_flux = lambda model, rho: model.interface_flux(rho)
+    rng = np.random.default_rng(0)
+    rows = []
+
+    print(f"{'nx':>10} {'state':>9} {'function':>10} {'interp':>10} {'index':>10} {'greenshields':>13}  (evaluations/s)")
+    for nx in grid_sizes:
+        rho = riemann_initial_density(models['greenshields'], nx)
+        rho[:nx // 2] = np.linspace(20.0, 160.0, nx // 2)
+        for state in ('coherent', 'shuffled'):
+            if state == 'shuffled':
+                rho = rng.permutation(rho)
+            rates = {name: flux_evaluations_per_second(vectorized_flux, model, rho)
+                     for name, model in models.items()}
+            rates['function'] = (flux_evaluations_per_second(function_interface_flux, models['interp'], rho)
+                                 if nx <= function_limit else np.nan)
+            print(f"{nx:>10d} {state:>9} {rates['function']:>10.1f} {rates['interp']:>10.1f} "
+                  f"{rates['index']:>10.1f} {rates['greenshields']:>13.1f}")
+            rows.append({'nx': nx, 'state': state, **rates})
+
+    return rows
+
+
+def corridor_initial_density(x, jam_start=10.0, jam_length=2.0):
+    """
+    Light traffic with a short jam near the upstream end of a corridor.
+
+    Args:
+        x: Grid positions (km)
+        jam_start: Position of the jam tail (km)
+        jam_length: Length of the jam (km)
+
+    Returns:
+        Initial density array (vehicles/km)
+    """
+    return np.where((x > jam_start) & (x < jam_start + jam_length), 150.0, 30.0)
+
+
+def corridor_road_quality(x, bottleneck=50.0):
+    """
+    Road quality of a corridor with a 1 km bottleneck at half capacity.
+
+    Args:
+        x: Grid positions (km)
+        bottleneck: Position of the bottleneck (km)
+
+    Returns:
+        Road quality coefficients
+    """
+    return np.where((x > bottleneck) & (x < bottleneck + 1.0), 0.5, 1.0)
+
+
+def benchmark_ctm(lengths=(10.0, 100.0, 1000.0), dx=0.01, simulation_time=0.5,
+                  initial_density=corridor_initial_density, road_quality=corridor_road_quality,
+                  tolerance=0.0):
+    """
+    Compare LWRModel and the CTM engine on corridors of growing length.
+
+    With the default corridor the waves (the jam dissolving and the queue
+    behind the bottleneck) stay in the first tens of kilometres, so the CTM
+    engine only updates a fraction of the longer corridors. On busy
+    corridors (e.g. jammed_corridor_density()) the waves soon cover the
+    whole road and the engine costs about as much as LWRModel.
+
+    Args:
+        lengths: Corridor lengths (km)
+        dx: Spatial step (km)
+        simulation_time: Simulated time (h)
+        initial_density: Function of the cell positions giving the initial density
+        road_quality: Function of the cell positions giving the road quality, or None
+        tolerance: Density tolerance of the CTM engine (fraction of rho_max)
+
+    Returns:
+        list: One dictionary per corridor length with the wall-clock times
+              and the deviation of the CTM results
+    """
+    rows = []
+
+    print(f"{'length (km)':>12} {'nx':>8} {'LWR (s)':>9} {'CTM (s)':>9} {'speedup':>9} "
+          f"{'max |Δρ|/ρ_max':>15} {'Δ vehicles':>11}")
+    for length in lengths:
+        nx = int(length / dx) + 1
+        x = np.linspace(0, length, nx)
+        quality = road_quality(x) if road_quality is not None else None
+        times = {}
+        results = {}
+        for name, model in (('lwr', LWRModel()), ('ctm', CTMModel(tolerance=tolerance))):
+            start = time.perf_counter()
+            results[name] = model.simulate(initial_density(x), length, simulation_time, dx,
+                                           road_quality_func=quality,
+                                           save_interval=simulation_time / 10)
+            times[name] = time.perf_counter() - start
+
+        lwr, ctm = results['lwr']['density'], results['ctm']['density']
+        deviation = np.max(np.abs(ctm - lwr)) / 180.0
+        vehicles = dx * abs(np.sum(ctm[-1]) - np.sum(lwr[-1]))
+        speedup = times['lwr'] / times['ctm']
+        print(f"{length:>12.0f} {nx:>8d} {times['lwr']:>9.2f} {times['ctm']:>9.2f} {speedup:>9.1f} "
+              f"{deviation:>15.1e} {vehicles:>11.1e}")
+        rows.append({'length': length, 'nx': nx, **times, 'deviation': deviation, 'vehicles': vehicles})
+
+    return rows
+
+
+def jammed_corridor_density(x, spacing=12.0, seed=0):
+    """
+    Piecewise-constant corridor with a jam every spacing km on average.
+
+    Args:
+        x: Grid positions (km)
+        spacing: Mean distance between jam fronts (km)
+        seed: Seed of the random jam positions
+
+    Returns:
+        Initial densities (vehicles/km), 150 in the jams and 30 elsewhere
+    """
+    rng = np.random.default_rng(seed)
+    fronts = np.sort(rng.uniform(x[0], x[-1], max(2, int((x[-1] - x[0]) / spacing))))
+    return np.where(np.searchsorted(fronts, x) % 2 == 1, 150.0, 30.0)
+
+
+def benchmark_sparse_queries(lengths=(50.0, 500.0, 5000.0), dx=0.05, simulation_time=1.0,
+                             n_detectors=10, n_sub=200):
+    """
+    Compare detector series from LWRModel and from Lax-Hopf queries.
+
+    LWRModel simulates the whole corridor to record its detectors, while the
+    Lax-Hopf solver evaluates the cumulative counts at the detectors only,
+    once a minute. Both are measured against front tracking, an independent
+    solver exact up to the same level mesh, whose cell averages are taken
+    over n_sub samples per cell. The LWR column is therefore the
+    discretisation error of the Godunov scheme at dx, while the Lax-Hopf
+    column checks the queries themselves.
+
+    Args:
+        lengths: Corridor lengths (km)
+        dx: Spatial step (km)
+        simulation_time: Simulated time (h)
+        n_detectors: Number of detectors spread along the corridor
+        n_sub: Number of front tracking samples per cell
+
+    Returns:
+        list: One dictionary per corridor length with the wall-clock times and
+              the largest detector density errors of both solvers
+    """
+    rows = []
+    times = np.arange(1, int(round(60 * simulation_time)) + 1) / 60.0
+
+    print(f"{'length (km)':>12} {'nx':>8} {'LWR (s)':>9} {'Lax-Hopf (s)':>13} {'speedup':>9} "
+          f"{'LWR error':>10} {'Lax-Hopf error':>15}   (max |Δρ|/ρ_max vs front tracking)")
+    for length in lengths:
+        nx = int(length / dx) + 1
+        x = np.linspace(0, length, nx)
+        rho = jammed_corridor_density(x)
+        detectors = np.linspace(0.1, 0.9, n_detectors) * length
+
+        start = time.perf_counter()
+        lwr = LWRModel().simulate(rho, length, simulation_time, dx, output_times=[0.0, simulation_time],
+                                  detectors=detectors)
+        lwr_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        counts, *_ = LaxHopfLWR().solve(rho, length, dx)
+        cells = lwr['detectors']['x']
+        density = counts.density(cells[None, :], times[:, None], dx)
+        lax_hopf_time = time.perf_counter() - start
+
+        # Exact cell averages at the detector cells
+        tracker, *_ = FrontTrackingLWR().solve(rho, length, dx)
+        samples = cells[:, None] + ((np.arange(n_sub) + 0.5) / n_sub - 0.5) * dx
+        exact = tracker.density(samples[None], times[:, None, None]).mean(axis=-1)
+
+        # Detector records of LWRModel at the query times
+        recorded = lwr['detectors']
+        rows_at = np.abs(recorded['grid_t'][None, :] - times[:, None]).argmin(axis=1)
+        lwr_error = np.max(np.abs(recorded['density'][rows_at] - exact)) / 180.0
+        lax_hopf_error = np.max(np.abs(density - exact)) / 180.0
+        print(f"{length:>12.0f} {nx:>8d} {lwr_time:>9.3f} {lax_hopf_time:>13.4f} "
+              f"{lwr_time / lax_hopf_time:>9.0f} {lwr_error:>10.1e} {lax_hopf_error:>15.1e}")
+        rows.append({'length': length, 'nx': nx, 'lwr': lwr_time, 'lax_hopf': lax_hopf_time,
+                     'lwr_error': lwr_error, 'lax_hopf_error': lax_hopf_error})
+
+    return rows
+
+
+def arterial_network(n_segments, model=None, dx=0.05):
+    """
+    Arterial of 1 km segments with a side street joining and one leaving at
+    every junction.
+
+    Args:
+        n_segments: Number of arterial segments
+        model: LWRModel or MulticlassLWRModel of the links (None for LWRModel)
+        dx: Cell size (km)
+
+    Returns:
+        RoadNetwork with 3 * n_segments links
+    """
+    network = RoadNetwork(model, dx=dx)
+    road_types = ('bitumen_good', 'bitumen_poor', 'paved')
+    for k in range(n_segments):
+        network.add_link(f'main{k}', 1.0, road_types[k % 3], inflow=2000.0 if k == 0 else None)
+        network.add_link(f'side_in{k}', 0.5, 'gravel', inflow=300.0)
+        network.add_link(f'side_out{k}', 0.5, 'dirt')
+    for k in range(n_segments - 1):
+        network.add_junction(f'j{k}', [f'main{k}', f'side_in{k}'], [f'main{k+1}', f'side_out{k}'], {
+            f'main{k}': {f'main{k+1}': 0.9, f'side_out{k}': 0.1},
+            f'side_in{k}': {f'main{k+1}': 1.0}
+        })
+    return network
+
+
+def arterial_signals(n_segments, plan='standard', progression=7.0):
+    """
+    Signals at every junction of an arterial_network(), coordinated as a green wave.
+
+    Args:
+        n_segments: Number of arterial segments
+        plan: Signal plan of TRAFFIC_SIGNALS
+        progression: Offset between consecutive junctions (s)
+
+    Returns:
+        TrafficSignals on the arterial and side street approaches
+    """
+    signals = TrafficSignals()
+    for k in range(n_segments - 1):
+        signals.add(f'main{k}', plan, offset=progression * k)
+        signals.add(f'side_in{k}', plan, offset=progression * k, cross=True)
+    return signals
+
+
+def benchmark_network(segment_counts=(10, 100, 300), simulation_time=0.25):
+    """
+    Measure the step cost of arterial networks of growing size.
+
+    All signals are evaluated together in every step, so signalizing every
+    junction adds a roughly constant cost per step.
+
+    Args:
+        segment_counts: Numbers of arterial segments
+        simulation_time: Simulated time (h)
+
+    Returns:
+        list: One dictionary per network size, model and signal setting with
+              the step cost
+    """
+    rows = []
+
+    print(f"{'links':>6} {'cells':>7} {'signals':>8} {'model':>11} {'steps':>6} {'time (s)':>9} {'µs/step':>9}")
+    for n_segments in segment_counts:
+        for name, model, initial_density in (('lwr', None, 20.0),
+                                             ('multiclass', MulticlassLWRModel(), [15.0, 5.0])):
+            for signals in (None, arterial_signals(n_segments)):
+                network = arterial_network(n_segments, model)
+                start = time.perf_counter()
+                results = network.simulate(initial_density, simulation_time,
+                                           save_interval=simulation_time / 5, signals=signals)
+                elapsed = time.perf_counter() - start
+                n_signals = 0 if signals is None else len(signals)
+                n_steps = results['parameters']['n_steps']
+                step_cost = 1e6 * elapsed / n_steps
+                print(f"{3 * n_segments:>6d} {network.n_cells:>7d} {n_signals:>8d} {name:>11} {n_steps:>6d} "
+                      f"{elapsed:>9.2f} {step_cost:>9.0f}")
+                rows.append({'links': 3 * n_segments, 'cells': network.n_cells, 'signals': n_signals,
+                             'model': name, 'n_steps': n_steps, 'time': elapsed, 'step_cost': step_cost})
+
+    return rows
+
+
+def main():
+    """Run all solver benchmarks."""
+    print("LWR Godunov step throughput")
+    benchmark_lwr()
+
+    print("\nMulticlass LWR step throughput")
+    benchmark_multiclass()
+
+    print("\nLWR parameter sweep, member loop vs ensemble")
+    benchmark_ensemble()
+
+    print("\nTabulated fundamental diagram flux throughput")
+    benchmark_tabulated()
+
+    print("\nCTM engine vs LWRModel on long corridors")
+    benchmark_ctm()
+    print("\nCTM engine vs LWRModel on long corridors, skipping changes below 1e-14 ρ_max")
+    benchmark_ctm(tolerance=1e-14)
+    print("\nCTM engine vs LWRModel on busy corridors")
+    benchmark_ctm(lengths=(100.0, 1000.0), dx=0.05, simulation_time=1.0,
+                  initial_density=jammed_corridor_density, road_quality=None)
+
+    print("\nRoad network step cost")
+    benchmark_network()
+
+    print("\nDetector series, LWRModel vs Lax-Hopf queries")
+    benchmark_sparse_queries()
+
+
+if __name__ == "__main__":
+    main()
@@ -37,6 +37,9 @@ from scenarios.multiclass_scenarios import (
    GapFillingScenario
 )
 
+# Import configuration
+from config.simulation_config import DEFAULT_SIMULATION_PARAMS
+
 # Import visualization utilities
 from src.visualization.fundamental_plotter import FundamentalDiagramPlotter
 from src.visualization.simulation_plotter import SimulationPlotter
@@ -70,6 +73,20 @@ def parse_arguments():
     parser.add_argument("--dx", type=float, default=0.1, help="Spatial step (km)")
     parser.add_argument("--dt", type=float, default=None, help="Time step (h), None for auto")
     parser.add_argument("--cfl", type=float, default=0.9, help="CFL safety factor")
+    parser.add_argument("--adaptive", action="store_true", help="Recompute the CFL time step at every step")
+    parser.add_argument("--cfl-every", type=int, default=1, help="Steps between adaptive time step updates")
+    parser.add_argument(
+        "--save-interval",
+        type=float,
+        default=DEFAULT_SIMULATION_PARAMS['save_interval'],
+        help="Time between stored frames (h), 0 to store every step"
+    )
+    parser.add_argument("--detectors", type=float, nargs="+", default=None,
+                        help="Positions of virtual detectors (km)")
+    parser.add_argument("--memmap", action="store_true",
+                        help="Write frames to memory-mapped files in the output directory")
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64",
+                        help="Floating point precision of the solver state and results")
     
     # Model parameters
     parser.add_argument("--vmax", type=float, default=100.0, help="Maximum velocity (km/h)")
@@ -316,6 +333,13 @@ def main():
         'dx': float(args.dx),
         'dt': dt,
         'cfl_factor': float(args.cfl),
+        'adaptive': args.adaptive,
+        'cfl_every': args.cfl_every,
+        'save_interval': args.save_interval or None,  # 0 stores every step
+        'detectors': args.detectors,
+        'memmap': args.memmap,
+        'dtype': args.dtype,
+        'output_dir': os.path.join(str(project_root), args.output, args.model.upper(), args.scenario),
         'test_segment_length': float(args.test_segment_length),
         'transition_point': 0.5,  # Default transition point for all scenarios
         'upstream_density': 0.4,  # Default upstream density
@@ -12,6 +12,8 @@ import os
 from pathlib import Path
 import time
 
+from src.utils.results_store import SIDECAR_NAME, open_results, update_sidecar
+
 
 class BaseScenario:
     """Base class for all traffic simulation scenarios."""
@@ -36,6 +38,13 @@ class BaseScenario:
             'dx': 0.1,              # spatial step (km)
             'dt': None,             # time step (h), if None calculated from CFL
             'cfl_factor': 0.9,      # safety factor for CFL condition
+            'adaptive': False,      # recompute dt from the current state each step
+            'cfl_every': 1,         # steps between adaptive dt updates
+            'output_times': None,   # times (h) of stored frames, None for default
+            'save_interval': None,  # time (h) between stored frames, None for every step
+            'detectors': None,      # positions (km) of full-resolution virtual detectors
+            'memmap': False,        # write frames to memory-mapped files in output_dir
+            'dtype': 'float64',     # precision of the solver state and results ('float32' halves memory)
             'output_dir': 'results'  # directory for output files
         }
     
@@ -55,6 +64,25 @@ class BaseScenario:
         """
         raise NotImplementedError("Subclasses must implement get_initial_density")
     
+    def initial_density_array(self, grid_x):
+        """
+        Get the initial density on the whole grid at once.
+        This method may be overridden by subclasses with a vectorized version
+        of get_initial_density(); run() then uses it instead of evaluating
+        the scalar form point by point.
+        
+        Args:
+            grid_x: Spatial grid (km) of shape (nx,)
+            
+        Returns:
+            Array of shape (nx,) for single-class models, or (n_classes, nx)
+            for multiclass models (veh/km)
+            
+        Raises:
+            NotImplementedError: If not overridden by subclass
+        """
+        raise NotImplementedError("Subclasses may implement initial_density_array")
+    
     def get_road_quality(self):
         """
         Define road quality function.
@@ -66,27 +94,106 @@ class BaseScenario:
         # Default: uniform road quality (perfect condition)
         return lambda x: 1.0
     
+    def road_quality_array(self, grid_x):
+        """
+        Get the road quality on the whole grid at once.
+        This method may be overridden by subclasses together with
+        get_road_quality().
+        
+        Args:
+            grid_x: Spatial grid (km) of shape (nx,)
+            
+        Returns:
+            Array of road quality coefficients of shape (nx,)
+        """
+        # Default: uniform road quality (perfect condition)
+        return np.ones(len(grid_x))
+    
+    def _class_rho_max(self):
+        """
+        Maximum densities used to scale the initial density profiles.
+        
+        Returns:
+            Column of shape (n_classes, 1) for multiclass models (with a
+            leading member axis for ensembles), else the model's rho_max
+        """
+        if hasattr(self.model, 'n_classes'):
+            return self.model.class_parameters()['rho_max']
+        return self.model.rho_max
+    
+    def _class_factors(self, motorcycle_factor, other_factor=1.0):
+        """
+        Per-class density factors, with class 0 (motorcycles) set apart.
+        
+        Args:
+            motorcycle_factor: Factor applied to class 0
+            other_factor: Factor applied to the other classes
+            
+        Returns:
+            Column of shape (n_classes, 1)
+        """
+        factors = np.full((self.model.n_classes, 1), float(other_factor))
+        factors[0] = motorcycle_factor
+        return factors
+    
+    def _prefers_array_form(self, array_name, scalar_name):
+        """
+        Check whether the array form of a scenario method is up to date.
+        
+        The array form is used only if it is defined at least as far down
+        the class hierarchy as the scalar form, so a subclass that overrides
+        just the scalar form is not silently ignored.
+        
+        Args:
+            array_name: Name of the array method
+            scalar_name: Name of the scalar method
+            
+        Returns:
+            bool: True if the array form should be used
+        """
+        if scalar_name in vars(self):
+            return False
+        owners = {}
+        for name in (array_name, scalar_name):
+            owners[name] = next(cls for cls in type(self).__mro__ if name in vars(cls))
+        return issubclass(owners[array_name], owners[scalar_name])
+    
     def get_boundary_conditions(self):
         """
         Define boundary conditions.
         This method may be overridden by subclasses.
         
         Returns:
-            tuple: (left_bc, right_bc) functions or values
+            tuple: (left_bc, right_bc), the upstream demand and downstream
+                   supply (vehicles/h) as constants, functions of time (h) or
+                   profiles of src/utils/boundary_conditions.py; None for a
+                   zero-gradient boundary
         """
         # Default: zero-gradient (Neumann) boundary conditions
         return None, None
     
     def get_source_terms(self):
         """
-        Define source terms (e.g., for intersections).
+        Define source terms (e.g., on-ramps, off-ramps and side streets).
         This method may be overridden by subclasses.
         
         Returns:
-            function: A function that takes (x, t) and returns source value
+            SourceTerms of src/utils/source_terms.py located by position (km),
+            or None
         """
         # Default: no sources or sinks
-        return lambda x, t: 0.0
+        return None
+    
+    def get_traffic_signals(self):
+        """
+        Define the traffic signals of the corridor.
+        This method may be overridden by subclasses.
+        
+        Returns:
+            TrafficSignals located by position (km), or None
+        """
+        # Default: no signals
+        return None
     
     def prepare_simulation(self, params=None):
         """
@@ -112,15 +219,12 @@ class BaseScenario:
         
         return self.params
     
-    def run(self, params=None):
+    def _merge_params(self, params):
         """
-        Run simulation for this scenario with specified parameters.
+        Merge the given parameters with the scenario defaults into self.params.
         
         Args:
             params: Dictionary of simulation parameters (optional)
-                  
-        Returns:
-            Dictionary containing simulation results
         """
         # Ensure we have a valid parameters dictionary
         if params is None:
@@ -132,25 +236,91 @@ class BaseScenario:
             # Update with provided params
             merged_params.update(params)
             self.params = merged_params
+    
+    def _solver_arguments(self):
+        """
+        Collect the solver arguments shared by run() and iter_run().
+        
+        Returns:
+            dict: Keyword arguments for the model's simulate()/iter_simulate()
+        """
+        grid_x = self.get_grid()
+        
+        # Initial density, vectorized over the grid when the scenario allows it
+        if self._prefers_array_form('initial_density_array', 'get_initial_density'):
+            initial_density = self.initial_density_array(grid_x)
+        else:
+            initial_density = lambda x: self.get_initial_density(x)
+        
+        arguments = {
+            'initial_density': initial_density,
+            'domain_length': self.params['domain_length'],
+            'simulation_time': self.params['simulation_time'],
+            'dx': self.params['dx'],
+            'dt': self.params.get('dt', None),
+            'cfl_factor': self.params.get('cfl_factor', 0.9),
+            'road_quality_func': self._road_quality_input(grid_x),
+            'adaptive': self.params.get('adaptive', False),
+            'cfl_every': self.params.get('cfl_every', 1),
+            'output_times': self.params.get('output_times', None),
+            'save_interval': self.params.get('save_interval', None),
+            'dtype': self.params.get('dtype', None)
+        }
+        
+        # Only models that support signals, boundary flows and sources receive them
+        signals = self.get_traffic_signals()
+        if signals is not None:
+            arguments['signals'] = signals
+        sources = self.get_source_terms()
+        if sources is not None:
+            arguments['sources'] = sources
+        boundary_conditions = self.get_boundary_conditions()
+        if any(bc is not None for bc in boundary_conditions):
+            arguments['boundary_conditions'] = boundary_conditions
+        return arguments
+    
+    def _road_quality_input(self, grid_x):
+        """
+        Road quality in the form passed to the solver.
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of road quality on the grid (None for a perfect road), or the
+            scalar road quality function
+        """
+        if not self._prefers_array_form('road_quality_array', 'get_road_quality'):
+            return self.get_road_quality()
+        quality = self.road_quality_array(grid_x)
+        # A perfect road needs no scaling in the flux
+        return None if np.all(quality == 1.0) else quality
+    
+    def run(self, params=None):
+        """
+        Run simulation for this scenario with specified parameters.
+        
+        Args:
+            params: Dictionary of simulation parameters (optional)
+                  
+        Returns:
+            Dictionary containing simulation results
+        """
+        self._merge_params(params)
         
         # Log the start of the simulation
         print(f"Running {self.name} simulation...")
         
-        # Define initial density function
-        initial_density = lambda x: self.get_initial_density(x)
-        
-        # Get road quality function if implemented
-        road_quality_func = self.get_road_quality() if hasattr(self, 'get_road_quality') else None
+        # Long runs can write their frames straight to disk
+        results_dir = None
+        if self.params.get('memmap', False):
+            results_dir = os.path.join(self.params['output_dir'], self._results_name())
         
         # Run the simulation
         results = self.model.simulate(
-            initial_density=initial_density,
-            domain_length=self.params['domain_length'],
-            simulation_time=self.params['simulation_time'],
-            dx=self.params['dx'],
-            dt=self.params.get('dt', None),
-            cfl_factor=self.params.get('cfl_factor', 0.9),
-            road_quality_func=road_quality_func
+            **self._solver_arguments(),
+            detectors=self.params.get('detectors', None),
+            output_dir=results_dir
         )
         
         # Add scenario information to results
@@ -162,6 +332,104 @@ class BaseScenario:
         
         return results
     
+    def iter_run(self, params=None):
+        """
+        Run the scenario lazily, yielding frames as the solver produces them.
+        
+        The memory use is independent of the simulation length, and a
+        simulation_time of None gives an unbounded run. Frames are the live
+        solver state and must be copied to be kept (see iter_simulate()).
+        
+        Args:
+            params: Dictionary of simulation parameters (optional)
+            
+        Yields:
+            tuple: (t, state) where state is the density (single class) or the
+                  class densities of shape (n_classes, nx) (multiclass)
+        """
+        self._merge_params(params)
+        
+        print(f"Streaming {self.name} simulation...")
+        yield from self.model.iter_simulate(**self._solver_arguments())
+    
+    def get_grid(self):
+        """
+        Spatial grid used by the solver for the current parameters.
+        
+        Returns:
+            Array of cell positions (km)
+        """
+        params = self.params if self.params is not None else self.default_params
+        nx = int(params['domain_length'] / params['dx']) + 1
+        return np.linspace(0, params['domain_length'], nx)
+    
+    def frame_fields(self, state, quality=None):
+        """
+        Derive aggregate density, velocity and flow from one streamed frame.
+        
+        Args:
+            state: Frame yielded by iter_run()
+            quality: Road quality profile of the model (evaluated from the
+                     scenario's road quality if None)
+            
+        Returns:
+            tuple: (density, velocity, flow) arrays of shape (nx,)
+        """
+        if quality is None:
+            grid_x = self.get_grid()
+            quality = self.model.road_quality_profile(self._road_quality_input(grid_x), grid_x)
+        if hasattr(self.model, 'n_classes'):
+            return self.model.aggregate_fields(state, self.model.class_velocities(state, quality))
+        return state, self.model.get_velocity(state, quality), self.model.get_flow(state, quality)
+    
+    def analyze_stream(self, params=None):
+        """
+        Run the scenario and compute the analysis of analyze() incrementally.
+        
+        Only running sums over the frames are kept, so long runs can be
+        analyzed without storing their results.
+        
+        Args:
+            params: Dictionary of simulation parameters (optional)
+            
+        Returns:
+            dict: Dictionary containing analysis results
+        """
+        n_frames = 0
+        # Sums are kept in float64 so that float32 runs do not lose precision
+        density_sum = velocity_sum = flow_sum = np.float64(0.0)
+        max_density = max_flow = -np.inf
+        
+        quality = None
+        for _, state in self.iter_run(params):
+            if quality is None:
+                grid_x = self.get_grid()
+                quality = self.model.road_quality_profile(self._road_quality_input(grid_x), grid_x)
+            density, velocity, flow = self.frame_fields(state, quality)
+            n_frames += 1
+            density_sum = density_sum + density
+            velocity_sum = velocity_sum + velocity
+            flow_sum = flow_sum + flow
+            max_density = max(max_density, float(np.max(density)))
+            max_flow = max(max_flow, float(np.max(flow)))
+        
+        avg_density_profile = density_sum / n_frames
+        avg_velocity_profile = velocity_sum / n_frames
+        grid_x = self.get_grid()
+        
+        analysis = {
+            'mean_density': np.mean(avg_density_profile),
+            'max_density': max_density,
+            'mean_velocity': np.mean(avg_velocity_profile),
+            'mean_flow': np.mean(flow_sum / n_frames),
+            'max_flow': max_flow,
+            'bottlenecks': self._find_bottlenecks(avg_density_profile, grid_x),
+            'travel_time': self._travel_time(avg_velocity_profile, grid_x)
+        }
+        
+        self.analysis = analysis
+        return analysis
+    
     def analyze(self):
         """
         Analyze simulation results.
@@ -191,84 +459,128 @@ class BaseScenario:
         
         # Find bottlenecks (locations with consistently high density)
         avg_density_profile = np.mean(density, axis=0)
+        analysis['bottlenecks'] = self._find_bottlenecks(avg_density_profile, self.results['grid_x'])
+        
+        # Travel time calculation (based on average velocity)
+        analysis['travel_time'] = self._travel_time(np.mean(velocity, axis=0), self.results['grid_x'])
+        
+        self.analysis = analysis
+        return analysis
+    
+    def _find_bottlenecks(self, avg_density_profile, grid_x):
+        """
+        Group the cells with consistently high density into bottlenecks.
+        
+        Args:
+            avg_density_profile: Time-averaged density in each cell
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            list: One dictionary per bottleneck
+        """
         bottleneck_threshold = 0.7 * np.max(avg_density_profile)
         bottleneck_indices = np.where(avg_density_profile > bottleneck_threshold)[0]
         
-        if len(bottleneck_indices) > 0:
-            bottleneck_positions = [self.results['grid_x'][idx] for idx in bottleneck_indices]
-            bottleneck_densities = [avg_density_profile[idx] for idx in bottleneck_indices]
-            
-            # Group adjacent bottlenecks
-            bottleneck_groups = []
-            current_group = [bottleneck_positions[0]]
-            current_group_densities = [bottleneck_densities[0]]
-            
-            for i in range(1, len(bottleneck_positions)):
-                if bottleneck_positions[i] - bottleneck_positions[i-1] <= 2 * self.params['dx']:
-                    # Add to current group
-                    current_group.append(bottleneck_positions[i])
-                    current_group_densities.append(bottleneck_densities[i])
-                else:
-                    # Start new group
-                    if current_group:
-                        bottleneck_groups.append({
-                            'positions': current_group,
-                            'densities': current_group_densities,
-                            'mean_position': np.mean(current_group),
-                            'mean_density': np.mean(current_group_densities),
-                            'length': current_group[-1] - current_group[0]
-                        })
-                    current_group = [bottleneck_positions[i]]
-                    current_group_densities = [bottleneck_densities[i]]
-            
-            # Add last group
-            if current_group:
-                bottleneck_groups.append({
-                    'positions': current_group,
-                    'densities': current_group_densities,
-                    'mean_position': np.mean(current_group),
-                    'mean_density': np.mean(current_group_densities),
-                    'length': current_group[-1] - current_group[0] if len(current_group) > 1 else 0
-                })
-                
-            analysis['bottlenecks'] = bottleneck_groups
-        else:
-            analysis['bottlenecks'] = []
+        if len(bottleneck_indices) == 0:
+            return []
+        
+        bottleneck_positions = [grid_x[idx] for idx in bottleneck_indices]
+        bottleneck_densities = [avg_density_profile[idx] for idx in bottleneck_indices]
+        
+        # Group adjacent bottlenecks
+        bottleneck_groups = []
+        current_group = [bottleneck_positions[0]]
+        current_group_densities = [bottleneck_densities[0]]
+        
+        for i in range(1, len(bottleneck_positions)):
+            if bottleneck_positions[i] - bottleneck_positions[i-1] <= 2 * self.params['dx']:
+                # Add to current group
+                current_group.append(bottleneck_positions[i])
+                current_group_densities.append(bottleneck_densities[i])
+            else:
+                # Start new group
+                if current_group:
+                    bottleneck_groups.append({
+                        'positions': current_group,
+                        'densities': current_group_densities,
+                        'mean_position': np.mean(current_group),
+                        'mean_density': np.mean(current_group_densities),
+                        'length': current_group[-1] - current_group[0]
+                    })
+                current_group = [bottleneck_positions[i]]
+                current_group_densities = [bottleneck_densities[i]]
+        
+        # Add last group
+        if current_group:
+            bottleneck_groups.append({
+                'positions': current_group,
+                'densities': current_group_densities,
+                'mean_position': np.mean(current_group),
+                'mean_density': np.mean(current_group_densities),
+                'length': current_group[-1] - current_group[0] if len(current_group) > 1 else 0
+            })
+        
+        return bottleneck_groups
+    
+    @staticmethod
+    def _travel_time(avg_velocity_profile, grid_x):
+        """
+        Estimate the travel time across the domain from time-averaged velocities.
         
-        # Travel time calculation (based on average velocity)
-        grid_x = self.results['grid_x']
+        Args:
+            avg_velocity_profile: Time-averaged velocity in each cell (km/h)
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            float: Travel time (hours)
+        """
         dx = grid_x[1] - grid_x[0]
         travel_time = 0
         
         for i in range(len(grid_x) - 1):
             # Time to travel through segment = distance / average velocity
-            segment_velocity = np.mean(velocity[:, i])
+            segment_velocity = avg_velocity_profile[i]
             if segment_velocity > 0:
                 travel_time += dx / segment_velocity
-                
-        analysis['travel_time'] = travel_time  # hours
         
-        self.analysis = analysis
-        return analysis
+        return travel_time
+    
+    def _results_name(self):
+        """File or directory name used for this scenario's results."""
+        return self.name.lower().replace(' ', '_')
     
     def save_results(self, filename=None):
         """
         Save simulation results to disk.
         
+        Results of a memory-mapped run are already on disk; only the scenario
+        information is added to their JSON sidecar.
+        
         Args:
             filename: Name of file to save results (default: scenario name)
             
         Returns:
-            str: Path to saved file
+            str: Path to saved file (the results directory for memory-mapped runs)
             
         Raises:
             ValueError: If simulation has not been run yet
         """
         if self.results is None:
             raise ValueError("No simulation results available. Run simulation first.")
+        
+        if 'results_dir' in self.results:
+            results_dir = self.results['results_dir']
+            update_sidecar(
+                results_dir,
+                name=self.results.get('name', self.name),
+                description=self.results.get('description', ''),
+                params=self.params
+            )
+            print(f"Results saved to {results_dir}")
+            return results_dir
             
         if filename is None:
-            filename = f"{self.name.lower().replace(' ', '_')}.npz"
+            filename = f"{self._results_name()}.npz"
             
         output_path = os.path.join(self.params['output_dir'], filename)
         
@@ -287,16 +599,30 @@ class BaseScenario:
         return output_path
     
     @staticmethod
-    def load_results(filepath):
+    def load_results(filepath, model=None):
         """
         Load simulation results from disk.
         
+        A results directory written by a memory-mapped run (or its JSON
+        sidecar) is opened lazily: the fields are read-only memory maps and
+        only the slices that are accessed are read. Such runs store densities
+        only; pass the model that produced them to derive velocities and flows.
+        
         Args:
-            filepath: Path to saved results file
+            filepath: Path to saved results file or results directory
+            model: Model used to derive the velocity and flow fields of a
+                   results directory (optional)
             
         Returns:
             dict: Dictionary containing simulation results
         """
+        if os.path.isdir(filepath) or os.path.basename(filepath) == SIDECAR_NAME:
+            results = open_results(filepath)
+            results.setdefault('params', results.get('parameters', {}))
+            if model is not None:
+                results = model.lazy_results(results)
+            return results
+        
         data = np.load(filepath, allow_pickle=True)
         
         results = {
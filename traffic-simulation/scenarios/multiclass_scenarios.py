@@ -8,6 +8,7 @@ motorcycle behavior.
 
 import numpy as np
 from .base_scenario import BaseScenario
+from src.models.traffic_signals import TrafficSignals
 
 
 class MulticlassRedLightScenario(BaseScenario):
@@ -38,7 +39,8 @@ class MulticlassRedLightScenario(BaseScenario):
             'background_density': 0.2,  # background density ratio
             'jam_density': 0.9,      # jam density ratio at the light
             'jam_length': 0.5,       # length of the jam upstream of light (km)
-            'green_time': 0.05       # time when the light turns green (h)
+            'green_time': 0.05,      # time when the light turns green (h)
+            'signal_plan': 'standard'  # TRAFFIC_SIGNALS plan giving the motorcycle anticipation
         })
     
     def get_initial_density(self, x):
@@ -79,6 +81,43 @@ class MulticlassRedLightScenario(BaseScenario):
         
         return densities
     
+    def initial_density_array(self, grid_x):
+        """
+        Get the initial density with congestion at the traffic light on the whole grid.
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of shape (n_classes, nx) (veh/km)
+        """
+        params = self.params if self.params is not None else self.default_params
+        light_position = params['light_position']
+        jam_length = params['jam_length']
+        
+        if not hasattr(self.model, 'n_classes'):
+            raise ValueError("MulticlassRedLightScenario requires a multiclass model")
+        
+        in_jam = (light_position - jam_length <= grid_x) & (grid_x <= light_position)
+        
+        jam_ratio = np.full((self.model.n_classes, len(grid_x)), float(params['jam_density']))
+        # More motorcycles near the light (front of queue)
+        proximity_to_light = (grid_x - (light_position - jam_length)) / jam_length
+        jam_ratio[0] = np.minimum(params['jam_density'] * (1 + 0.3 * proximity_to_light), 0.95)
+        return np.where(in_jam, jam_ratio, params['background_density']) * self._class_rho_max()
+    
+    def get_traffic_signals(self):
+        """
+        Get the traffic light, red until green_time and green afterwards.
+        
+        Returns:
+            TrafficSignals with the light at light_position
+        """
+        params = self.params if self.params is not None else self.default_params
+        signals = TrafficSignals()
+        signals.add_switch(params['light_position'], params['green_time'], params['signal_plan'])
+        return signals
+    
     def run(self, params=None):
         """
         Run the scenario simulation with a traffic light that turns green.
@@ -95,7 +134,8 @@ class MulticlassRedLightScenario(BaseScenario):
         # Add traffic light information to results
         results['traffic_light'] = {
             'position': self.params['light_position'],
-            'green_time': green_time
+            'green_time': green_time,
+            'signal_plan': self.params['signal_plan']
         }
         
         # Add annotation to plot title
@@ -157,6 +197,23 @@ class DegradedRoadScenario(BaseScenario):
         
         return densities
     
+    def initial_density_array(self, grid_x):
+        """
+        Get the uniform initial density on the whole grid.
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of shape (n_classes, nx) (veh/km)
+        """
+        params = self.params if self.params is not None else self.default_params
+        
+        if not hasattr(self.model, 'n_classes'):
+            raise ValueError("DegradedRoadScenario requires a multiclass model")
+        
+        return params['density'] * self._class_rho_max() * np.ones(len(grid_x))
+    
     def get_road_quality(self):
         """
         Define road quality function with a degraded section.
@@ -173,6 +230,20 @@ class DegradedRoadScenario(BaseScenario):
                 return params['quality_good']
         
         return road_quality
+    
+    def road_quality_array(self, grid_x):
+        """
+        Get road quality coefficients with a degraded section on the whole grid.
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of road quality coefficients of shape (nx,)
+        """
+        params = self.params if self.params is not None else self.default_params
+        degraded = (params['degraded_start'] <= grid_x) & (grid_x <= params['degraded_end'])
+        return np.where(degraded, params['quality_bad'], params['quality_good']).astype(float)
 
 
 class GapFillingScenario(BaseScenario):
@@ -248,6 +319,24 @@ class GapFillingScenario(BaseScenario):
         
         return densities
 
+    def initial_density_array(self, grid_x):
+        """
+        Get initial densities with a higher upstream density on the whole grid.
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of shape (n_classes, nx) (veh/km)
+        """
+        params = dict(self.default_params, **(self.params if self.params is not None else {}))
+        transition_point = params['transition_point'] * params['domain_length']
+        
+        # Motorcycles (class 0) and the other classes get their own factor
+        factors = self._class_factors(params['moto_factor'], params['car_factor'])
+        ratio = np.where(grid_x <= transition_point, params['upstream_density'], params['downstream_density'])
+        return ratio * factors * self._class_rho_max()
+    
     def run(self, params=None):
         """Run the scenario and add segment information to results."""
         # CRITICAL FIX: Ensure all required parameters are included
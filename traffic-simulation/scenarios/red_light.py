@@ -7,6 +7,7 @@ and then accelerating when the light turns green.
 
 import numpy as np
 from .base_scenario import BaseScenario
+from src.models.traffic_signals import TrafficSignals
 
 
 class RedLightScenario(BaseScenario):
@@ -39,7 +40,8 @@ class RedLightScenario(BaseScenario):
             'background_density': 0.2,  # background density ratio
             'jam_density': 0.9,      # jam density ratio at the light
             'jam_length': 0.5,       # length of the jam upstream of light (km)
-            'green_time': 0.05       # time when the light turns green (h)
+            'green_time': 0.05,      # time when the light turns green (h)
+            'signal_plan': 'standard'  # TRAFFIC_SIGNALS plan giving the motorcycle anticipation
         })
     
     def get_initial_density(self, x):
@@ -87,6 +89,31 @@ class RedLightScenario(BaseScenario):
                 # Background traffic elsewhere
                 return float(params['background_density'] * self.model.rho_max)
     
+    def initial_density_array(self, grid_x):
+        """
+        Get the initial density with congestion at the traffic light on the whole grid.
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of shape (nx,), or (n_classes, nx) for multiclass models (veh/km)
+        """
+        params = self.params if self.params is not None else self.default_params
+        light_position = params['light_position']
+        jam_length = params['jam_length']
+        
+        in_jam = (light_position - jam_length <= grid_x) & (grid_x <= light_position)
+        
+        if hasattr(self.model, 'n_classes'):
+            jam_ratio = np.full((self.model.n_classes, len(grid_x)), float(params['jam_density']))
+            # More motorcycles near the light (front of queue)
+            proximity_to_light = (grid_x - (light_position - jam_length)) / jam_length
+            jam_ratio[0] = np.minimum(params['jam_density'] * (1 + 0.3 * proximity_to_light), 0.95)
+        else:
+            jam_ratio = params['jam_density']
+        return np.where(in_jam, jam_ratio, params['background_density']) * self._class_rho_max()
+    
     def get_road_quality(self):
         """
         Get road quality coefficient (uniform quality for this scenario).
@@ -97,6 +124,30 @@ class RedLightScenario(BaseScenario):
         # Uniform road quality for this scenario
         return lambda x: 1.0
     
+    def road_quality_array(self, grid_x):
+        """
+        Get road quality coefficients on the whole grid (uniform quality).
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of road quality coefficients of shape (nx,)
+        """
+        return np.ones(len(grid_x))
+    
+    def get_traffic_signals(self):
+        """
+        Get the traffic light, red until green_time and green afterwards.
+        
+        Returns:
+            TrafficSignals with the light at light_position
+        """
+        params = self.params if self.params is not None else self.default_params
+        signals = TrafficSignals()
+        signals.add_switch(params['light_position'], params['green_time'], params['signal_plan'])
+        return signals
+    
     def run(self, params=None):
         """
         Run the scenario simulation with a traffic light that turns green.
@@ -113,7 +164,8 @@ class RedLightScenario(BaseScenario):
         # Add traffic light information to results
         results['traffic_light'] = {
             'position': self.params['light_position'],
-            'green_time': green_time
+            'green_time': green_time,
+            'signal_plan': self.params['signal_plan']
         }
         
         # Add annotation to plot title
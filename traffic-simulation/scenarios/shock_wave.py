@@ -88,6 +88,28 @@ class ShockWaveScenario(BaseScenario):
             else:
                 return float(params['downstream_density'] * self.model.rho_max)
     
+    def initial_density_array(self, grid_x):
+        """
+        Get the low-to-high initial density on the whole grid.
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of shape (nx,), or (n_classes, nx) for multiclass models (veh/km)
+        """
+        params = self.params if self.params is not None else self.default_params
+        transition_point = params.get('transition_point', self.default_params['transition_point']) * params['domain_length']
+        upstream = grid_x <= transition_point
+        
+        if hasattr(self.model, 'n_classes'):
+            # Motorcycles (class 0) are even denser downstream
+            downstream_ratio = params['downstream_density'] * self._class_factors(1.2)
+            ratio = np.where(upstream, params['upstream_density'], downstream_ratio)
+        else:
+            ratio = np.where(upstream, params['upstream_density'], params['downstream_density'])
+        return ratio * self._class_rho_max()
+    
     def get_road_quality(self):
         """
         Get road quality coefficient (uniform quality for this scenario).
@@ -97,3 +119,15 @@ class ShockWaveScenario(BaseScenario):
         """
         # Uniform road quality for this basic scenario
         return lambda x: 1.0
+    
+    def road_quality_array(self, grid_x):
+        """
+        Get road quality coefficients on the whole grid (uniform quality).
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of road quality coefficients of shape (nx,)
+        """
+        return np.ones(len(grid_x))
@@ -117,6 +117,41 @@ class TrafficJamScenario(BaseScenario):
                 # Sharp transition
                 return float((left_density if x <= transition_point else right_density) * self.model.rho_max)
     
+    def initial_density_array(self, grid_x):
+        """
+        Get the traffic jam initial density on the whole grid.
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of shape (nx,), or (n_classes, nx) for multiclass models (veh/km)
+        """
+        params = self.params if self.params is not None else self.default_params
+        
+        left_density = params.get('left_density', 0.7)
+        right_density = params.get('right_density', 0.1)
+        transition_point = params.get('transition_point', 0.5) * params['domain_length']
+        transition_width = params.get('transition_width', 1.0)
+        smooth_transition = params.get('smooth_transition', True)
+        
+        # Motorcycles can squeeze through, so slightly higher density on the left
+        if hasattr(self.model, 'n_classes'):
+            left_density = left_density * self._class_factors(1.2)
+        
+        if smooth_transition and transition_width > 0:
+            # Linear interpolation in the transition zone
+            t = (grid_x - (transition_point - transition_width/2)) / transition_width
+            density_factor = np.where(
+                grid_x < transition_point - transition_width/2, left_density,
+                np.where(grid_x > transition_point + transition_width/2, right_density,
+                         left_density + t * (right_density - left_density))
+            )
+        else:
+            # Sharp transition
+            density_factor = np.where(grid_x <= transition_point, left_density, right_density)
+        return density_factor * self._class_rho_max()
+    
     def get_road_quality(self):
         """
         Get road quality coefficient (uniform quality for this scenario).
@@ -125,4 +160,16 @@ class TrafficJamScenario(BaseScenario):
             function: A function that takes position x and returns quality coefficient
         """
         # Uniform road quality for this scenario
-        return lambda x: 1.0
\ No newline at end of file
+        return lambda x: 1.0
+    
+    def road_quality_array(self, grid_x):
+        """
+        Get road quality coefficients on the whole grid (uniform quality).
+        
+        Args:
+            grid_x: Spatial grid (km)
+            
+        Returns:
+            Array of road quality coefficients of shape (nx,)
+        """
+        return np.ones(len(grid_x))
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Exact Riemann Solutions
+
+This module evaluates the exact solution of Riemann problems of the LWR
+model with the Greenshields fundamental diagram, q(ρ) = v_max ρ (1 - ρ/ρ_max).
+A jump from ρ_L to ρ_R at x0 gives
+
+- a shock travelling at the Rankine-Hugoniot speed
+  s = v_max (1 - (ρ_L + ρ_R)/ρ_max) if ρ_L < ρ_R,
+- a rarefaction fan if ρ_L > ρ_R, in which q'(ρ) = (x - x0)/t, i.e.
+  ρ = ρ_max/2 (1 - (x - x0)/(v_max t)), between the characteristic speeds
+  q'(ρ_L) and q'(ρ_R).
+
+The solution is evaluated on whole (t, x) grids at once, so validating a
+run (e.g. ShockWaveScenario, RarefactionWaveScenario or TrafficJamScenario
+with a sharp transition) costs a few array operations instead of a
+fine-grid reference simulation. On a finite road it is exact only until
+the first wave reaches an end (see scenario_exit_time()).
+"""
+
+import numpy as np
+
+from ..models.fundamental_diagram import GreenshieldsDiagram
+
+
+def riemann_waves(rho_left, rho_right, v_max=100.0, rho_max=180.0):
+    """
+    Describe the waves of Riemann problems.
+
+    Args:
+        rho_left: Density left of the jump (vehicles/km)
+        rho_right: Density right of the jump (vehicles/km)
+        v_max: Free-flow speed (km/h)
+        rho_max: Jam density (vehicles/km)
+
+    Returns:
+        dict: 'shock' (True for a shock, False for a rarefaction),
+              'shock_speed' (km/h, the Rankine-Hugoniot speed), and
+              'fan_left'/'fan_right', the speeds of the edges of a
+              rarefaction fan (km/h), broadcast over the inputs
+    """
+    rho_left, rho_right = np.broadcast_arrays(np.asarray(rho_left, dtype=float),
+                                              np.asarray(rho_right, dtype=float))
+    return {
+        'shock': rho_left < rho_right,
+        'shock_speed': v_max * (1 - (rho_left + rho_right) / rho_max),
+        'fan_left': v_max * (1 - 2 * rho_left / rho_max),
+        'fan_right': v_max * (1 - 2 * rho_right / rho_max)
+    }
+
+
+def exact_riemann(rho_left, rho_right, xi, v_max=100.0, rho_max=180.0):
+    """
+    Exact solution of Greenshields Riemann problems in the self-similar variable.
+
+    Args:
+        rho_left: Left density (vehicles/km)
+        rho_right: Right density (vehicles/km)
+        xi: Self-similar coordinate (x - x0)/t (km/h)
+        v_max: Free-flow speed (km/h)
+        rho_max: Jam density (vehicles/km)
+
+    Returns:
+        Array of densities at the given xi, broadcast over all inputs
+    """
+    xi = np.asarray(xi, dtype=float)
+    waves = riemann_waves(rho_left, rho_right, v_max, rho_max)
+    shock = np.where(xi < waves['shock_speed'], rho_left, rho_right)
+    # Rarefaction fan, inverting q'(ρ) = ξ and clipping to the outer states
+    fan = 0.5 * rho_max * (1 - xi / v_max)
+    fan = np.minimum(np.maximum(fan, rho_right), rho_left)
+    return np.where(waves['shock'], shock, fan)
+
+
+def riemann_solution(rho_left, rho_right, x, t, x0=0.0, v_max=100.0, rho_max=180.0):
+    """
+    Evaluate the exact solution of a Riemann problem on a (t, x) grid.
+
+    The initial jump is at x0, with ρ_L at x <= x0 as in the scenarios.
+
+    Args:
+        rho_left: Left density (vehicles/km)
+        rho_right: Right density (vehicles/km)
+        x: Positions (km), an array of shape (nx,)
+        t: Times (h), an array of shape (nt,) or a scalar
+        x0: Position of the initial jump (km)
+        v_max: Free-flow speed (km/h)
+        rho_max: Jam density (vehicles/km)
+
+    Returns:
+        Densities of shape (nt, nx), or (nx,) for a scalar time
+    """
+    x = np.asarray(x, dtype=float)
+    t = np.asarray(t, dtype=float)
+    distance = x - x0
+    times = t[..., None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xi = np.where(times > 0, distance / np.where(times > 0, times, 1.0), 0.0)
+    density = exact_riemann(rho_left, rho_right, xi, v_max, rho_max)
+    # The initial frame is the jump itself
+    initial = np.where(distance <= 0, rho_left, rho_right)
+    return np.where(times > 0, density, initial)
+
+
+def scenario_riemann_problem(scenario, params=None):
+    """
+    Get the Riemann problem of a scenario with a sharp density jump.
+
+    Supports the scenarios parameterized by upstream/downstream densities
+    (ShockWaveScenario, RarefactionWaveScenario) or by left/right densities
+    with smooth_transition=False (TrafficJamScenario), run with a
+    single-class Greenshields model.
+
+    Args:
+        scenario: Scenario instance
+        params: Parameters overriding those of the scenario (optional)
+
+    Returns:
+        dict: rho_left, rho_right (vehicles/km), x0 (km), v_max (km/h) and
+              rho_max (vehicles/km)
+
+    Raises:
+        ValueError: If the scenario is not a Greenshields Riemann problem
+    """
+    model = scenario.model
+    if hasattr(model, 'n_classes') or not isinstance(model.fundamental_diagram, GreenshieldsDiagram):
+        raise ValueError("Exact Riemann solutions need a single-class Greenshields model")
+
+    base = scenario.params if scenario.params is not None else scenario.default_params
+    params = {**base, **(params or {})}
+    if 'upstream_density' in params:
+        left, right = params['upstream_density'], params['downstream_density']
+    elif 'left_density' in params:
+        if params.get('smooth_transition', True) and params.get('transition_width', 0) > 0:
+            raise ValueError("A smooth transition is not a Riemann problem; "
+                             "set smooth_transition=False")
+        left, right = params['left_density'], params['right_density']
+    else:
+        raise ValueError(f"Scenario {scenario.name} has no sharp density jump")
+
+    return {
+        'rho_left': left * model.rho_max,
+        'rho_right': right * model.rho_max,
+        'x0': params.get('transition_point', 0.5) * params['domain_length'],
+        'v_max': model.v_max,
+        'rho_max': model.rho_max
+    }
+
+
+def scenario_exit_time(scenario, params=None):
+    """
+    Time at which the first wave of a scenario reaches an end of the road.
+
+    The exact solution is that of an infinite road, so it holds for a run
+    of the scenario up to this time.
+
+    Args:
+        scenario: Scenario instance (see scenario_riemann_problem())
+        params: Parameters overriding those of the scenario (optional)
+
+    Returns:
+        float: Exit time (h) of the fastest wave, inf if no wave moves
+    """
+    problem = scenario_riemann_problem(scenario, params)
+    waves = riemann_waves(problem['rho_left'], problem['rho_right'],
+                          problem['v_max'], problem['rho_max'])
+    if waves['shock']:
+        speeds = np.array([waves['shock_speed']])
+    else:
+        speeds = np.array([waves['fan_left'], waves['fan_right']])
+    base = scenario.params if scenario.params is not None else scenario.default_params
+    length = {**base, **(params or {})}['domain_length']
+    distances = np.where(speeds > 0, length - problem['x0'], problem['x0'])
+    with np.errstate(divide='ignore'):
+        return float(np.min(distances / np.abs(speeds)))
+
+
+def scenario_exact_solution(scenario, grid_x, grid_t, params=None):
+    """
+    Evaluate the exact solution of a scenario on its output grid.
+
+    Args:
+        scenario: Scenario instance (see scenario_riemann_problem())
+        grid_x: Positions (km) of shape (nx,)
+        grid_t: Times (h) of shape (nt,)
+        params: Parameters overriding those of the scenario (optional)
+
+    Returns:
+        Densities of shape (nt, nx) (vehicles/km)
+
+    Raises:
+        ValueError: If the scenario is not a Greenshields Riemann problem or
+                    its road quality is not uniform
+    """
+    quality = scenario.road_quality_array(np.asarray(grid_x, dtype=float))
+    if not np.all(quality == 1.0):
+        raise ValueError("Exact Riemann solutions need a uniform road quality of 1")
+    problem = scenario_riemann_problem(scenario, params)
+    return riemann_solution(problem['rho_left'], problem['rho_right'], grid_x, grid_t,
+                            problem['x0'], problem['v_max'], problem['rho_max'])
+
+
+def l1_errors(density, exact, dx):
+    """
+    L1 distance between computed and exact densities, frame by frame.
+
+    Args:
+        density: Computed densities of shape (..., nx)
+        exact: Exact densities broadcasting against density
+        dx: Spatial step (km)
+
+    Returns:
+        Array of shape density.shape[:-1] with the L1 errors (vehicles)
+    """
+    return dx * np.sum(np.abs(np.asarray(density) - exact), axis=-1)
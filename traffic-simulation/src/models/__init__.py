@@ -5,5 +5,20 @@ This package provides various traffic simulation models.
 """
 
 from .lwr_model import LWRModel
+from .ctm_model import CTMModel
+from .front_tracking import FrontTrackingLWR
+from .lax_hopf import LaxHopfLWR
+from .newell_model import NewellLinkModel
+from .road_network import RoadNetwork, Link, Junction
+from .traffic_signals import TrafficSignals
+from .fundamental_diagram import (
+    FundamentalDiagram, GreenshieldsDiagram, TriangularDiagram,
+    UnderwoodDiagram, GreenbergDiagram, TabulatedDiagram
+)
 
-__all__ = ['LWRModel']
+__all__ = [
+    'LWRModel', 'CTMModel', 'FrontTrackingLWR', 'LaxHopfLWR', 'NewellLinkModel',
+    'RoadNetwork', 'Link', 'Junction', 'TrafficSignals',
+    'FundamentalDiagram', 'GreenshieldsDiagram', 'TriangularDiagram',
+    'UnderwoodDiagram', 'GreenbergDiagram', 'TabulatedDiagram'
+]
@@ -6,24 +6,32 @@ including fundamental methods for traffic flow.
 """
 
 import numpy as np
+from .fundamental_diagram import GreenshieldsDiagram
 
 class BaseModel:
     """
     Base class for traffic simulation models.
     
-    This class provides fundamental methods for traffic flow calculations.
+    This class provides fundamental methods for traffic flow calculations,
+    delegated to a fundamental diagram.
     """
     
-    def __init__(self, rho_max=180, v_max=100):
+    def __init__(self, rho_max=180, v_max=100, fundamental_diagram=None):
         """
         Initializes the base model with maximum density and speed.
         
         Args:
             rho_max: Maximum density (vehicles/km)
             v_max: Maximum speed (km/h)
+            fundamental_diagram: FundamentalDiagram instance; None builds a
+                                 Greenshields diagram from rho_max and v_max,
+                                 otherwise both are taken from the diagram
         """
-        self.rho_max = rho_max  # Maximum density (vehicles/km)
-        self.v_max = v_max      # Maximum speed (km/h)
+        if fundamental_diagram is None:
+            fundamental_diagram = GreenshieldsDiagram(v_max=v_max, rho_max=rho_max)
+        self.fundamental_diagram = fundamental_diagram
+        self.rho_max = fundamental_diagram.rho_max  # Maximum density (vehicles/km)
+        self.v_max = fundamental_diagram.v_max      # Maximum speed (km/h)
 
     def speed(self, rho):
         """
@@ -35,7 +43,7 @@ class BaseModel:
         Returns:
             Speed of traffic (km/h)
         """
-        raise NotImplementedError("This method should be implemented by subclasses.")
+        return self.fundamental_diagram.speed(rho)
 
     def flow(self, rho):
         """
@@ -47,7 +55,7 @@ class BaseModel:
         Returns:
             Flow of traffic (vehicles/h)
         """
-        raise NotImplementedError("This method should be implemented by subclasses.")
+        return self.fundamental_diagram.flow(rho)
 
     def critical_density(self):
         """
@@ -56,7 +64,7 @@ class BaseModel:
         Returns:
             Critical density (vehicles/km)
         """
-        return self.rho_max / 2
+        return self.fundamental_diagram.critical_density()
 
     def capacity(self):
         """
@@ -0,0 +1,376 @@
+"""
+Cell Transmission Model
+
+This module implements the Cell Transmission Model (CTM) of Daganzo, the
+demand/supply form of the first-order Godunov scheme for the LWR model. Each
+cell stores its sending function (demand) and receiving function (supply);
+the flow through a node between an upstream and a downstream cell is
+
+    q = min(D_up, S_down),
+
+computed for all nodes of a corridor in one vectorized step (node_flux()).
+
+The engine keeps the demand, supply and node flows of a corridor between
+steps. It only recomputes the nodes next to the cells that moved in the
+previous step, and the cells next to those nodes. Outside the waves a
+corridor is in equilibrium (free flow or a standing queue), so on long
+corridors the cost of a step scales with the extent of the waves rather
+than with the length of the road. This only pays off on roads that are
+mostly at rest: once the waves (and the rounding noise ahead of them, see
+below) cover more than DENSE_FRACTION of the cells, the engine takes
+whole-corridor steps, which cost about as much as an LWRModel step.
+
+Boundary flows (an upstream demand, a downstream supply) replace the
+zero-gradient boundary nodes; the cells next to an active boundary are
+updated in every step, as the boundary flows may change at any time.
+
+In floating point arithmetic, rounding errors of a few ulps travel ahead of
+every wave at one cell per step and keep the whole domain of dependence
+moving. By default the engine follows them, so the vehicles are conserved
+and the results are bitwise those of LWRModel with the Godunov flux. A
+positive tolerance leaves the cells whose density changes by less than it
+in a step as they are, which keeps the moving region down to the waves
+themselves; skipped changes are not conserved, so the mass balance then
+only holds up to the tolerance per skipped cell.
+"""
+
+import numpy as np
+from .lwr_model import LWRModel
+from ..utils.time_stepping import clocked_step
+
+
+def node_flux(demand, supply, out=None):
+    """
+    Flow through ordinary nodes, the minimum of upstream demand and downstream supply.
+
+    Args:
+        demand: Sending flows of the upstream cells (vehicles/h)
+        supply: Receiving flows of the downstream cells (vehicles/h)
+        out: Optional output array
+
+    Returns:
+        Node flows (vehicles/h)
+    """
+    return np.minimum(demand, supply, out=out)
+
+
+def _ranges(starts, ends, offsets):
+    """
+    Concatenate the ranges offset + [start, end) of several runs.
+
+    Args:
+        starts: First indices of the ranges
+        ends: End indices (excluded) of the ranges
+        offsets: Offsets added to each range
+
+    Returns:
+        Array of the indices of all ranges, in order
+    """
+    lengths = ends - starts
+    total = int(np.sum(lengths))
+    if total == 0:
+        return np.empty(0, dtype=np.intp)
+    # Each range continues its predecessor by +1, except at the range starts
+    steps = np.ones(total, dtype=np.intp)
+    heads = np.cumsum(lengths) - lengths
+    valid = lengths > 0
+    first = (starts + offsets)[valid]
+    steps[heads[valid]] = first - np.r_[0, (ends + offsets)[valid][:-1] - 1]
+    return np.cumsum(steps)
+
+
+class CTMEngine:
+    """
+    Cell Transmission Model state of a corridor.
+
+    The engine advances a density array of shape (..., nx) in place. Leading
+    axes (e.g. an ensemble batch) are independent corridors. The moving
+    cells are tracked as runs of consecutive cells, whose nodes and cells
+    are gathered into index arrays, so a step costs a few array operations
+    on the moving cells whatever the number of runs. Cells outside the runs
+    keep their demand, supply and node flows, so the state must only be
+    modified through step().
+    """
+
+    # Fraction of moving cells above which a step updates the whole state
+    DENSE_FRACTION = 0.25
+
+    # Number of whole-state steps between two searches for runs
+    SPARSITY_CHECK = 8
+
+    def __init__(self, model, rho, dx, quality=None, tolerance=0.0):
+        """
+        Initialize the engine on a state.
+
+        Args:
+            model: LWR model providing demand() and supply()
+            rho: Density array of shape (..., nx), updated in place by step()
+            dx: Spatial step size (km)
+            quality: Road quality coefficients broadcasting against rho, or None
+            tolerance: Smallest density change (vehicles/km) applied to a cell
+        """
+        self.model = model
+        self.dx = dx
+        self.tolerance = tolerance
+        self.quality = None
+        if quality is not None:
+            self.quality = np.ascontiguousarray(np.broadcast_to(quality, rho.shape))
+        self.reset(rho)
+
+    def reset(self, rho):
+        """
+        Start from a new state, recomputing the demand and supply of every cell.
+
+        Args:
+            rho: Density array of shape (..., nx)
+        """
+        self.rho = rho
+        self.nx = rho.shape[-1]
+        self.flux = np.empty(rho.shape[:-1] + (self.nx + 1,), dtype=rho.dtype)
+        self.demand = np.asarray(self.model.demand(rho, quality=self.quality), dtype=rho.dtype)
+        self.supply = np.asarray(self.model.supply(rho, quality=self.quality), dtype=rho.dtype)
+        # Runs of moving cells as (corridor, first cell, end cell) rows, None for all cells
+        self.runs = None
+        self.dense_steps = 0
+
+    def step(self, rho, dt, flows=None):
+        """
+        Advance the state by one time step.
+
+        Args:
+            rho: Density array, the one given to the engine (a different
+                 array resets the engine first)
+            dt: Time step (h)
+            flows: Optional (inflow, outflow) row of BoundaryFlows, NaN for a
+                   zero-gradient side
+
+        Returns:
+            The updated density array
+        """
+        if rho is not self.rho:
+            self.reset(rho)
+        if flows is not None and self.runs is not None:
+            self.runs = self._boundary_runs(flows)
+        if self.runs is None:
+            self._dense_step(dt, flows)
+        else:
+            self._sparse_step(dt, flows)
+        return rho
+
+    def _boundary_flux(self, flux, demand, supply, flows):
+        """Replace the zero-gradient boundary fluxes by the boundary flows."""
+        inflow, outflow = flows[..., 0], flows[..., 1]
+        flux[..., 0] = np.where(np.isnan(inflow), flux[..., 0], np.minimum(inflow, supply[..., 0]))
+        flux[..., -1] = np.where(np.isnan(outflow), flux[..., -1], np.minimum(demand[..., -1], outflow))
+
+    def _boundary_runs(self, flows):
+        """Add the cells next to the active boundaries to the runs."""
+        n_rows = self.rho.size // self.nx
+        rows = np.arange(n_rows)
+        runs = [self.runs]
+        for side, (start, end) in enumerate(((0, 1), (self.nx - 1, self.nx))):
+            if not np.all(np.isnan(flows[..., side])):
+                runs.append(np.column_stack((rows, np.full(n_rows, start), np.full(n_rows, end))))
+        runs = np.concatenate(runs)
+        runs = runs[np.lexsort((runs[:, 1], runs[:, 0]))]
+
+        # Union of overlapping runs: a run starts a new one if it begins past
+        # the furthest end reached so far (offsetting the rows keeps them apart)
+        offsets = runs[:, 0] * (self.nx + 2)
+        reach = np.maximum.accumulate(offsets + runs[:, 2])
+        new = np.r_[True, offsets[1:] + runs[1:, 1] > reach[:-1]]
+        ends = np.maximum.reduceat(runs[:, 2], np.flatnonzero(new))
+        return self._merge_runs(np.column_stack((runs[new, :2], ends)))
+
+    def _dense_step(self, dt, flows=None):
+        """Update every node and cell."""
+        nx = self.nx
+        rho, flux = self.rho, self.flux
+        node_flux(self.demand[..., :-1], self.supply[..., 1:], out=flux[..., 1:nx])
+
+        # Zero-gradient boundary conditions, or the boundary flows
+        flux[..., 0] = flux[..., 1]
+        flux[..., nx] = flux[..., nx-1]
+        if flows is not None:
+            self._boundary_flux(flux, self.demand, self.supply, flows)
+
+        change = np.subtract(flux[..., 1:], flux[..., :-1])
+        change *= dt / self.dx
+
+        # While most cells move, runs are only looked for every few steps, and
+        # without a tolerance the moving cells are not needed in between
+        search = self.dense_steps % self.SPARSITY_CHECK == 0
+        self.dense_steps += 1
+        moving = np.abs(change) > self.tolerance if search or self.tolerance > 0 else None
+        if self.tolerance > 0:
+            updated = np.subtract(rho, change, out=change)
+            np.maximum(updated, 0, out=updated)
+            np.copyto(rho, updated, where=moving)
+        else:
+            np.subtract(rho, change, out=rho)
+            np.maximum(rho, 0, out=rho)
+
+        self.demand = np.asarray(self.model.demand(rho, quality=self.quality), dtype=rho.dtype)
+        self.supply = np.asarray(self.model.supply(rho, quality=self.quality), dtype=rho.dtype)
+        if not search or np.count_nonzero(moving) > self.DENSE_FRACTION * rho.size:
+            self.runs = None
+        else:
+            self.runs = self._merge_runs(self._find_runs(np.flatnonzero(moving)))
+
+    def _sparse_step(self, dt, flows=None):
+        """Update the nodes and cells next to the runs of moving cells."""
+        if len(self.runs) == 0:
+            return
+        nx = self.nx
+        rho = self.rho.reshape(-1)
+        flux = self.flux.reshape(-1, nx + 1)
+        demand = self.demand.reshape(-1)
+        supply = self.supply.reshape(-1)
+        rows, starts, ends = self.runs.T
+
+        # Interior nodes on both sides of the runs, gathered over all runs
+        # (merged runs leave a gap, so no node or cell is gathered twice)
+        first, last = np.maximum(starts, 1), np.minimum(ends, nx - 1) + 1
+        nodes = _ranges(first, last, rows * nx)
+        flux.reshape(-1)[nodes + nodes // nx] = node_flux(demand[nodes - 1], supply[nodes])
+
+        # Zero-gradient boundary conditions, or the boundary flows; the end
+        # nodes of the corridors without a run next to them keep their values
+        flux[:, 0] = flux[:, 1]
+        flux[:, nx] = flux[:, nx-1]
+        if flows is not None:
+            flows = np.broadcast_to(flows, self.rho.shape[:-1] + (2,)).reshape(-1, 2)
+            self._boundary_flux(flux, self.demand.reshape(-1, nx), self.supply.reshape(-1, nx), flows)
+
+        # Cells next to the updated nodes
+        cells = _ranges(first - 1, last, rows * nx)
+        outflow = cells + cells // nx + 1
+        change = flux.reshape(-1)[outflow] - flux.reshape(-1)[outflow - 1]
+        change *= dt / self.dx
+        moving = np.abs(change) > self.tolerance
+        updated = np.maximum(rho[cells] - change, 0)
+        cells, updated = cells[moving], updated[moving]
+        rho[cells] = updated
+
+        quality = None if self.quality is None else self.quality.reshape(-1)[cells]
+        demand[cells] = self.model.demand(updated, quality=quality)
+        supply[cells] = self.model.supply(updated, quality=quality)
+
+        self.runs = self._merge_runs(self._find_runs(cells))
+
+    def _find_runs(self, cells):
+        """
+        Find the runs of moving cells.
+
+        Args:
+            cells: Increasing flat indices of the moving cells in the state
+
+        Returns:
+            Array of (corridor, first cell, end cell) rows
+        """
+        if len(cells) == 0:
+            return np.empty((0, 3), dtype=np.intp)
+        # A run ends where the cells skip one or a new corridor starts
+        breaks = np.flatnonzero((np.diff(cells) != 1) | (cells[1:] % self.nx == 0)) + 1
+        heads = cells[np.r_[0, breaks]]
+        tails = cells[np.r_[breaks - 1, len(cells) - 1]] + 1
+        rows = heads // self.nx
+        return np.column_stack((rows, heads - rows * self.nx, tails - rows * self.nx))
+
+    def _merge_runs(self, runs):
+        """
+        Merge runs whose update windows touch.
+
+        The nodes and cells updated next to two runs must not overlap, which
+        needs a gap of at least two cells. Runs covering more than
+        DENSE_FRACTION of the cells switch to a whole-state update.
+
+        Args:
+            runs: Array of sorted (corridor, first cell, end cell) rows
+
+        Returns:
+            Array of merged runs, or None
+        """
+        if len(runs) > 1:
+            merge = (runs[1:, 0] == runs[:-1, 0]) & (runs[1:, 1] - runs[:-1, 2] < 2)
+            if np.any(merge):
+                runs = np.column_stack((
+                    runs[np.r_[True, ~merge], :2],
+                    runs[np.r_[~merge, True], 2]
+                ))
+        if np.sum(runs[:, 2] - runs[:, 1]) > self.DENSE_FRACTION * self.rho.size:
+            return None
+        return runs
+
+
+class CTMModel(LWRModel):
+    """
+    Cell Transmission Model of a corridor.
+
+    The model has the fundamental diagram, road quality handling and
+    simulation interface of LWRModel, with the Godunov (CTM) flux and
+    forward Euler steps, but advances its runs with a CTMEngine, which only
+    updates the cells next to the moving waves.
+    """
+
+    def __init__(self, v_max=100.0, rho_max=180.0, fundamental_diagram=None, tolerance=0.0):
+        """
+        Initialize the CTM with parameters.
+
+        Args:
+            v_max: Maximum velocity in free flow (km/h)
+            rho_max: Maximum density (vehicles/km)
+            fundamental_diagram: FundamentalDiagram instance; None builds a
+                                 Greenshields diagram from v_max and rho_max
+            tolerance: Smallest density change applied to a cell in one step,
+                       as a fraction of rho_max; the default 0 conserves
+                       the vehicles and reproduces LWRModel bit for bit
+
+        Raises:
+            ValueError: If the tolerance is negative
+        """
+        super().__init__(v_max=v_max, rho_max=rho_max, fundamental_diagram=fundamental_diagram)
+        if tolerance < 0:
+            raise ValueError(f"tolerance must be non-negative, got {tolerance}")
+        self.tolerance = tolerance
+
+    def numerical_methods(self):
+        """
+        Get the numerical methods of the solver.
+
+        Returns:
+            dict: Flux scheme, reconstruction, limiter and time integration
+                  names, and the density tolerance
+        """
+        return {**super().numerical_methods(), 'tolerance': self.tolerance}
+
+    def engine(self, rho, dx, quality=None):
+        """
+        Build the CTM engine of a state.
+
+        Args:
+            rho: Density array of shape (..., nx), advanced in place
+            dx: Spatial step size (km)
+            quality: Road quality coefficients of the cells, or None
+
+        Returns:
+            CTMEngine
+        """
+        tolerance = self.tolerance * float(self.rho_max)
+        return CTMEngine(self, rho, dx, quality, tolerance)
+
+    def _stepper(self, rho, dx, quality, signals=None, interfaces=None, boundary=None, sources=None):
+        """
+        Build the time step function (rho, dt) -> rho of a run.
+
+        Signals change the node flows of the cells they control at switching
+        times the engine cannot see, and sources change cell densities
+        outside the node updates, so runs with either take the full LWRModel
+        step.
+        """
+        if signals is not None or sources is not None:
+            return super()._stepper(rho, dx, quality, signals, interfaces, boundary, sources)
+        engine = self.engine(rho, dx, quality)
+        if boundary is None:
+            return engine.step
+        return clocked_step(lambda r, h, t: engine.step(r, h, boundary.at(t)))
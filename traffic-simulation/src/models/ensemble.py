@@ -0,0 +1,314 @@
+"""
+Ensemble Simulation
+
+This module runs many LWR or multiclass LWR simulations at once. The members
+share the grid and the time step but differ in their initial data, model
+parameters and road quality. Their states are stacked along a leading batch
+axis, (batch, nx) or (batch, n_classes, nx), and the parameters are stored as
+arrays broadcasting against it, so one NumPy pass advances the whole ensemble.
+
+The ensembles run through the simulate() and iter_simulate() of their base
+models, whose results gain the leading batch axis of the state.
+"""
+
+import copy
+import numpy as np
+from .lwr_model import LWRModel, evaluate_on_grid
+from .multiclass_lwr_model import MulticlassLWRModel
+from .fundamental_diagram import GreenshieldsDiagram
+
+
+def _infer_batch_size(batch_size, values):
+    """
+    Determine the ensemble size from per-member parameter arrays.
+
+    Args:
+        batch_size: Requested ensemble size, or None to infer it
+        values: Parameter arrays whose first axis is the member axis
+                (scalars and length-1 arrays are shared by all members)
+
+    Returns:
+        int: Number of members
+
+    Raises:
+        ValueError: If the sizes disagree or cannot be inferred
+    """
+    sizes = {np.shape(v)[0] for v in values if np.ndim(v) > 0}
+    if batch_size is not None:
+        sizes.add(int(batch_size))
+    if not sizes:
+        raise ValueError("Cannot infer the ensemble size; pass batch_size or per-member parameters")
+    members = sizes - {1}
+    if len(members) > 1:
+        raise ValueError(f"Inconsistent ensemble sizes in member parameters: {sorted(members)}")
+    return members.pop() if members else 1
+
+
+def _is_member_list(value, batch_size):
+    """Check whether a value is a list with one entry per member."""
+    return isinstance(value, (list, tuple)) and len(value) == batch_size
+
+
+class LWREnsemble(LWRModel):
+    """
+    Ensemble of LWR models advanced together on a (batch, nx) state.
+
+    The parameters of the fundamental diagram (v_max and rho_max, and w,
+    rho_c or v_c for the diagrams that have them) are stored as (batch, 1)
+    columns, so the inherited demand/supply and Godunov routines evaluate
+    all members in one broadcast. All members share the time step, i.e. the
+    CFL bound of the fastest member.
+    """
+
+    PARAMETERS = ('v_max', 'rho_max', 'w', 'rho_c', 'v_c')
+
+    def __init__(self, v_max=100.0, rho_max=180.0, batch_size=None, fundamental_diagram=None,
+                 flux_scheme='godunov', reconstruction='none', limiter='minmod', time_integration='euler'):
+        """
+        Initialize the ensemble.
+
+        Args:
+            v_max: Maximum velocity (km/h), scalar or one value per member
+            rho_max: Maximum density (vehicles/km), scalar or one value per member
+            batch_size: Number of members; inferred from the parameters if None
+            fundamental_diagram: FundamentalDiagram shared by the members, whose
+                                 parameters may hold one value per member (e.g.
+                                 TriangularDiagram(w=[15, 20, 25])); None builds
+                                 a Greenshields diagram from v_max and rho_max
+            flux_scheme: Numerical flux shared by all members
+            reconstruction: Interface reconstruction (see LWRModel)
+            limiter: Slope limiter of the MUSCL reconstruction
+            time_integration: Time integration method (see LWRModel)
+
+        Raises:
+            ValueError: If the ensemble size is inconsistent
+        """
+        if fundamental_diagram is None:
+            fundamental_diagram = GreenshieldsDiagram(v_max=v_max, rho_max=rho_max)
+        diagram = copy.copy(fundamental_diagram)
+        self.member_parameters = [name for name in self.PARAMETERS if name in vars(diagram)]
+        self.batch_size = _infer_batch_size(batch_size, [getattr(diagram, name) for name in self.member_parameters])
+        shape = (self.batch_size, 1)
+        for name in self.member_parameters:
+            values = np.asarray(getattr(diagram, name), dtype=float).reshape(-1, 1)
+            setattr(diagram, name, np.broadcast_to(values, shape).copy())
+        super().__init__(
+            fundamental_diagram=diagram,
+            flux_scheme=flux_scheme,
+            reconstruction=reconstruction,
+            limiter=limiter,
+            time_integration=time_integration
+        )
+
+    def member(self, index):
+        """
+        Build the stand-alone model of one member.
+
+        Args:
+            index: Member index
+
+        Returns:
+            LWRModel with the member's parameters
+        """
+        diagram = copy.copy(self.fundamental_diagram)
+        for name in self.member_parameters:
+            setattr(diagram, name, float(getattr(diagram, name)[index, 0]))
+        return LWRModel(fundamental_diagram=diagram, **self.numerical_methods())
+
+    def initial_state(self, initial_density, x):
+        """
+        Build the initial densities of all members.
+
+        Args:
+            initial_density: One initial condition (array or function) shared by
+                             all members, a list with one per member, or an
+                             array of shape (batch, nx)
+            x: Grid positions of shape (nx,)
+
+        Returns:
+            Density array of shape (batch, nx)
+        """
+        if _is_member_list(initial_density, self.batch_size):
+            return np.stack([super(LWREnsemble, self).initial_state(d, x) for d in initial_density])
+        rho = super().initial_state(initial_density, x)
+        return np.broadcast_to(rho, (self.batch_size, len(x))).copy()
+
+    def road_quality_profile(self, road_quality_func, x):
+        """
+        Evaluate the road quality of all members on the grid.
+
+        Args:
+            road_quality_func: Function of x shared by all members, or a list with
+                               one function per member
+            x: Grid positions of shape (nx,)
+
+        Returns:
+            Road quality coefficients of shape (batch, nx)
+        """
+        if _is_member_list(road_quality_func, self.batch_size):
+            return np.stack([evaluate_on_grid(f, x) for f in road_quality_func])
+        quality = super().road_quality_profile(road_quality_func, x)
+        return np.broadcast_to(quality, (self.batch_size, len(x)))
+
+    def _results_summary(self):
+        """Entries describing the ensemble at the top level of the results."""
+        return {'batch_size': self.batch_size}
+
+    def _parameters_summary(self):
+        """Model parameters of the run, with one value per member."""
+        return {
+            **super()._parameters_summary(),
+            **{name: getattr(self.fundamental_diagram, name)[:, 0].tolist() for name in self.member_parameters}
+        }
+
+
+class MulticlassLWREnsemble(MulticlassLWRModel):
+    """
+    Ensemble of multiclass LWR models advanced together on a
+    (batch, n_classes, nx) state.
+
+    Members share the vehicle classes but may override any class parameter
+    (v_max, rho_max, eta, beta, lambda_min) per member. class_parameters()
+    returns (batch, n_classes, 1) arrays, so the inherited flux, Jacobian and
+    velocity routines evaluate all members in one broadcast.
+    """
+
+    PARAMETERS = ('v_max', 'rho_max', 'eta', 'beta', 'lambda_min')
+
+    def __init__(self, vehicle_classes=None, n_classes=2, batch_size=None, flux_scheme='godunov',
+                 reconstruction='none', limiter='minmod', time_integration='euler', **member_params):
+        """
+        Initialize the ensemble.
+
+        Args:
+            vehicle_classes: Vehicle classes shared by all members (see MulticlassLWRModel)
+            n_classes: Number of vehicle classes
+            batch_size: Number of members; inferred from member_params if None
+            flux_scheme: Numerical flux shared by all members
+            reconstruction: Interface reconstruction (see MulticlassLWRModel)
+            limiter: Slope limiter of the MUSCL reconstruction
+            time_integration: Time integration method (see MulticlassLWRModel)
+            **member_params: Per-member class parameters, each either a sequence
+                             with one value per member (applied to all classes)
+                             or an array of shape (batch, n_classes)
+
+        Raises:
+            ValueError: For unknown parameters or inconsistent ensemble sizes
+        """
+        super().__init__(vehicle_classes=vehicle_classes, n_classes=n_classes, flux_scheme=flux_scheme,
+                         reconstruction=reconstruction, limiter=limiter, time_integration=time_integration)
+
+        unknown = set(member_params) - set(self.PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown vehicle class parameters: {sorted(unknown)}")
+
+        self.batch_size = _infer_batch_size(batch_size, member_params.values())
+
+        shape = (self.batch_size, self.n_classes, 1)
+        self._parameters = {}
+        for name, default in super().class_parameters().items():
+            if name in member_params:
+                values = np.asarray(member_params[name], dtype=float)
+                if values.ndim < 2:
+                    values = values.reshape(-1, 1)
+                values = values[..., None]
+            else:
+                values = default
+            self._parameters[name] = np.broadcast_to(values, shape).copy()
+
+        self.v_max = float(np.max(self._parameters['v_max']))
+        self.rho_max = float(np.max(self._parameters['rho_max']))
+
+    def class_parameters(self):
+        """
+        Per-member class parameters.
+
+        Returns:
+            dict: Arrays of shape (batch, n_classes, 1) for each parameter
+        """
+        return self._parameters
+
+    def with_dtype(self, dtype):
+        """
+        Get the ensemble computing in a given floating point precision.
+
+        Args:
+            dtype: Floating point type (None keeps the current precision)
+
+        Returns:
+            The ensemble itself if the precision is unchanged, else a shallow copy
+            with the member parameters cast
+        """
+        model = super().with_dtype(dtype)
+        if model is not self:
+            model._parameters = {name: values.astype(model.dtype) for name, values in self._parameters.items()}
+        return model
+
+    def member(self, index):
+        """
+        Build the stand-alone model of one member.
+
+        Args:
+            index: Member index
+
+        Returns:
+            MulticlassLWRModel with the member's class parameters
+        """
+        classes = [
+            {'name': vc.name, **{name: float(self._parameters[name][index, i, 0]) for name in self.PARAMETERS}}
+            for i, vc in enumerate(self.vehicle_classes)
+        ]
+        return MulticlassLWRModel(vehicle_classes=classes, n_classes=self.n_classes, **self.numerical_methods())
+
+    def initial_state(self, initial_density, x):
+        """
+        Build the initial class densities of all members.
+
+        Args:
+            initial_density: One initial condition shared by all members, a list
+                             with one per member, or an array of shape
+                             (batch, n_classes, nx)
+            x: Grid positions of shape (nx,)
+
+        Returns:
+            Class densities of shape (batch, n_classes, nx)
+        """
+        if (_is_member_list(initial_density, self.batch_size)
+                or (isinstance(initial_density, np.ndarray) and initial_density.ndim == 3)):
+            return np.stack([
+                super(MulticlassLWREnsemble, self).initial_state(d, x) for d in initial_density
+            ])
+        rho = super().initial_state(initial_density, x)
+        return np.broadcast_to(rho, (self.batch_size,) + rho.shape).copy()
+
+    def road_quality_profile(self, road_quality_func, x):
+        """
+        Evaluate the class-specific road quality of all members on the grid.
+
+        Args:
+            road_quality_func: Function of x shared by all members, or a list with
+                               one function per member
+            x: Grid positions of shape (nx,)
+
+        Returns:
+            Road quality coefficients of shape (batch, n_classes, nx)
+        """
+        lambda_min = self._parameters['lambda_min']
+        if road_quality_func is None:
+            return np.ones((self.batch_size, self.n_classes, len(x)))
+        if _is_member_list(road_quality_func, self.batch_size):
+            base_quality = np.stack([evaluate_on_grid(f, x) for f in road_quality_func])[:, None, :]
+        else:
+            base_quality = evaluate_on_grid(road_quality_func, x)
+        return lambda_min + (1.0 - lambda_min) * base_quality
+
+    def _results_summary(self):
+        """Entries describing the ensemble at the top level of the results."""
+        return {**super()._results_summary(), 'batch_size': self.batch_size}
+
+    def _parameters_summary(self):
+        """Model parameters of the run, with the class parameters of every member."""
+        return {
+            **super()._parameters_summary(),
+            'member_parameters': {name: values[..., 0].tolist() for name, values in self._parameters.items()}
+        }
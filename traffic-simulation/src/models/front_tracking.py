@@ -0,0 +1,470 @@
+"""
+Front Tracking
+
+This module solves the LWR model by wave-front tracking: with the flux
+replaced by its piecewise-linear interpolant on a mesh of density levels,
+the solution is a set of fronts moving at constant speeds between
+interactions. The end cells hold their initial densities, as in LWRModel.
+"""
+
+import heapq
+import itertools
+import numpy as np
+
+from .grid_free import GridFreeLWR
+
+
+class FrontTracker:
+    """
+    Fronts of a piecewise-constant LWR solution, advanced from interaction to
+    interaction.
+
+    Each front is stored once, with its birth time and position, speed,
+    left and right density levels and death time (inf while it moves), so
+    the stored fronts are the whole history of the solution.
+    """
+
+    def __init__(self, model, edges, states, domain, n_levels=256, quality=1.0, boundary=None):
+        """
+        Start the fronts of the initial jumps and of the road ends.
+
+        Args:
+            model: LWR model providing get_flow() and rho_max
+            edges: Increasing positions (km) of the jumps of the initial data,
+                   inside the road
+            states: Densities (vehicles/km) left of, between and right of the
+                    jumps, of shape (len(edges) + 1,)
+            domain: (left, right) ends of the road (km)
+            n_levels: Number of density intervals of the flux mesh
+            quality: Uniform road quality coefficient scaling the flux
+            boundary: (left, right) densities (vehicles/km) held beyond the
+                      ends, None for the end states of the initial data
+        """
+        rho_max = float(model.rho_max)
+        states = np.clip(np.asarray(states, dtype=float), 0.0, rho_max)
+        boundary = np.clip(np.asarray((states[0], states[-1]) if boundary is None else boundary,
+                                      dtype=float), 0.0, rho_max)
+        # The critical density is a level, so the mesh carries the capacity
+        critical = np.clip(float(model.critical_density()), 0.0, rho_max)
+        self.levels = np.unique(np.concatenate((np.linspace(0.0, rho_max, n_levels + 1), states,
+                                                boundary, [critical])))
+        self.flows = quality * np.asarray(model.get_flow(self.levels), dtype=float)
+        self.slopes = np.diff(self.flows) / np.diff(self.levels)
+        # Speeds closer than the tolerance belong to one front and never meet,
+        # so rounding errors cannot start endless interactions
+        self.speed_tolerance = 1e-9 * max(1.0, float(np.max(np.abs(self.slopes))))
+        self.concave = bool(np.all(np.diff(self.slopes) <= self.speed_tolerance))
+        self.domain = (float(domain[0]), float(domain[1]))
+        self.position_tolerance = 1e-12 * max(1.0, abs(self.domain[0]), abs(self.domain[1]))
+
+        # Fronts, one entry each for the whole run
+        self.x0, self.t0, self.t1, self.speed = [], [], [], []
+        self.left, self.right, self.prev, self.next = [], [], [], []
+        self.head = None
+        self.time = 0.0
+        self.n_interactions = 0
+        # Arrays of the fronts for sampling, rebuilt after changes
+        self._arrays = None
+
+        # Events (time, order, kind, front, neighbour), checked when popped
+        self.events = []
+        self._order = itertools.count()
+
+        # State left of all fronts, which fills the road once they are gone
+        levels = np.searchsorted(self.levels, states)
+        self.boundary = tuple(int(level) for level in np.searchsorted(self.levels, boundary))
+        self.outer_times = [0.0]
+        self.outer_levels = [int(levels[0])]
+
+        # Riemann problems of the initial jumps, left to right
+        previous = None
+        for edge, left, right in zip(edges, levels[:-1], levels[1:]):
+            if left != right:
+                previous = self._start(float(edge), 0.0, int(left), int(right), previous, None)
+        front = self.head
+        while front is not None:
+            self._schedule(front)
+            front = self.next[front]
+
+        # Riemann problems at the road ends
+        self._enter(0, 0.0, int(levels[0]), None, self.head)
+        last = self.head
+        while last is not None and self.next[last] is not None:
+            last = self.next[last]
+        self._enter(1, 0.0, int(levels[-1]), last, None)
+
+    @property
+    def n_fronts(self):
+        """Number of fronts created so far."""
+        return len(self.x0)
+
+    def riemann(self, left, right):
+        """
+        Solve a Riemann problem of the piecewise-linear flux.
+
+        The solution follows the lower convex envelope of the flux between
+        the states for a rising density and the upper concave envelope for a
+        falling one, with one front per segment of the envelope.
+
+        Args:
+            left: Density level on the left
+            right: Density level on the right
+
+        Returns:
+            list: (speed, left level, right level) of the fronts, by
+                  increasing speed
+        """
+        if left == right:
+            return []
+        if self.concave:
+            if left < right:
+                # A single shock
+                speed = (self.flows[right] - self.flows[left]) / (self.levels[right] - self.levels[left])
+                return [(float(speed), left, right)]
+            # A fan of all levels in between, merging (nearly) equal speeds
+            vertices = np.arange(left, right - 1, -1)
+            speeds = self.slopes[vertices[1:]]
+            keep = np.r_[True, np.diff(speeds) > self.speed_tolerance]
+            starts = vertices[:-1][keep]
+            ends = np.r_[starts[1:], right]
+            speeds = (self.flows[ends] - self.flows[starts]) / (self.levels[ends] - self.levels[starts])
+            return [(float(s), int(a), int(b)) for s, a, b in zip(speeds, starts, ends)]
+
+        # Envelope by the monotone chain over the levels in between
+        low, high = min(left, right), max(left, right)
+        sign = 1.0 if left < right else -1.0
+        hull = []
+        for k in range(low, high + 1):
+            while len(hull) >= 2:
+                i, j = hull[-2], hull[-1]
+                # Keep j only if the envelope turns at it by more than the tolerance
+                turn = sign * ((self.flows[k] - self.flows[i]) / (self.levels[k] - self.levels[i])
+                               - (self.flows[j] - self.flows[i]) / (self.levels[j] - self.levels[i]))
+                if turn > self.speed_tolerance:
+                    break
+                hull.pop()
+            hull.append(k)
+        if left > right:
+            hull.reverse()
+        return [(float((self.flows[b] - self.flows[a]) / (self.levels[b] - self.levels[a])), a, b)
+                for a, b in zip(hull[:-1], hull[1:])]
+
+    def _position(self, front, t):
+        """Position of a front at time t."""
+        return self.x0[front] + self.speed[front] * (t - self.t0[front])
+
+    def _start(self, x, t, left, right, previous, following):
+        """Start the fronts of a Riemann problem between two fronts (or road ends)."""
+        return self._insert(x, t, self.riemann(left, right), previous, following)
+
+    def _insert(self, x, t, fronts, previous, following):
+        """Start fronts (speed, left level, right level) at one point between two fronts."""
+        self._arrays = None
+        for speed, a, b in fronts:
+            front = len(self.x0)
+            self.x0.append(x)
+            self.t0.append(t)
+            self.t1.append(np.inf)
+            self.speed.append(speed)
+            self.left.append(a)
+            self.right.append(b)
+            self.prev.append(previous)
+            self.next.append(None)
+            if previous is None:
+                self.head = front
+            else:
+                self.next[previous] = front
+            previous = front
+        if previous is None:
+            self.head = following
+        else:
+            self.next[previous] = following
+        if following is not None:
+            self.prev[following] = previous
+        return previous
+
+    def _push(self, t, kind, front, neighbour=None):
+        heapq.heappush(self.events, (t, next(self._order), kind, front, neighbour))
+
+    def _schedule(self, front):
+        """Schedule the exit of a front and its meeting with the next one."""
+        speed = self.speed[front]
+        if speed != 0:
+            end = self.domain[0] if speed < 0 else self.domain[1]
+            self._push(max(self.t0[front] + (end - self.x0[front]) / speed, self.time), 'exit', front)
+        following = self.next[front]
+        if following is not None:
+            self._schedule_meeting(front, following)
+
+    def _schedule_meeting(self, a, b):
+        """Schedule the meeting of two neighbouring fronts, if they converge."""
+        closing = self.speed[a] - self.speed[b]
+        if closing > self.speed_tolerance:
+            t = ((self.x0[b] - self.speed[b] * self.t0[b]) - (self.x0[a] - self.speed[a] * self.t0[a])) / closing
+            self._push(max(t, self.time), 'meet', a, b)
+
+    def _end(self, front, t):
+        """End a front at time t."""
+        self.t1[front] = t
+        self._arrays = None
+
+    def _interact(self, a, b, t):
+        """Replace the fronts meeting at one point by those of the new Riemann problem."""
+        x = self._position(a, t)
+        first, last = a, b
+        # Fronts reaching the same point at the same time interact together
+        while self.prev[first] is not None and abs(self._position(self.prev[first], t) - x) <= self.position_tolerance:
+            first = self.prev[first]
+        while self.next[last] is not None and abs(self._position(self.next[last], t) - x) <= self.position_tolerance:
+            last = self.next[last]
+        front = first
+        while True:
+            self._end(front, t)
+            if front == last:
+                break
+            front = self.next[front]
+
+        previous, following = self.prev[first], self.next[last]
+        self._start(x, t, self.left[first], self.right[last], previous, following)
+        self.n_interactions += 1
+
+        # The new fronts may leave or meet their neighbours; without new
+        # fronts the neighbours may meet each other
+        start = self.head if previous is None else self.next[previous]
+        front = start
+        while front != following:
+            self._schedule(front)
+            front = self.next[front]
+        if previous is not None and start is not None:
+            self._schedule_meeting(previous, start)
+
+    def _enter(self, side, t, state, previous, following):
+        """
+        Solve the Riemann problem between a boundary state and the road end.
+
+        Only the fronts moving into the road are started; the others would
+        travel beyond the end, where the boundary state is held fixed.
+
+        Args:
+            side: 0 for the upstream end, 1 for the downstream end
+            t: Time (h)
+            state: Density level of the road at the end
+            previous: Front left of the new fronts (None at the upstream end)
+            following: Front right of the new fronts (None at the downstream end)
+        """
+        if side == 0:
+            fronts = [f for f in self.riemann(self.boundary[0], state) if f[0] > self.speed_tolerance]
+            self.outer_times.append(t)
+            self.outer_levels.append(fronts[0][1] if fronts else state)
+        else:
+            fronts = [f for f in self.riemann(state, self.boundary[1]) if f[0] < -self.speed_tolerance]
+        if not fronts:
+            return
+        self._insert(self.domain[side], t, fronts, previous, following)
+        first = self.head if previous is None else self.next[previous]
+        front = first
+        while front != following:
+            self._schedule(front)
+            front = self.next[front]
+        if previous is not None:
+            self._schedule_meeting(previous, first)
+
+    def _exit(self, front, t):
+        """Remove a front leaving the road, with the fronts beyond it."""
+        if self.speed[front] < 0:
+            following = self.next[front]
+            state = self.right[front]
+            while front is not None:
+                self._end(front, t)
+                front = self.prev[front]
+            self.head = following
+            if following is not None:
+                self.prev[following] = None
+            self._enter(0, t, state, None, following)
+        else:
+            previous = self.prev[front]
+            state = self.left[front]
+            while front is not None:
+                self._end(front, t)
+                front = self.next[front]
+            if previous is None:
+                self.head = None
+            else:
+                self.next[previous] = None
+            self._enter(1, t, state, previous, None)
+
+    def advance_to(self, t):
+        """
+        Process all interactions up to time t.
+
+        Args:
+            t: Time (h), not earlier than the current time
+        """
+        while self.events and self.events[0][0] <= t:
+            time, _, kind, front, neighbour = heapq.heappop(self.events)
+            if self.t1[front] != np.inf:
+                continue
+            self.time = time
+            if kind == 'meet':
+                if self.t1[neighbour] != np.inf or self.next[front] != neighbour:
+                    continue
+                self._interact(front, neighbour, time)
+            else:
+                self._exit(front, time)
+        self.time = max(self.time, t)
+
+    def _fronts(self):
+        """Arrays of all fronts created so far."""
+        if self._arrays is None:
+            self._arrays = (np.asarray(self.x0), np.asarray(self.t0), np.asarray(self.t1),
+                            np.asarray(self.speed), np.asarray(self.left, dtype=np.intp),
+                            np.asarray(self.right, dtype=np.intp))
+        return self._arrays
+
+    def sample(self, x, t):
+        """
+        Sample the solution on a (t, x) grid.
+
+        Times later than the current one are reached first; earlier ones are
+        read from the stored fronts. Points beyond the ends of the road get
+        the boundary states.
+
+        Args:
+            x: Positions (km) of shape (nx,)
+            t: Times (h) of shape (nt,), or a scalar
+
+        Returns:
+            Densities of shape (nt, nx), or (nx,) for a scalar time
+        """
+        x = np.asarray(x, dtype=float)
+        times = np.atleast_1d(np.asarray(t, dtype=float))
+        if times.size:
+            self.advance_to(float(np.max(times)))
+        x0, t0, t1, speed, left, right = self._fronts()
+        density = np.empty(times.shape + x.shape)
+        for n, time in enumerate(times):
+            alive = np.flatnonzero((t0 <= time) & (time < t1))
+            if alive.size == 0:
+                k = np.searchsorted(self.outer_times, time, side='right') - 1
+                density[n] = self.levels[self.outer_levels[k]]
+                continue
+            positions = x0[alive] + speed[alive] * (time - t0[alive])
+            order = np.lexsort((speed[alive], positions))
+            alive, positions = alive[order], positions[order]
+            index = np.searchsorted(positions, x, side='right')
+            states = np.concatenate(([left[alive[0]]], right[alive]))
+            density[n] = self.levels[states[index]]
+        # The boundary states are held beyond the ends
+        density[:, x < self.domain[0]] = self.levels[self.boundary[0]]
+        density[:, x > self.domain[1]] = self.levels[self.boundary[1]]
+        return density if np.ndim(t) else density[0]
+
+    def density(self, x, t):
+        """
+        Sample the solution at arbitrary points.
+
+        Args:
+            x: Positions (km)
+            t: Times (h), broadcasting against x
+
+        Returns:
+            Densities of the broadcast shape of x and t
+        """
+        x, t = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(t, dtype=float))
+        density = np.empty(x.shape)
+        times, inverse = np.unique(t, return_inverse=True)
+        inverse = inverse.reshape(t.shape)
+        for n, time in enumerate(times):
+            mask = inverse == n
+            density[mask] = self.sample(x[mask], time)
+        return density
+
+
+class FrontTrackingLWR(GridFreeLWR):
+    """
+    LWR model solved by wave-front tracking.
+
+    The model has the fundamental diagram and simulation interface of
+    LWRModel and returns the same results, but builds them from the fronts
+    of a FrontTracker, sampled on the output grid. The initial densities on
+    the grid are taken as piecewise constant over cells of width dx, so the
+    fronts start at the cell interfaces; the road quality must be uniform.
+    Densities are exact up to the level spacing of the mesh, to which the
+    initial states are added. Signals, boundary flows and sources are not
+    supported.
+    """
+
+    SOLVER_NAME = 'Front tracking'
+    BOUNDARY_FLOWS = False
+
+    def __init__(self, v_max=100.0, rho_max=180.0, fundamental_diagram=None, n_levels=256):
+        """
+        Initialize the model.
+
+        Args:
+            v_max: Maximum velocity in free flow (km/h)
+            rho_max: Maximum density (vehicles/km)
+            fundamental_diagram: FundamentalDiagram instance; None builds a
+                                 Greenshields diagram from v_max and rho_max
+            n_levels: Number of density intervals of the piecewise-linear flux
+
+        Raises:
+            ValueError: If n_levels is not positive
+        """
+        super().__init__(v_max=v_max, rho_max=rho_max, fundamental_diagram=fundamental_diagram)
+        if n_levels < 1:
+            raise ValueError(f"n_levels must be positive, got {n_levels}")
+        self.n_levels = int(n_levels)
+
+    def numerical_methods(self):
+        """
+        Get the numerical methods of the solver.
+
+        Returns:
+            dict: Solver name and number of density intervals
+        """
+        return {'flux_scheme': 'front_tracking', 'n_levels': self.n_levels}
+
+    def solve(self, initial_density, domain_length, dx, dt=None, cfl_factor=0.9,
+              road_quality_func=None, simulation_time=None, boundary_conditions=None):
+        """
+        Build the front tracker of an initial state.
+
+        See GridFreeLWR.solve(); the returned tracker computes the solution
+        lazily and samples it at any (x, t) with sample() or density(). dt
+        only sets the default output grid, by default the CFL step of the
+        initial state.
+
+        Returns:
+            tuple: (FrontTracker, grid positions, road quality on the grid or
+                   None, time step, None)
+
+        Raises:
+            ValueError: If the initial state is not one corridor, the road
+                        quality varies or boundary flows are given
+        """
+        self._check_supported(None, boundary_conditions, None)
+        x, rho, quality = self.corridor(initial_density, domain_length, dx, road_quality_func)
+
+        # The end cells keep their initial densities, as in LWRModel, and the
+        # jumps between the other cells lie on their interfaces
+        if len(x) < 3:
+            raise ValueError(f"Front tracking needs at least 3 cells, got {len(x)}")
+        inner = rho[1:-1]
+        jumps = np.flatnonzero(inner[1:] != inner[:-1]) + 1
+        edges = 0.5 * (x[jumps] + x[jumps + 1])
+        states = rho[np.r_[1, jumps + 1]]
+        domain = (x[0] + 0.5 * dx, x[-1] - 0.5 * dx)
+        tracker = FrontTracker(self, edges, states, domain, self.n_levels,
+                               1.0 if quality is None else float(quality[0]), (rho[0], rho[-1]))
+        if dt is None:
+            dt = self.calculate_dt(tracker.sample(x, 0.0), dx, cfl_factor, quality)
+        return tracker, x, quality, dt, None
+
+    def _sample(self, solution, x, t, dx):
+        """Densities of the front tracker at the points x and times t, shape (len(t), len(x))."""
+        return solution.sample(x, t)
+
+    def _solution_parameters(self, solution):
+        """Front counts of the run."""
+        return {'n_fronts': solution.n_fronts, 'n_interactions': solution.n_interactions}
@@ -1,17 +1,39 @@
 """
 Fundamental Diagram for Traffic Flow
 
-This module defines the fundamental diagram for traffic flow, including relationships
+This module defines the fundamental diagrams for traffic flow, including relationships
 between density, speed, and flow.
+
+All diagrams share one vectorized interface: flow, speed, demand (sending) and
+supply (receiving) functions, the critical density and the characteristic
+wave speeds. Methods accept scalars or arrays of any shape, and parameters may
+be arrays broadcasting against them (e.g. (batch, 1) columns for ensembles).
+For a unimodal flux the Godunov flux at an interface is then simply
+min(demand(ρ_L), supply(ρ_R)).
 """
 
+import copy
 import numpy as np
 
+
 class FundamentalDiagram:
     """
-    Class to represent the fundamental diagram of traffic flow.
+    Base class of the fundamental diagrams of traffic flow.
+
+    Subclasses implement speed(), and preferably closed forms of
+    critical_density() and wave_speed(); the base class derives the flow,
+    demand, supply, capacity and maximal wave speed from them. The base
+    class itself keeps the Greenshields speed law, so FundamentalDiagram()
+    remains a usable diagram (see GreenshieldsDiagram for the closed forms).
     """
 
+    # Number of samples used by the generic numerical fallbacks
+    N_SAMPLES = 1001
+
+    # Whether the flux is concave, so that q' is monotone and the extreme
+    # densities of a state bound the speeds of all the waves between them
+    concave = False
+
     def __init__(self, rho_max=180, v_max=100):
         """
         Initializes the fundamental diagram with maximum density and speed.
@@ -25,11 +47,8 @@ class FundamentalDiagram:
 
     def speed(self, rho):
         """
-        Speed-density relationship (Greenshields model):
-        v(ρ) = v_max * (1 - ρ/ρ_max)
-        
-        Cette relation linéaire décrite à l'équation \ref{eq:greenshields_vitesse}
-        représente la décroissance de la vitesse avec l'augmentation de la densité.
+        Speed-density relationship v(ρ), by default the Greenshields law
+        v(ρ) = v_max (1 - ρ/ρ_max).
 
         Args:
             rho: Traffic density (vehicles/km)
@@ -37,16 +56,11 @@ class FundamentalDiagram:
         Returns:
             Speed of traffic (km/h)
         """
-        return self.v_max * (1 - np.clip(rho / self.rho_max, 0, 1))
+        return self.v_max * (1 - np.clip(np.asarray(rho) / self.rho_max, 0, 1))
 
     def flow(self, rho):
         """
-        Flow-density relationship (Diagramme fondamental):
-        q(ρ) = ρ * v(ρ) = v_max * ρ * (1 - ρ/ρ_max)
-        
-        Cette relation parabolique décrite à l'équation \ref{eq:greenshields_flux}
-        donne le flux en fonction de la densité. Elle est nulle pour ρ = 0 et ρ = ρ_max,
-        et atteint son maximum à la densité critique ρ_c = ρ_max/2.
+        Flow-density relationship q(ρ) = ρ v(ρ).
 
         Args:
             rho: Traffic density (vehicles/km)
@@ -54,16 +68,24 @@ class FundamentalDiagram:
         Returns:
             Traffic flow (vehicles/h)
         """
-        return rho * self.speed(rho)
+        return np.asarray(rho) * self.speed(rho)
+
+    def _samples(self):
+        """Densities covering [0, rho_max] for the numerical fallbacks."""
+        return np.linspace(0.0, 1.0, self.N_SAMPLES) * np.asarray(self.rho_max)[..., None]
 
     def critical_density(self):
         """
         Calculates the critical density (density at maximum flow).
 
+        The generic version locates the maximum of the sampled flow.
+
         Returns:
             Critical density (vehicles/km)
         """
-        return self.rho_max / 2
+        samples = self._samples()
+        index = np.argmax(self.flow(samples), axis=-1)
+        return np.take_along_axis(samples, index[..., None], axis=-1)[..., 0]
 
     def capacity(self):
         """
@@ -73,3 +95,598 @@ class FundamentalDiagram:
             Maximum flow (vehicles/h)
         """
         return self.flow(self.critical_density())
+
+    def demand(self, rho):
+        """
+        Sending (demand) function: the flow in free flow, the capacity in congestion.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Demand (vehicles/h)
+        """
+        return self.flow(np.minimum(rho, self.critical_density()))
+
+    def supply(self, rho):
+        """
+        Receiving (supply) function: the capacity in free flow, the flow in congestion.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Supply (vehicles/h)
+        """
+        return self.flow(np.maximum(rho, self.critical_density()))
+
+    def wave_speed(self, rho):
+        """
+        Characteristic (kinematic wave) speed q'(ρ).
+
+        The generic version uses a central difference.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Wave speed (km/h)
+        """
+        rho = np.asarray(rho, dtype=float)
+        h = 1e-6 * np.asarray(self.rho_max)
+        return (self.flow(rho + h) - self.flow(np.maximum(rho - h, 0.0))) / (rho + h - np.maximum(rho - h, 0.0))
+
+    def max_wave_speed(self, rho=None):
+        """
+        Largest absolute characteristic speed, which bounds the CFL time step.
+
+        Waves between two states travel at the speeds q'(ρ) of the densities
+        in between, so unless the flux is concave the whole range from the
+        smallest to the largest density is sampled.
+
+        Args:
+            rho: Densities to consider, or None for the whole range [0, rho_max]
+
+        Returns:
+            float: max |q'(ρ)| (km/h)
+        """
+        if rho is None:
+            rho = self._samples()
+        elif not self.concave:
+            rho = np.linspace(np.min(rho), np.max(rho), self.N_SAMPLES)
+        return float(np.max(np.abs(self.wave_speed(rho))))
+
+    def with_dtype(self, dtype):
+        """
+        Copy of the diagram with its parameter arrays cast to a floating point type.
+
+        Args:
+            dtype: Floating point type
+
+        Returns:
+            Shallow copy of the diagram
+        """
+        diagram = copy.copy(self)
+        for name, value in vars(self).items():
+            if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+                setattr(diagram, name, value.astype(dtype))
+        return diagram
+
+
+class GreenshieldsDiagram(FundamentalDiagram):
+    """
+    Greenshields diagram: linear speed and parabolic flow,
+    v(ρ) = v_max (1 - ρ/ρ_max) and q(ρ) = v_max ρ (1 - ρ/ρ_max).
+    """
+
+    concave = True
+
+    def __init__(self, v_max=100.0, rho_max=180.0):
+        """
+        Initialize the diagram.
+
+        Args:
+            v_max: Free-flow speed (km/h)
+            rho_max: Jam density (vehicles/km)
+        """
+        super().__init__(rho_max=rho_max, v_max=v_max)
+
+    def speed(self, rho):
+        """
+        Speed-density relationship v(ρ) = v_max (1 - ρ/ρ_max), zero beyond ρ_max.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Speed of traffic (km/h)
+        """
+        ratio = np.asarray(rho) / self.rho_max
+        return np.maximum(0, self.v_max * (1 - ratio))
+
+    def critical_density(self):
+        """
+        Critical density ρ_c = ρ_max / 2.
+
+        Returns:
+            Critical density (vehicles/km)
+        """
+        return self.rho_max / 2.0
+
+    def wave_speed(self, rho):
+        """
+        Wave speed q'(ρ) = v_max (1 - 2ρ/ρ_max).
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Wave speed (km/h)
+        """
+        return self.v_max * (1 - 2 * np.asarray(rho) / self.rho_max)
+
+    def max_wave_speed(self, rho=None):
+        """
+        Largest absolute wave speed; q' is monotone, so only the extreme
+        densities matter.
+
+        Args:
+            rho: Densities to consider, or None for the whole range [0, rho_max]
+
+        Returns:
+            float: max |q'(ρ)| (km/h)
+        """
+        if rho is None:
+            return float(np.max(self.v_max))
+        return float(np.max(np.abs(self.wave_speed(rho))))
+
+
+class TriangularDiagram(FundamentalDiagram):
+    """
+    Triangular (Newell-Daganzo) diagram,
+    q(ρ) = min(v_max ρ, w (ρ_max - ρ)),
+    with free-flow speed v_max and backward wave speed w.
+    """
+
+    concave = True
+
+    def __init__(self, v_max=100.0, rho_max=180.0, w=20.0):
+        """
+        Initialize the diagram.
+
+        Args:
+            v_max: Free-flow speed (km/h)
+            rho_max: Jam density (vehicles/km)
+            w: Speed of the backward (congestion) waves (km/h, positive)
+        """
+        super().__init__(rho_max=rho_max, v_max=v_max)
+        self.w = w
+
+    def flow(self, rho):
+        """
+        Flow q(ρ) = min(v_max ρ, w (ρ_max - ρ)), zero beyond ρ_max.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Traffic flow (vehicles/h)
+        """
+        rho = np.asarray(rho)
+        return np.maximum(0, np.minimum(self.v_max * rho, self.w * (self.rho_max - rho)))
+
+    def speed(self, rho):
+        """
+        Speed v(ρ) = q(ρ)/ρ: v_max in free flow, w (ρ_max/ρ - 1) in congestion.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Speed of traffic (km/h)
+        """
+        rho = np.asarray(rho)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            congested = self.w * (self.rho_max / rho - 1)
+        return np.maximum(0, np.minimum(self.v_max, np.where(rho > 0, congested, self.v_max)))
+
+    def critical_density(self):
+        """
+        Critical density ρ_c = w ρ_max / (v_max + w).
+
+        Returns:
+            Critical density (vehicles/km)
+        """
+        return self.w * self.rho_max / (self.v_max + self.w)
+
+    def wave_speed(self, rho):
+        """
+        Wave speed: v_max below the critical density, -w above it.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Wave speed (km/h)
+        """
+        rho = np.asarray(rho)
+        return np.where(rho <= self.critical_density(), self.v_max, -self.w) + 0 * rho
+
+    def max_wave_speed(self, rho=None):
+        """
+        Largest absolute wave speed, max(v_max, w) over the whole range.
+
+        Args:
+            rho: Densities to consider, or None for the whole range [0, rho_max]
+
+        Returns:
+            float: max |q'(ρ)| (km/h)
+        """
+        if rho is None:
+            return float(np.max(np.maximum(self.v_max, self.w)))
+        return float(np.max(np.abs(self.wave_speed(rho))))
+
+
+class UnderwoodDiagram(FundamentalDiagram):
+    """
+    Underwood (exponential) diagram, v(ρ) = v_max exp(-ρ/ρ_c).
+
+    The flow peaks at the optimal density ρ_c; the diagram has no jam density
+    of its own, so rho_max only bounds the density range.
+    """
+
+    def __init__(self, v_max=100.0, rho_max=180.0, rho_c=45.0):
+        """
+        Initialize the diagram.
+
+        Args:
+            v_max: Free-flow speed (km/h)
+            rho_max: Maximum density of the road (vehicles/km)
+            rho_c: Optimal (critical) density (vehicles/km)
+        """
+        super().__init__(rho_max=rho_max, v_max=v_max)
+        self.rho_c = rho_c
+
+    def speed(self, rho):
+        """
+        Speed v(ρ) = v_max exp(-ρ/ρ_c).
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Speed of traffic (km/h)
+        """
+        return self.v_max * np.exp(-np.asarray(rho) / self.rho_c)
+
+    def critical_density(self):
+        """
+        Critical density, the optimal density ρ_c.
+
+        Returns:
+            Critical density (vehicles/km)
+        """
+        return self.rho_c
+
+    def wave_speed(self, rho):
+        """
+        Wave speed q'(ρ) = v_max exp(-ρ/ρ_c) (1 - ρ/ρ_c).
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Wave speed (km/h)
+        """
+        rho = np.asarray(rho)
+        return self.speed(rho) * (1 - rho / self.rho_c)
+
+
+class GreenbergDiagram(FundamentalDiagram):
+    """
+    Greenberg (logarithmic) diagram, v(ρ) = v_c ln(ρ_max/ρ), capped at v_max.
+
+    v_c is the speed at capacity, reached at ρ_c = ρ_max/e. The logarithmic
+    speed diverges at low densities, hence the free-flow cap.
+    """
+
+    concave = True
+
+    def __init__(self, v_max=100.0, rho_max=180.0, v_c=25.0):
+        """
+        Initialize the diagram.
+
+        Args:
+            v_max: Free-flow speed cap (km/h)
+            rho_max: Jam density (vehicles/km)
+            v_c: Speed at capacity (km/h), below v_max
+        """
+        super().__init__(rho_max=rho_max, v_max=v_max)
+        self.v_c = v_c
+
+    def speed(self, rho):
+        """
+        Speed v(ρ) = min(v_max, v_c ln(ρ_max/ρ)), zero beyond ρ_max.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Speed of traffic (km/h)
+        """
+        rho = np.asarray(rho)
+        with np.errstate(divide='ignore'):
+            logarithmic = self.v_c * np.log(self.rho_max / np.maximum(rho, 0))
+        return np.maximum(0, np.minimum(self.v_max, logarithmic))
+
+    def critical_density(self):
+        """
+        Critical density ρ_c = ρ_max / e.
+
+        Returns:
+            Critical density (vehicles/km)
+        """
+        return self.rho_max / np.e
+
+    def wave_speed(self, rho):
+        """
+        Wave speed: v_max where the speed is capped, v_c (ln(ρ_max/ρ) - 1) elsewhere.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Wave speed (km/h)
+        """
+        rho = np.asarray(rho)
+        with np.errstate(divide='ignore'):
+            log_ratio = np.log(self.rho_max / np.maximum(rho, 0))
+        capped = self.v_c * log_ratio >= self.v_max
+        return np.where(capped, self.v_max, self.v_c * (log_ratio - 1))
+
+
+class TabulatedDiagram(FundamentalDiagram):
+    """
+    Piecewise-linear diagram through sampled (density, flow) points.
+
+    Suited to empirically calibrated diagrams without a closed form: the flux
+    is sampled once (see from_function()) and the demand, supply and flow
+    tables and the critical point are precomputed. The demand and supply
+    tables are the running maxima of the flow from the left and from the
+    right, so the demand/supply flux remains well defined (and exact for a
+    unimodal table).
+
+    Tables are evaluated with np.interp, whose search starts from the
+    previous segment and is therefore very cheap on spatially coherent
+    traffic states. Uniform tables may use index arithmetic instead (segment
+    = ρ/Δρ), whose cost does not depend on the ordering of the densities and
+    which keeps float32 states in float32.
+    """
+
+    # Rows of the precomputed tables
+    FLOW, DEMAND, SUPPLY = 0, 1, 2
+
+    LOOKUPS = ('interp', 'index')
+
+    def __init__(self, densities, flows, lookup='interp'):
+        """
+        Initialize the diagram from sample points.
+
+        Args:
+            densities: Increasing densities starting at 0 (vehicles/km)
+            flows: Flows at these densities (vehicles/h)
+            lookup: Table evaluation, 'interp' (np.interp) or 'index'
+                    (index arithmetic, uniform tables only)
+
+        Raises:
+            ValueError: If the table or the lookup is not valid
+        """
+        densities = np.asarray(densities, dtype=float)
+        flows = np.asarray(flows, dtype=float)
+        if densities.ndim != 1 or densities.shape != flows.shape or len(densities) < 2:
+            raise ValueError("densities and flows must be 1D arrays of the same length (at least 2)")
+        if densities[0] != 0 or np.any(np.diff(densities) <= 0):
+            raise ValueError("densities must start at 0 and be strictly increasing")
+        if np.any(flows < 0):
+            raise ValueError("flows must be non-negative")
+        if lookup not in self.LOOKUPS:
+            raise ValueError(f"lookup must be one of {self.LOOKUPS}, got {lookup!r}")
+
+        self.densities = densities
+        self.flows = flows
+        self.slopes = np.diff(flows) / np.diff(densities)
+        # A table with decreasing slopes is concave and gets the cheaper
+        # CFL bound at the cell states
+        self.concave = bool(np.all(np.diff(self.slopes) <= 1e-9 * np.max(np.abs(self.slopes))))
+
+        # Flow, demand and supply tables with the increments between nodes
+        self.tables = np.stack([
+            flows,
+            np.maximum.accumulate(flows),
+            np.maximum.accumulate(flows[::-1])[::-1]
+        ])
+        self.increments = np.diff(self.tables, axis=1)
+        self.rho_c = float(densities[np.argmax(flows)])
+
+        # Grid spacing of the index lookup (None for np.interp)
+        self.spacing = None
+        if lookup == 'index':
+            spacing = densities[-1] / (len(densities) - 1)
+            if not np.allclose(np.diff(densities), spacing, rtol=1e-9, atol=0):
+                raise ValueError("lookup='index' requires uniformly spaced densities")
+            self.spacing = float(spacing)
+
+        # The free-flow speed is the slope of the first segment
+        super().__init__(rho_max=float(densities[-1]), v_max=float(self.slopes[0]))
+
+    @classmethod
+    def from_function(cls, flow_function, rho_max, n_points=1001, lookup='interp'):
+        """
+        Tabulate a flow function on a uniform density grid.
+
+        The function is evaluated once, on the whole grid if it accepts
+        arrays and point by point otherwise, so arbitrary (e.g. fitted)
+        Python functions cost nothing at run time.
+
+        Args:
+            flow_function: Function of density returning the flow (vehicles/h)
+            rho_max: Maximum density (vehicles/km)
+            n_points: Number of table points
+            lookup: Table evaluation, 'interp' or 'index' (see __init__())
+
+        Returns:
+            TabulatedDiagram
+
+        Raises:
+            ValueError: If fewer than 2 points are requested
+        """
+        # Imported here, as the LWR model itself depends on this module
+        from .lwr_model import evaluate_on_grid
+
+        if n_points < 2:
+            raise ValueError(f"n_points must be at least 2, got {n_points}")
+        densities = np.linspace(0.0, float(rho_max), n_points)
+        flows = evaluate_on_grid(flow_function, densities)
+        # Fitted functions may dip slightly below zero at the ends
+        return cls(densities, np.maximum(flows, 0.0), lookup=lookup)
+
+    @property
+    def demand_table(self):
+        """Demand at the table densities (vehicles/h)."""
+        return self.tables[self.DEMAND]
+
+    @property
+    def supply_table(self):
+        """Supply at the table densities (vehicles/h)."""
+        return self.tables[self.SUPPLY]
+
+    def _segments(self, rho):
+        """
+        Locate densities on a uniform table by index arithmetic.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            tuple: (segment indices, position within each segment in [0, 1])
+        """
+        position = np.clip(rho, 0, self.rho_max) / self.spacing
+        index = np.minimum(position.astype(np.intp), len(self.densities) - 2)
+        return index, position - index.astype(position.dtype)
+
+    def _interpolate(self, rho, row):
+        """
+        Interpolate one of the precomputed tables.
+
+        Densities outside [0, rho_max] take the end values. The result keeps
+        the precision of a float32 state.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+            row: Table row (FLOW, DEMAND or SUPPLY)
+
+        Returns:
+            Interpolated values
+        """
+        table = self.tables[row]
+        if self.spacing is None:
+            values = np.interp(rho, self.densities, table)
+            return values.astype(np.result_type(rho, table), copy=False)
+        index, fraction = self._segments(np.asarray(rho))
+        return table[index] + fraction * self.increments[row][index]
+
+    def flow(self, rho):
+        """
+        Flow interpolated in the table.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Traffic flow (vehicles/h)
+        """
+        return self._interpolate(rho, self.FLOW)
+
+    def speed(self, rho):
+        """
+        Speed q(ρ)/ρ, with the free-flow speed at ρ = 0.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Speed of traffic (km/h)
+        """
+        rho = np.asarray(rho)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            speed = self.flow(rho) / rho
+        return np.where(rho > 0, speed, self.v_max)
+
+    def critical_density(self):
+        """
+        Critical density, the table point of maximum flow.
+
+        Returns:
+            Critical density (vehicles/km)
+        """
+        return self.rho_c
+
+    def demand(self, rho):
+        """
+        Demand interpolated in the precomputed demand table.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Demand (vehicles/h)
+        """
+        return self._interpolate(rho, self.DEMAND)
+
+    def supply(self, rho):
+        """
+        Supply interpolated in the precomputed supply table.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Supply (vehicles/h)
+        """
+        return self._interpolate(rho, self.SUPPLY)
+
+    def wave_speed(self, rho):
+        """
+        Slope of the table segment containing each density.
+
+        Args:
+            rho: Traffic density (vehicles/km)
+
+        Returns:
+            Wave speed (km/h)
+        """
+        if self.spacing is None:
+            index = np.searchsorted(self.densities, rho, side='right') - 1
+            return self.slopes[np.clip(index, 0, len(self.slopes) - 1)]
+        return self.slopes[self._segments(np.asarray(rho))[0]]
+
+    def max_wave_speed(self, rho=None):
+        """
+        Largest absolute slope of the segments spanned by the densities.
+
+        Waves between two states travel at the slopes in between, so all
+        segments from the smallest to the largest density are considered;
+        LWRModel.calculate_dt uses this bound for non-concave tables.
+
+        Args:
+            rho: Densities to consider, or None for the whole table
+
+        Returns:
+            float: max |q'(ρ)| (km/h)
+        """
+        if rho is None:
+            return float(np.max(np.abs(self.slopes)))
+        lower, upper = np.searchsorted(self.densities, [np.min(rho), np.max(rho)], side='right') - 1
+        lower = min(max(lower, 0), len(self.slopes) - 1)
+        upper = min(max(upper, lower), len(self.slopes) - 1)
+        return float(np.max(np.abs(self.slopes[lower:upper + 1])))
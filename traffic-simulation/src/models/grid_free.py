@@ -0,0 +1,241 @@
+"""
+Grid-Free LWR Solvers
+
+This module provides the simulation driver shared by the LWR solvers that
+compute a solution once and sample it at any (x, t), with no time marching.
+"""
+
+import numpy as np
+
+from .lwr_model import LWRModel
+from ..utils.boundary_conditions import corridor_flow_frames
+from ..utils.time_stepping import output_time_grid, unbounded_time_grid
+from ..utils.results_store import allocate_results
+
+
+class GridFreeLWR(LWRModel):
+    """
+    Base class of the grid-free LWR solvers (front tracking, Lax-Hopf,
+    Newell's method).
+
+    A subclass implements solve(), which builds the solution of a run, and
+    may override _sample(), which evaluates its cell densities; this class
+    turns them into the iter_simulate() and simulate() interface of LWRModel.
+    Solutions provide advance_to(t), computing them up to time t, and
+    count(x, t), the cumulative count read by the default _sample().
+    """
+
+    # Name of the solver in error messages
+    SOLVER_NAME = 'The grid-free solver'
+
+    # Whether the solver takes boundary flows
+    BOUNDARY_FLOWS = True
+
+    # Number of grid points sampled together, bounding the temporary arrays
+    SAMPLE_POINTS = 4096
+
+    def solve(self, initial_density, domain_length, dx, dt=None, cfl_factor=0.9,
+              road_quality_func=None, simulation_time=None, boundary_conditions=None):
+        """
+        Build the solution of a run.
+
+        Args:
+            initial_density: Initial density distribution (array or function)
+            domain_length: Length of the spatial domain (km)
+            dx: Spatial step size (km) of the grid of the initial state
+            dt: Time resolution (h) of the output grid and the boundary flows,
+                None for the solver's default
+            cfl_factor: Safety factor of the CFL step (0-1)
+            road_quality_func: Uniform road quality (function or values on the
+                               grid), or None
+            simulation_time: Simulated time (h) sizing the boundary flow table,
+                             or None to extend it on demand
+            boundary_conditions: (inflow, outflow) pair of upstream demand and
+                                 downstream supply profiles, None for a
+                                 zero-gradient side (see LWRModel.simulate())
+
+        Returns:
+            tuple: (solution, grid positions, road quality on the grid or None,
+                   time step, BoundaryFlows or None)
+        """
+        raise NotImplementedError
+
+    def corridor(self, initial_density, domain_length, dx, road_quality_func=None):
+        """
+        Build the grid, initial state and road quality of a corridor.
+
+        Args:
+            initial_density: Initial density distribution (array or function)
+            domain_length: Length of the spatial domain (km)
+            dx: Spatial step size (km)
+            road_quality_func: Uniform road quality (function or values on the
+                               grid), or None
+
+        Returns:
+            tuple: (grid positions, initial densities, road quality on the grid
+                   or None)
+
+        Raises:
+            ValueError: If the initial state is not one corridor or the road
+                        quality varies
+        """
+        nx = int(domain_length / dx) + 1
+        x = np.linspace(0, domain_length, nx)
+        rho = self.initial_state(initial_density, x)
+        if rho.shape != x.shape:
+            raise ValueError(f"{self.SOLVER_NAME} solves one corridor, got a state of shape {rho.shape}")
+
+        quality = None
+        if road_quality_func is not None:
+            quality = self.road_quality_profile(road_quality_func, x)
+            if np.ptp(quality) > 0:
+                raise ValueError(f"{self.SOLVER_NAME} needs a uniform road quality")
+        return x, rho, quality
+
+    def _sample(self, solution, x, t, dx):
+        """
+        Densities of the cells of width dx around x at times t.
+
+        The default differences the cumulative counts of the solution at the
+        cell interfaces, which neighbouring grid cells share.
+
+        Args:
+            solution: Solution returned by solve()
+            x: Cell positions (km) of shape (nx,)
+            t: Times (h) of shape (nt,)
+            dx: Cell width (km)
+
+        Returns:
+            Densities of shape (nt, nx)
+        """
+        t = np.asarray(t, dtype=float)[:, None]
+        if len(x) > 1 and np.allclose(np.diff(x), dx):
+            edges = np.r_[x - 0.5 * dx, x[-1] + 0.5 * dx]
+            return -np.diff(solution.count(edges[None, :], t), axis=1) / dx
+        return solution.density(x[None, :], t, dx)
+
+    def _solution_results(self, solution, dt):
+        """Entries of the results of simulate() describing the solution."""
+        return {}
+
+    def _solution_parameters(self, solution):
+        """Parameters of the results of simulate() describing the solution."""
+        return {}
+
+    def _check_supported(self, signals, boundary_conditions, sources):
+        """Reject the inputs that the solver does not model."""
+        if signals is not None and len(signals) > 0:
+            raise ValueError(f"{self.SOLVER_NAME} does not support traffic signals")
+        if (not self.BOUNDARY_FLOWS and boundary_conditions is not None
+                and any(bc is not None for bc in boundary_conditions)):
+            raise ValueError(f"{self.SOLVER_NAME} does not support boundary flows")
+        if sources is not None and len(sources) > 0:
+            raise ValueError(f"{self.SOLVER_NAME} does not support source terms")
+
+    def iter_simulate(self, initial_density, domain_length, simulation_time, dx, dt=None,
+                      cfl_factor=0.9, road_quality_func=None, adaptive=False, cfl_every=1,
+                      output_times=None, save_interval=None, dtype=None, signals=None,
+                      boundary_conditions=None, sources=None):
+        """
+        Solve the model lazily, yielding one frame at each output time.
+
+        See LWRModel.iter_simulate(); the time step (see solve()) only sets
+        the default output grid and the time resolution of the boundary
+        flows, and each yielded frame is a new array.
+
+        Yields:
+            tuple: (t, density) for each output frame
+        """
+        self._check_supported(signals, boundary_conditions, sources)
+        solver = self.with_dtype(dtype)
+        solution, x, _, dt, _ = solver.solve(initial_density, domain_length, dx, dt, cfl_factor,
+                                             road_quality_func, simulation_time, boundary_conditions)
+        if simulation_time is not None and np.isfinite(simulation_time):
+            times = output_time_grid(simulation_time, dt, adaptive, output_times, save_interval)
+        else:
+            times = unbounded_time_grid(dt, adaptive, output_times, save_interval)
+        for t in times:
+            yield t, solver._sample(solution, x, [t], dx)[0].astype(solver.dtype)
+
+    def simulate(self, initial_density, domain_length, simulation_time, dx, dt=None,
+                 cfl_factor=0.9, road_quality_func=None, adaptive=False, cfl_every=1,
+                 output_times=None, save_interval=None, detectors=None, output_dir=None,
+                 dtype=None, signals=None, boundary_conditions=None, sources=None):
+        """
+        Solve the model and sample its solution on the output grid.
+
+        The arguments and results are those of LWRModel.simulate(). The time
+        step (see solve()) sets the default output grid of one frame per step
+        and the time resolution of the detectors and boundary flows;
+        cfl_every is not used and adaptive only selects the default grid.
+
+        Returns:
+            SimulationResults storing the densities, with velocities and flows
+            derived on first access
+
+        Raises:
+            ValueError: If an input is not supported by the solver
+        """
+        if simulation_time is None:
+            raise ValueError("simulate() needs a finite simulation_time; use iter_simulate() to stream")
+        self._check_supported(signals, boundary_conditions, sources)
+
+        solver = self.with_dtype(dtype)
+        solution, x, quality, dt, boundary = solver.solve(initial_density, domain_length, dx, dt,
+                                                          cfl_factor, road_quality_func,
+                                                          simulation_time, boundary_conditions)
+        t = output_time_grid(simulation_time, dt, adaptive, output_times, save_interval)
+        solution.advance_to(simulation_time)
+
+        fields = {'density': (len(t), len(x))}
+        if quality is not None:
+            fields['road_quality'] = quality.shape
+        writer, arrays = allocate_results(fields, output_dir, x, t, solver.dtype)
+        density = arrays['density']
+        if quality is not None:
+            arrays['road_quality'][...] = quality
+        # Frames in blocks keep the sampled arrays to about SAMPLE_POINTS per row
+        block = max(1, self.SAMPLE_POINTS // len(x))
+        for n in range(0, len(t), block):
+            density[n:n + block] = solver._sample(solution, x, t[n:n + block], dx)
+
+        results = {
+            'density': density,
+            'road_quality': arrays.get('road_quality'),
+            'grid_x': x,
+            'grid_t': t,
+            **self._solution_results(solution, dt),
+            'parameters': {
+                **self._parameters_summary(),
+                'dx': dx,
+                'dt': dt,
+                'adaptive': adaptive,
+                'domain_length': domain_length,
+                'simulation_time': simulation_time,
+                'dtype': solver.dtype.name,
+                **self._solution_parameters(solution)
+            }
+        }
+        if boundary is not None:
+            results['boundary_flows'] = corridor_flow_frames(boundary, t)
+
+        if detectors is not None:
+            # Detectors read the cells at the resolution of the time step
+            positions = np.atleast_1d(np.asarray(detectors, dtype=float))
+            indices = np.abs(x[None, :] - positions[:, None]).argmin(axis=1)
+            detector_t = output_time_grid(simulation_time, dt)
+            detector_density = solver._sample(solution, x[indices], detector_t, dx).astype(solver.dtype)
+            detector_quality = None if quality is None else quality[indices]
+            results['detectors'] = {
+                'x': x[indices],
+                'grid_t': detector_t,
+                'density': detector_density,
+                'velocity': solver.get_velocity(detector_density, detector_quality),
+                'flow': solver.get_flow(detector_density, detector_quality)
+            }
+
+        if writer is not None:
+            writer.finalize(results['parameters'], detectors=results.get('detectors'))
+            results['results_dir'] = output_dir
+
+        return solver.lazy_results(results)
@@ -0,0 +1,393 @@
+"""
+Lax-Hopf Solver
+
+This module solves the LWR model through the Lax-Hopf formula for the
+cumulative vehicle count N(x, t), evaluated only at the query points with no
+grid, so sparse queries on long roads cost a fraction of a full simulation.
+"""
+
+import numpy as np
+
+from .grid_free import GridFreeLWR
+from ..utils.boundary_conditions import BoundaryFlows
+
+# Number of query points evaluated together, bounding the temporary arrays
+QUERY_CHUNK = 256
+
+
+class MoskowitzFunction:
+    """
+    Cumulative vehicle counts of an LWR solution, evaluated by the Lax-Hopf
+    formula at arbitrary points.
+
+    N(x, t) is the minimum over the initial and boundary counts N(y, τ) of
+    N(y, τ) + (t - τ) R((x - y)/(t - τ)), where R(u) = max_ρ [Q(ρ) - u ρ] is
+    exact for the piecewise-linear interpolant of the flux on a mesh of
+    density levels. The initial counts are piecewise affine over the cells,
+    and the boundary counts piecewise affine over the steps of the boundary
+    flow table; the boundary counts are extended on demand as later times
+    are queried. A zero-gradient side extends the road with its initial end
+    state.
+    """
+
+    def __init__(self, model, edges, densities, n_levels=256, quality=1.0,
+                 boundary=None, spacing=None):
+        """
+        Set up the value conditions of an initial state.
+
+        Args:
+            model: LWR model providing get_flow(), rho_max and fundamental_diagram
+            edges: Increasing cell interfaces (km), of shape (n_cells + 1,)
+            densities: Cell densities (vehicles/km), of shape (n_cells,)
+            n_levels: Number of density intervals of the flux mesh
+            quality: Uniform road quality coefficient scaling the flux
+            boundary: BoundaryFlows of the (inflow, outflow) profiles, or None
+                      for zero-gradient boundaries
+            spacing: Length (h) of the boundary steps, the spacing of the
+                     boundary flow table
+
+        Raises:
+            ValueError: If the flux is not concave
+        """
+        rho_max = float(model.rho_max)
+        densities = np.clip(np.asarray(densities, dtype=float), 0.0, rho_max)
+        edges = np.asarray(edges, dtype=float)
+        mesh = np.union1d(np.linspace(0.0, rho_max, n_levels + 1),
+                          [model.fundamental_diagram.critical_density()])
+        slopes = np.diff(np.asarray(model.get_flow(mesh), dtype=float)) / np.diff(mesh)
+        if np.any(np.diff(slopes) > 1e-9 * max(1.0, float(np.max(np.abs(slopes))))):
+            raise ValueError("The Lax-Hopf formula needs a concave fundamental diagram")
+        # The initial states join the mesh unless they nearly coincide with a
+        # level, whose chord slopes would be lost to rounding
+        levels = np.union1d(mesh, densities)
+        self.levels = levels[np.r_[True, np.diff(levels) > 1e-6 * rho_max]]
+        self.flows = quality * np.asarray(model.get_flow(self.levels), dtype=float)
+        # The observer costs need sorted slopes, so rounding must not unsort them
+        slopes = np.minimum.accumulate(np.diff(self.flows) / np.diff(self.levels))
+        # Observer costs R(u) = flows[k] - u levels[k], k the number of slopes above u
+        self._descending = -slopes
+        self.fastest, self.slowest = float(slopes[0]), float(slopes[-1])
+        self.domain = (float(edges[0]), float(edges[-1]))
+
+        # Initial counts N0(y) = intercept - ρ y on each block of equal cells,
+        # with N0 = 0 upstream
+        counts = np.concatenate(([0.0], -np.cumsum(densities * np.diff(edges))))
+        self.edges, self.initial_counts = edges, counts
+        starts = np.r_[0, np.flatnonzero(densities[1:] != densities[:-1]) + 1]
+        lower, upper = edges[starts], edges[np.r_[starts[1:], len(densities)]]
+        densities = densities[starts]
+        intercepts = counts[starts] + densities * lower
+        # Zero-gradient sides extend the road with its end states
+        open_ends = (True, True) if boundary is None else tuple(
+            profile is None for profile in boundary.profiles)
+        if open_ends[0]:
+            lower, upper = np.r_[-np.inf, lower], np.r_[edges[0], upper]
+            densities, intercepts = np.r_[densities[0], densities], np.r_[intercepts[0], intercepts]
+        if open_ends[1]:
+            lower, upper = np.r_[lower, edges[-1]], np.r_[upper, np.inf]
+            densities, intercepts = np.r_[densities, densities[-1]], np.r_[intercepts, intercepts[-1]]
+        self.lower, self.upper = lower, upper
+        self.densities, self.intercepts = densities, intercepts
+        # Characteristic speed of each block, the slope of the flux segment
+        # holding its density (or next to it for a density on a level)
+        segment = np.clip(np.searchsorted(self.levels, densities, side='right') - 1, 0, len(slopes) - 1)
+        self.speeds = slopes[segment]
+
+        # Boundary counts: start value, flow and optimal observer speed of each step
+        self.boundary = boundary
+        self.open_ends = open_ends
+        self.spacing = None if boundary is None else float(spacing)
+        self.n_steps = 0
+        self._start = np.zeros((1, 2))
+        self._start[0] = (counts[0], counts[-1])
+        self._flow = np.zeros((0, 2))
+        self._observer = np.zeros((0, 2))
+
+    def _legendre(self, u):
+        """Observer cost R(u) (vehicles/h) of a speed u (km/h)."""
+        k = np.searchsorted(self._descending, -u)
+        return self.flows[k] - u * self.levels[k]
+
+    def _perspective(self, d, s):
+        """Cost s R(d/s) of moving d (km) in s (h), including its limit at s = 0."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = np.where(s > 0, d / np.where(s > 0, s, 1.0), np.sign(d) * np.inf)
+        k = np.searchsorted(self._descending, -u)
+        return s * self.flows[k] - d * self.levels[k]
+
+    def _observer_speeds(self, flow, upstream):
+        """
+        Speeds of the observers leaving a boundary step at minimal cost.
+
+        From the upstream end the optimum follows the free-flow characteristic
+        carrying the boundary flow, from the downstream end the congested one;
+        a flow at or above capacity makes the cost decrease with the travel
+        time, marked by a zero speed.
+        """
+        slopes = -self._descending
+        peak = int(np.argmax(self.flows))
+        if upstream:
+            k = np.searchsorted(self.flows[:peak + 1], flow, side='left') - 1
+            speed = slopes[np.clip(k, 0, len(slopes) - 1)]
+            return np.where(k >= peak, 0.0, speed)
+        congested = self.flows[peak:][::-1]
+        m = len(congested) - np.searchsorted(congested, flow, side='left')
+        speed = slopes[np.minimum(peak + m - 1, len(slopes) - 1)]
+        return np.where(m == 0, 0.0, speed)
+
+    def _grow(self, n_steps):
+        """Make room for n_steps boundary steps."""
+        if n_steps > len(self._flow):
+            size = max(n_steps, 2 * len(self._flow), 64)
+            self._start = np.concatenate((self._start, np.zeros((size + 1 - len(self._start), 2))))
+            self._flow = np.concatenate((self._flow, np.zeros((size - len(self._flow), 2))))
+            self._observer = np.concatenate((self._observer, np.zeros((size - len(self._observer), 2))))
+
+    def advance_to(self, t):
+        """
+        Build the boundary counts up to time t.
+
+        Each step takes the smaller of the boundary flow and the flow the road
+        lets through, the latter read from the counts at the road end built
+        from all earlier value conditions.
+
+        Args:
+            t: Time (h)
+        """
+        if self.boundary is None:
+            return
+        h = self.spacing
+        n_steps = int(np.ceil(t / h - 1e-9))
+        self._grow(n_steps)
+        ends = np.array(self.domain)
+        sides = [side for side in (0, 1) if not self.open_ends[side]]
+        for n in range(self.n_steps, n_steps):
+            flows = self.boundary.at(n * h)
+            limits = self._evaluate(ends, np.full(2, (n + 1) * h))
+            start = self._start[n]
+            for side in sides:
+                count = min(start[side] + h * flows[side], limits[side])
+                flow = max(count - start[side], 0.0) / h
+                self._flow[n, side] = flow
+                self._start[n + 1, side] = start[side] + h * flow
+                self._observer[n, side] = self._observer_speeds(flow, upstream=side == 0)
+            self.n_steps = n + 1
+
+    def _initial_values(self, x, t):
+        """Minimum over the initial blocks in the domain of dependence of each point."""
+        first = np.maximum(np.searchsorted(self.lower, x - self.fastest * t, side='right') - 1, 0)
+        last = np.maximum(np.searchsorted(self.lower, x - self.slowest * t, side='right') - 1, 0)
+        width = int(np.max(last - first)) + 1
+        blocks = np.minimum(first[:, None] + np.arange(width), last[:, None])
+        x, t = x[:, None], t[:, None]
+        # Minimize over each block at its characteristic speed, clipped to the block
+        with np.errstate(invalid='ignore'):
+            u = np.clip(self.speeds[blocks], (x - self.upper[blocks]) / t, (x - self.lower[blocks]) / t)
+        rho = self.densities[blocks]
+        values = self.intercepts[blocks] - rho * x + t * (rho * u + self._legendre(u))
+        return values.min(axis=1)
+
+    def _boundary_values(self, side, x, t):
+        """Minimum over the boundary steps of one road end started before each point."""
+        n = min(self.n_steps, int(np.ceil(np.max(t) / self.spacing)))
+        if n == 0:
+            return np.full(x.shape, np.inf)
+        h = self.spacing
+        d = (x - self.domain[side])[:, None]
+        latest = t[:, None] - h * np.arange(n)
+        earliest = np.maximum(latest - h, 0.0)
+        speed = self._observer[:n, side]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = np.where(speed == 0, latest, np.clip(d / speed, earliest, latest))
+        values = self._start[:n, side] + self._flow[:n, side] * (latest - s) + self._perspective(d, s)
+        return np.where(latest > 0, values, np.inf).min(axis=1)
+
+    def _evaluate(self, x, t):
+        """Counts at points with t > 0, from the boundary counts built so far."""
+        values = np.empty(x.shape)
+        order = np.argsort(t, kind='stable')
+        for start in range(0, len(order), QUERY_CHUNK):
+            chunk = order[start:start + QUERY_CHUNK]
+            xc, tc = x[chunk], t[chunk]
+            result = self._initial_values(xc, tc)
+            if self.boundary is not None:
+                for side in (0, 1):
+                    if not self.open_ends[side]:
+                        result = np.minimum(result, self._boundary_values(side, xc, tc))
+            values[chunk] = result
+        return values
+
+    def count(self, x, t):
+        """
+        Cumulative count N(x, t).
+
+        Args:
+            x: Positions (km) within the road
+            t: Times (h), broadcasting against x
+
+        Returns:
+            Counts (vehicles) of the broadcast shape of x and t
+        """
+        x, t = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(t, dtype=float))
+        shape = x.shape
+        x, t = x.ravel(), t.ravel()
+        counts = np.interp(x, self.edges, self.initial_counts)
+        later = t > 0
+        if np.any(later):
+            self.advance_to(float(np.max(t)))
+            counts[later] = self._evaluate(x[later], t[later])
+        return counts.reshape(shape)
+
+    def density(self, x, t, width):
+        """
+        Mean density over [x - width/2, x + width/2] at time t.
+
+        Args:
+            x: Positions (km)
+            t: Times (h), broadcasting against x
+            width: Length (km) of the road section, e.g. the cell width
+
+        Returns:
+            Densities (vehicles/km) of the broadcast shape of x and t
+        """
+        x = np.asarray(x, dtype=float)
+        return (self.count(x - 0.5 * width, t) - self.count(x + 0.5 * width, t)) / width
+
+    def flow(self, x, t_start, t_end):
+        """
+        Mean flow through x between two times, as a detector counts it.
+
+        Args:
+            x: Positions (km)
+            t_start: Start times (h)
+            t_end: End times (h), later than t_start
+
+        Returns:
+            Flows (vehicles/h) of the broadcast shape of the inputs
+        """
+        t_start, t_end = np.asarray(t_start, dtype=float), np.asarray(t_end, dtype=float)
+        return (self.count(x, t_end) - self.count(x, t_start)) / (t_end - t_start)
+
+    def passage_time(self, x, vehicle, t_max, tolerance=1e-6):
+        """
+        Time at which a vehicle passes a position.
+
+        Counts never decrease in time, so the passage is found by bisection
+        on [0, t_max] for all queries at once.
+
+        Args:
+            x: Positions (km)
+            vehicle: Vehicle numbers, the counts N they carry
+            t_max: Latest time searched (h)
+            tolerance: Accuracy of the passage times (h)
+
+        Returns:
+            Passage times (h), NaN for vehicles not passing x by t_max
+        """
+        x, vehicle = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                         np.asarray(vehicle, dtype=float))
+        low = np.zeros(x.shape)
+        high = np.full(x.shape, float(t_max))
+        passed = self.count(x, high) >= vehicle
+        early = self.count(x, low) >= vehicle
+        for _ in range(int(np.ceil(np.log2(max(t_max / tolerance, 1.0))))):
+            middle = 0.5 * (low + high)
+            reached = self.count(x, middle) >= vehicle
+            high = np.where(reached, middle, high)
+            low = np.where(reached, low, middle)
+        return np.where(early, 0.0, np.where(passed, high, np.nan))
+
+    def travel_time(self, x_from, x_to, departures, t_max, tolerance=1e-6):
+        """
+        Travel times between two positions, following the vehicles.
+
+        Args:
+            x_from: Start positions (km)
+            x_to: End positions (km), downstream of x_from
+            departures: Times (h) of passage at x_from
+            t_max: Latest arrival time searched (h)
+            tolerance: Accuracy of the arrival times (h)
+
+        Returns:
+            Travel times (h), NaN for vehicles not arriving by t_max
+        """
+        departures = np.asarray(departures, dtype=float)
+        vehicle = self.count(x_from, departures)
+        return self.passage_time(x_to, vehicle, t_max, tolerance) - departures
+
+
+class LaxHopfLWR(GridFreeLWR):
+    """
+    LWR model solved by the Lax-Hopf formula on cumulative counts.
+
+    The model has the fundamental diagram and simulation interface of
+    LWRModel. solve() returns the MoskowitzFunction of a run, to be queried
+    at the points of interest; simulate() samples it on the whole output
+    grid, differencing the counts at the cell interfaces, which costs more
+    than a sparse set of queries. The initial densities are taken as
+    piecewise constant over cells of width dx; the road quality must be
+    uniform and the fundamental diagram concave.
+    """
+
+    SOLVER_NAME = 'The Lax-Hopf solver'
+
+    def __init__(self, v_max=100.0, rho_max=180.0, fundamental_diagram=None, n_levels=256):
+        """
+        Initialize the model.
+
+        Args:
+            v_max: Maximum velocity in free flow (km/h)
+            rho_max: Maximum density (vehicles/km)
+            fundamental_diagram: FundamentalDiagram instance; None builds a
+                                 Greenshields diagram from v_max and rho_max
+            n_levels: Number of density intervals of the piecewise-linear flux
+
+        Raises:
+            ValueError: If n_levels is not positive
+        """
+        super().__init__(v_max=v_max, rho_max=rho_max, fundamental_diagram=fundamental_diagram)
+        if n_levels < 1:
+            raise ValueError(f"n_levels must be positive, got {n_levels}")
+        self.n_levels = int(n_levels)
+
+    def numerical_methods(self):
+        """
+        Get the numerical methods of the solver.
+
+        Returns:
+            dict: Solver name and number of density intervals
+        """
+        return {'flux_scheme': 'lax_hopf', 'n_levels': self.n_levels}
+
+    def solve(self, initial_density, domain_length, dx, dt=None, cfl_factor=0.9,
+              road_quality_func=None, simulation_time=None, boundary_conditions=None):
+        """
+        Build the cumulative counts of a run.
+
+        See GridFreeLWR.solve(); dt is the time resolution of the boundary
+        flows, by default the CFL step bounded by the fastest wave as in
+        LWRModel.
+
+        Returns:
+            tuple: (MoskowitzFunction, grid positions, road quality on the grid
+                   or None, time step, BoundaryFlows or None)
+
+        Raises:
+            ValueError: If the initial state is not one corridor, the road
+                        quality varies or the flux is not concave
+        """
+        x, rho, quality = self.corridor(initial_density, domain_length, dx, road_quality_func)
+        scale = 1.0 if quality is None else float(quality[0])
+
+        bounded = boundary_conditions is not None and any(bc is not None for bc in boundary_conditions)
+        if dt is None:
+            dt = self.calculate_dt(rho, dx, cfl_factor, quality)
+            if bounded:
+                dt = min(dt, cfl_factor * dx / (scale * self.fundamental_diagram.max_wave_speed()))
+        boundary = None
+        if bounded:
+            boundary = BoundaryFlows(boundary_conditions, dt, simulation_time)
+
+        edges = np.r_[x - 0.5 * dx, x[-1] + 0.5 * dx]
+        counts = MoskowitzFunction(self, edges, rho, self.n_levels, scale, boundary, dt)
+        return counts, x, quality, dt, boundary
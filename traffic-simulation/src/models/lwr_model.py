@@ -5,55 +5,176 @@ This module implements the classic Lighthill-Whitham-Richards (LWR) traffic flow
 including numerical solvers and fundamental diagrams.
 """
 
+import copy
 import numpy as np
 from numpy.typing import ArrayLike
 
+from ..utils.time_stepping import (
+    TimeIntegrator, VirtualDetectors, check_time_integration, clocked_step, ssp_runge_kutta
+)
+from ..utils.results_store import allocate_results
+from ..utils.simulation_results import SimulationResults, map_frames
+from ..utils.numerical_methods import get_flux_scheme
+from ..utils.reconstruction import check_reconstruction, reconstruct_states
+from ..utils.boundary_conditions import BoundaryFlows, apply_boundary_flows, corridor_flow_frames
+from .fundamental_diagram import GreenshieldsDiagram
+
+
+def evaluate_on_grid(func, x):
+    """
+    Evaluate a function of position on a whole grid.
+    
+    The function is called once with the grid array; functions written for
+    scalar positions (e.g. with if/else branches) fall back to one call per
+    grid point. Values already sampled on the grid (or a constant) are
+    passed through.
+    
+    Args:
+        func: Function of position x (km), or an array of shape (nx,)
+        x: Grid positions of shape (nx,)
+        
+    Returns:
+        Array of shape (nx,) with the function values
+    """
+    if not callable(func):
+        return np.broadcast_to(np.asarray(func, dtype=float), x.shape).astype(float)
+    try:
+        values = np.asarray(func(x), dtype=float)
+    except (TypeError, ValueError):
+        values = None
+    if values is None or values.shape not in ((), x.shape):
+        values = np.array([func(xi) for xi in x], dtype=float)
+    return np.broadcast_to(values, x.shape).astype(float)
+
+
 class LWRModel:
     """
     Implementation of the Lighthill-Whitham-Richards (LWR) traffic flow model.
     
     This class provides methods to solve the LWR traffic flow equations using
-    the Godunov finite volume method.
+    the Godunov finite volume method. The flux is given by a fundamental
+    diagram (Greenshields by default, see fundamental_diagram.py); other
+    numerical fluxes can be selected from numerical_methods.py.
     """
     
-    def __init__(self, v_max=100.0, rho_max=180.0):
+    # Floating point type of the solver state and parameter arrays
+    dtype = np.dtype(np.float64)
+    
+    def __init__(self, v_max=100.0, rho_max=180.0, fundamental_diagram=None, flux_scheme='godunov',
+                 reconstruction='none', limiter='minmod', time_integration='euler'):
         """
         Initialize the LWR model with parameters.
         
         Args:
             v_max: Maximum velocity in free flow (km/h)
             rho_max: Maximum density (vehicles/km)
+            fundamental_diagram: FundamentalDiagram instance; None builds a
+                                 Greenshields diagram from v_max and rho_max,
+                                 otherwise v_max and rho_max are taken from it
+            flux_scheme: Numerical flux, a name of numerical_methods.FLUX_SCHEMES
+            reconstruction: Interface reconstruction, 'none' (first order),
+                            'muscl' (second order) or 'weno5' (fifth order)
+            limiter: Slope limiter of the MUSCL reconstruction, 'minmod' or 'van_leer'
+            time_integration: 'euler', 'ssp_rk2' or 'ssp_rk3'; pair MUSCL with
+                              SSP-RK2 and WENO5 with SSP-RK3, and a CFL factor
+                              of about 0.5 for the higher-order reconstructions
+        
+        Raises:
+            ValueError: If a numerical method is unknown
         """
-        self.v_max = v_max
-        self.rho_max = rho_max
+        if fundamental_diagram is None:
+            fundamental_diagram = GreenshieldsDiagram(v_max=v_max, rho_max=rho_max)
+        self.fundamental_diagram = fundamental_diagram
+        # Validate the numerical methods early
+        get_flux_scheme(flux_scheme)
+        check_reconstruction(reconstruction, limiter)
+        check_time_integration(time_integration)
+        self.flux_scheme = flux_scheme
+        self.reconstruction = reconstruction
+        self.limiter = limiter
+        self.time_integration = time_integration
+    
+    @property
+    def v_max(self):
+        """Free-flow speed of the fundamental diagram (km/h)."""
+        return self.fundamental_diagram.v_max
+    
+    @v_max.setter
+    def v_max(self, value):
+        self.fundamental_diagram.v_max = value
+    
+    @property
+    def rho_max(self):
+        """Maximum density of the fundamental diagram (vehicles/km)."""
+        return self.fundamental_diagram.rho_max
+    
+    @rho_max.setter
+    def rho_max(self, value):
+        self.fundamental_diagram.rho_max = value
         
-    def get_velocity(self, rho):
+    def get_velocity(self, rho, quality=None):
         """
         Calculate the velocity based on density using the fundamental relation.
         
         Args:
             rho: Traffic density (veh/km)
+            quality: Road quality coefficient scaling the free-flow speed, a scalar
+                     or an array broadcasting against rho (None for a perfect road)
             
         Returns:
             float or array: Velocity (km/h)
         """
-        # Simplify: Just use the core Greenshields formula without shape handling
         # Let NumPy automatically handle broadcasting between scalars and arrays
-        ratio = np.asarray(rho) / self.rho_max
-        return np.maximum(0, self.v_max * (1 - ratio))
+        velocity = self.fundamental_diagram.speed(rho)
+        if quality is not None:
+            velocity = quality * velocity
+        return velocity
     
-    def get_flow(self, rho):
+    def get_flow(self, rho, quality=None):
         """
-        Calculate flow for a given density using Greenshields model.
+        Calculate flow for a given density using the fundamental diagram.
         
         Args:
             rho: Traffic density (vehicles/km)
+            quality: Road quality coefficient (see get_velocity())
             
         Returns:
             Flow (vehicles/h)
         """
         # Simply multiply density by velocity - NumPy handles broadcasting
-        return np.asarray(rho) * self.get_velocity(rho)
+        return np.asarray(rho) * self.get_velocity(rho, quality)
+    
+    def cell_flux(self, rho, quality=None):
+        """
+        Physical flux of each cell (flux protocol of numerical_methods.py).
+        
+        Args:
+            rho: Traffic density (vehicles/km)
+            quality: Road quality coefficient (see get_velocity())
+            
+        Returns:
+            Flow (vehicles/h)
+        """
+        return self.get_flow(rho, quality)
+    
+    def wave_speed_bounds(self, rho, quality=None):
+        """
+        Slowest and fastest characteristic speeds of each cell.
+        
+        A scalar law has a single characteristic speed q'(ρ), scaled by the
+        road quality.
+        
+        Args:
+            rho: Traffic density (vehicles/km)
+            quality: Road quality coefficient (see get_velocity())
+            
+        Returns:
+            tuple: (slowest, fastest) wave speeds (km/h)
+        """
+        speed = self.fundamental_diagram.wave_speed(rho)
+        if quality is not None:
+            speed = quality * speed
+        return speed, speed
     
     def critical_density(self):
         """
@@ -62,76 +183,109 @@ class LWRModel:
         Returns:
             Critical density (vehicles/km)
         """
-        return self.rho_max / 2.0
+        return self.fundamental_diagram.critical_density()
     
-    def godunov_flux(self, rho_left, rho_right):
+    def demand(self, rho, quality=None):
         """
-        Calculate numerical flux using Godunov scheme.
+        Sending (demand) function of the fundamental diagram.
+        
+        The demand is the flow a cell can send downstream: the flow itself
+        in free-flow conditions and the capacity in congested conditions.
         
         Args:
-            rho_left: Density on the left side of interface
-            rho_right: Density on the right side of interface
+            rho: Traffic density (vehicles/km)
+            quality: Road quality coefficient (see get_velocity())
             
         Returns:
-            Numerical flux (vehicles/h)
+            Demand (vehicles/h)
         """
-        # Convert inputs to arrays for consistent handling
-        rho_left_arr = np.asarray(rho_left)
-        rho_right_arr = np.asarray(rho_right)
-        rho_c = self.critical_density()
-        
-        # Calculate flows using vectorized operations
-        f_left = self.get_flow(rho_left_arr)
-        f_right = self.get_flow(rho_right_arr)
-        f_critical = self.get_flow(rho_c)
+        demand = self.fundamental_diagram.demand(rho)
+        return demand if quality is None else quality * demand
+    
+    def supply(self, rho, quality=None):
+        """
+        Receiving (supply) function of the fundamental diagram.
         
-        # Initialize result array
-        if rho_left_arr.shape == rho_right_arr.shape:
-            result = np.zeros_like(rho_left_arr, dtype=float)
-        else:
-            # Handle broadcasting - create output with broadcast shape
-            result = np.zeros(np.broadcast(rho_left_arr, rho_right_arr).shape, dtype=float)
+        The supply is the flow a cell can accept from upstream: the capacity
+        in free-flow conditions and the flow itself in congested conditions.
         
-        # Apply Godunov flux logic using NumPy's where function
-        # Case 1: rho_left <= rho_right
-        mask1 = rho_left_arr <= rho_right_arr
+        Args:
+            rho: Traffic density (vehicles/km)
+            quality: Road quality coefficient (see get_velocity())
+            
+        Returns:
+            Supply (vehicles/h)
+        """
+        supply = self.fundamental_diagram.supply(rho)
+        return supply if quality is None else quality * supply
+    
+    def numerical_methods(self):
+        """
+        Get the numerical methods of the solver.
         
-        # Case 1a: rho_left >= rho_c
-        mask1a = np.logical_and(mask1, rho_left_arr >= rho_c)
-        result = np.where(mask1a, f_left, result)
+        Returns:
+            dict: Flux scheme, reconstruction, limiter and time integration names
+        """
+        return {
+            'flux_scheme': self.flux_scheme,
+            'reconstruction': self.reconstruction,
+            'limiter': self.limiter,
+            'time_integration': self.time_integration
+        }
+    
+    def interface_flux(self, rho, quality=None, dt_dx=None):
+        """
+        Calculate the numerical flux at every interior interface at once.
         
-        # Case 1b: rho_right <= rho_c
-        mask1b = np.logical_and(mask1, rho_right_arr <= rho_c)
-        result = np.where(mask1b, f_right, result)
+        The interface states are the cell densities, or reconstructed ones
+        for the higher-order schemes (see reconstruction.py).
         
-        # Case 1c: rho_left < rho_c < rho_right
-        mask1c = np.logical_and(mask1, 
-                              np.logical_and(rho_left_arr < rho_c, rho_right_arr > rho_c))
-        result = np.where(mask1c, f_critical, result)
+        With the default Godunov scheme the flux reduces to the demand/supply
+        form F(ρ_L, ρ_R) = min(D(ρ_L), S(ρ_R)), evaluated on the whole arrays
+        rho[..., :-1] and rho[..., 1:]. Leading axes (e.g. an ensemble batch)
+        are carried through.
         
-        # Case 2: rho_left > rho_right
-        mask2 = rho_left_arr > rho_right_arr
+        With a road quality profile each cell has its own flux λ_j Q(ρ). The
+        demand is taken with the upstream coefficient and the supply with the
+        downstream one, which is the exact Riemann solution at a jump in λ, so
+        capacity drops at quality changes create queues in the right place.
         
-        # Case 2a: rho_left <= rho_c
-        mask2a = np.logical_and(mask2, rho_left_arr <= rho_c)
-        result = np.where(mask2a, f_left, result)
+        Args:
+            rho: Density array of shape (..., nx)
+            quality: Road quality coefficients of shape (..., nx), or None
+            dt_dx: Ratio of the time and space steps (h/km), needed by the
+                   Lax-Friedrichs flux only
+            
+        Returns:
+            Array of shape (..., nx-1) with the flux through each interior interface
+        """
+        states = reconstruct_states(rho, self.reconstruction, self.limiter, quality)
+        return get_flux_scheme(self.flux_scheme)(self, rho, quality, dt_dx, states)
+    
+    def godunov_flux(self, rho_left, rho_right):
+        """
+        Calculate numerical flux using Godunov scheme.
         
-        # Case 2b: rho_right >= rho_c
-        mask2b = np.logical_and(mask2, rho_right_arr >= rho_c)
-        result = np.where(mask2b, f_right, result)
+        The solution of the Riemann problem at the interface reduces to
+        min(D(ρ_L), S(ρ_R)) for every unimodal fundamental diagram, which
+        covers the shock, rarefaction and transonic cases at once.
         
-        # Case 2c: rho_right < rho_c < rho_left
-        mask2c = np.logical_and(mask2, 
-                              np.logical_and(rho_right_arr < rho_c, rho_left_arr > rho_c))
-        result = np.where(mask2c, f_critical, result)
+        Args:
+            rho_left: Density on the left side of interface
+            rho_right: Density on the right side of interface
+            
+        Returns:
+            Numerical flux (vehicles/h)
+        """
+        result = np.minimum(self.demand(rho_left), self.supply(rho_right))
         
         # Handle scalar inputs - return scalar output
         if np.isscalar(rho_left) and np.isscalar(rho_right):
-            return float(result.item()) if result.size == 1 else float(result[0])
+            return float(result)
             
         return result
     
-    def calculate_dt(self, rho, dx, cfl_factor=0.9):
+    def calculate_dt(self, rho, dx, cfl_factor=0.9, quality=None):
         """
         Calculate time step based on CFL condition using maximum wave speed.
         
@@ -139,133 +293,458 @@ class LWRModel:
             rho: Current density array
             dx: Spatial step size (km)
             cfl_factor: Safety factor for CFL condition (0-1)
+            quality: Road quality coefficients of the cells, or None
             
         Returns:
             Time step (h)
         """
-        # Calculate the maximum wave speed as max|dq/dρ| across the domain
-        # For the Greenshields model, the derivative of the flux function is:
-        # dq/dρ = v_max*(1 - 2*ρ/ρ_max)
-        # This reaches its maximum absolute value at either ρ=0 or ρ=ρ_max
-        
-        # Convert input to array for consistent handling
-        rho_array = np.asarray(rho)
-        
-        # Calculate wave speeds at each point
-        wave_speed = self.v_max * (1 - 2 * rho_array / self.rho_max)
+        # Calculate the maximum wave speed as max|dq/dρ| over the current state
+        # (e.g. dq/dρ = v_max*(1 - 2*ρ/ρ_max) for Greenshields). For a concave
+        # flux dq/dρ is monotone, so the Godunov scheme only needs its extremes
+        # over the cell states, not over the whole range [0, ρ_max]
+        diagram = self.fundamental_diagram
+        if diagram.concave:
+            wave_speed = diagram.wave_speed(np.asarray(rho))
+            if quality is not None:
+                wave_speed = quality * wave_speed
+            
+            # Maximum absolute wave speed across the domain
+            max_wave_speed = float(np.max(np.abs(wave_speed)))
+        else:
+            # Otherwise the waves between two cells travel at any dq/dρ in
+            # between, so the whole range of the cell densities is bounded
+            max_wave_speed = diagram.max_wave_speed(rho)
+            if quality is not None:
+                max_wave_speed *= float(np.max(quality))
         
-        # Maximum absolute wave speed across the domain
-        max_wave_speed = max(
-            self.v_max,  # Wave speed at ρ=0
-            abs(np.min(wave_speed))  # Maximum negative wave speed
-        )
+        # A state at critical density everywhere carries no waves
+        if max_wave_speed <= 0:
+            max_wave_speed = self.fundamental_diagram.max_wave_speed()
         
         # Apply CFL condition: dt ≤ dx / max_wave_speed
         dt = cfl_factor * dx / max_wave_speed
         
         return float(dt)  # Ensure scalar output
     
-    def simulate(self, initial_density, domain_length, simulation_time, dx, dt=None, 
-                cfl_factor=0.9, road_quality_func=None):
+    def advance(self, rho, dt, dx, flux=None, out=None, quality=None, caps=None, boundary=None):
         """
-        Solve the LWR model using Godunov's scheme.
+        Advance the density by one time step.
+        
+        The step is a forward Euler step of the finite volume scheme, or an
+        SSP Runge-Kutta step made of such stages.
         
         Args:
-            initial_density: Initial density distribution (array or function)
-            domain_length: Length of the spatial domain (km)
-            simulation_time: Total simulation time (h)
+            rho: Density array of shape (..., nx)
+            dt: Time step (h)
             dx: Spatial step size (km)
-            dt: Time step size (h), if None calculated from CFL
-            cfl_factor: Safety factor for CFL condition (0-1)
-            road_quality_func: Function returning road quality coefficient at position x
+            flux: Optional scratch buffer of shape (..., nx+1) for the interface fluxes
+            out: Optional output array (may be rho itself for an in-place update)
+            quality: Road quality coefficients of shape (..., nx), or None
+            caps: Optional (interfaces, factors) pair scaling the flux through
+                  some interior interfaces, e.g. the traffic signals; the
+                  factors broadcast against flux[..., interfaces]
+            boundary: Optional (inflow, outflow) row of BoundaryFlows replacing
+                      the zero-gradient boundary fluxes
+            
+        Returns:
+            Updated density array
+        """
+        nx = rho.shape[-1]
+        if flux is None:
+            flux = np.empty(rho.shape[:-1] + (nx + 1,), dtype=rho.dtype)
+        
+        def euler_step(state, out):
+            # Numerical flux through all interior interfaces in one pass
+            flux[..., 1:nx] = self.interface_flux(state, quality, dt / dx)
+            
+            # Boundary conditions
+            flux[..., 0] = flux[..., 1]
+            flux[..., nx] = flux[..., nx-1]
+            if boundary is not None:
+                apply_boundary_flows(self, state, flux, boundary, quality)
+            
+            if caps is not None:
+                flux[..., caps[0]] *= caps[1]
+            
+            # Update density using conservative formula, ensuring non-negative density
+            np.subtract(flux[..., 1:], flux[..., :-1], out=flux[..., :-1])
+            flux[..., :-1] *= dt / dx
+            out = np.subtract(state, flux[..., :-1], out=out)
+            return np.maximum(out, 0, out=out)
+        
+        return ssp_runge_kutta(euler_step, rho, self.time_integration, out=out)
+    
+    def initial_state(self, initial_density, x):
+        """
+        Build the initial density on the grid.
+        
+        Functions are evaluated on the whole grid at once (see
+        evaluate_on_grid()).
+        
+        Args:
+            initial_density: Initial density distribution (array or function of x)
+            x: Grid positions of shape (nx,)
+            
+        Returns:
+            Density array of shape (nx,)
+        """
+        if callable(initial_density):
+            return evaluate_on_grid(initial_density, x)
+        return np.array(initial_density, dtype=float)
+    
+    def road_quality_profile(self, road_quality_func, x):
+        """
+        Evaluate the road quality coefficient on the whole grid.
+        
+        The profile is computed once per run and scales the flux cell by cell.
+        
+        Args:
+            road_quality_func: Function returning road quality coefficient at position x,
+                               or coefficients already sampled on the grid
+            x: Grid positions of shape (nx,)
+            
+        Returns:
+            Road quality coefficients of shape (nx,)
+        """
+        if road_quality_func is None:
+            return np.ones(len(x))
+        return evaluate_on_grid(road_quality_func, x)
+    
+    def with_dtype(self, dtype):
+        """
+        Get the model computing in a given floating point precision.
+        
+        Parameter arrays (e.g. the member columns of an ensemble) of the model
+        and its fundamental diagram are cast as well, so they do not promote a float32 state back to float64.
+        
+        Args:
+            dtype: Floating point type, e.g. np.float32 or np.float64 (None
+                   keeps the model's precision)
             
         Returns:
-            Dictionary containing simulation results
+            The model itself if the precision is unchanged, else a shallow copy
+            
+        Raises:
+            ValueError: If dtype is not a floating point type
+        """
+        if dtype is None or np.dtype(dtype) == self.dtype:
+            return self
+        dtype = np.dtype(dtype)
+        if dtype.kind != 'f':
+            raise ValueError(f"dtype must be a floating point type, got {dtype}")
+        
+        model = copy.copy(self)
+        model.dtype = dtype
+        for name, value in vars(self).items():
+            if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+                setattr(model, name, value.astype(dtype))
+        model.fundamental_diagram = self.fundamental_diagram.with_dtype(dtype)
+        return model
+    
+    def _stepper(self, rho, dx, quality, signals=None, interfaces=None, boundary=None, sources=None):
+        """
+        Build the time step function of a run.
+        
+        The returned function advances the state in place, using one flux
+        buffer as the only scratch array. Source terms are applied by Strang
+        splitting, half a source step on each side of the transport step.
+        
+        Args:
+            rho: Initial state of shape (..., nx)
+            dx: Spatial step size (km)
+            quality: Road quality coefficients of the cells, or None
+            signals: TrafficSignals capping the flux, or None
+            interfaces: Interfaces controlled by the signals
+            boundary: BoundaryFlows of the run, or None for zero-gradient boundaries
+            sources: SourceTable of the run, or None
+            
+        Returns:
+            Function (rho, dt) -> rho
+        """
+        flux = np.empty(rho.shape[:-1] + (rho.shape[-1] + 1,), dtype=self.dtype)
+        if signals is None and boundary is None and sources is None:
+            return lambda r, h: self.advance(r, h, dx, flux=flux, out=r, quality=quality)
+        
+        # The signal states, boundary flows and source rates are held over each step
+        def step(r, h, t):
+            caps = None if signals is None else (interfaces, signals.green(t, dtype=self.dtype))
+            flows = None if boundary is None else boundary.at(t)
+            if sources is not None:
+                sources.apply(self, r, h / 2, t, quality)
+            r = self.advance(r, h, dx, flux=flux, out=r, quality=quality, caps=caps, boundary=flows)
+            if sources is not None:
+                sources.apply(self, r, h / 2, t, quality)
+            return r
+        
+        return clocked_step(step)
+    
+    def _setup(self, initial_density, domain_length, simulation_time, dx, dt, cfl_factor,
+               road_quality_func, adaptive, cfl_every, output_times, save_interval, detectors,
+               signals=None, boundary_conditions=None, sources=None):
+        """
+        Build the grid, initial state and time integrator of a run.
+        
+        Shared by simulate() and iter_simulate(). The returned state owns its
+        memory and is updated in place by the step function of _stepper().
+        
+        Returns:
+            tuple: (x, rho, dt, integrator, recorder, quality, boundary)
         """
         # Create spatial grid
         nx = int(domain_length / dx) + 1
         x = np.linspace(0, domain_length, nx)
         
-        # Initialize density
-        if callable(initial_density):
-            rho = np.array([initial_density(xi) for xi in x])
-        else:
-            rho = np.array(initial_density)
+        # Initialize density in the solver precision
+        rho = self.initial_state(initial_density, x).astype(self.dtype, copy=False)
         
-        # Apply road quality if provided - simplified to avoid over-complicating v_max
-        v_max_original = None
+        # Road quality is evaluated once and scales the flux of each cell
+        quality = None
         if road_quality_func is not None:
-            # Store original v_max (always scalar)
-            v_max_original = self.v_max
-            # Calculate road quality at each point
-            road_quality = np.array([road_quality_func(xi) for xi in x])
-            # Scalar multiplication distributes correctly
-            self.v_max = v_max_original * float(np.mean(road_quality))
+            quality = self.road_quality_profile(road_quality_func, x).astype(self.dtype, copy=False)
+        
+        # Traffic signals cap the flux through the interfaces they control
+        interfaces = None
+        if signals is not None and len(signals) > 0:
+            interfaces = signals.corridor_interfaces(x)
+        else:
+            signals = None
+        bounded = boundary_conditions is not None and any(bc is not None for bc in boundary_conditions)
+        sourced = sources is not None and len(sources) > 0
         
         # Calculate time step if not provided
         if dt is None:
-            dt = self.calculate_dt(rho, dx, cfl_factor)
-        
-        # Create time grid
-        nt = int(simulation_time / dt) + 1
-        t = np.linspace(0, simulation_time, nt)
+            dt = self.calculate_dt(rho, dx, cfl_factor, quality)
+            varying_quality = quality is not None and np.ptp(quality) > 0
+            if not adaptive and (varying_quality or signals is not None or bounded or sourced):
+                # Quality changes, red lights, boundary flows and sources break the
+                # maximum principle (queues grow beyond the initial densities), so
+                # bound a fixed step by the fastest wave
+                max_quality = 1.0 if quality is None else float(np.max(quality))
+                max_speed = max_quality * self.fundamental_diagram.max_wave_speed()
+                dt = min(dt, cfl_factor * dx / max_speed)
+        
+        # Virtual detectors sample the state at full temporal resolution
+        recorder = VirtualDetectors(detectors, x) if detectors is not None else None
+        
+        # Boundary flows are sampled once, one row per fixed step
+        boundary = None
+        if bounded:
+            boundary = BoundaryFlows(boundary_conditions, dt, simulation_time, dtype=self.dtype)
+        
+        # Source rates are sampled the same way, on sparse (cell, rate) entries
+        table = sources.table(x, dt, simulation_time, dtype=self.dtype) if sourced else None
+        
+        # Time integration, with frames delivered on the output grid
+        integrator = TimeIntegrator(
+            advance=self._stepper(rho, dx, quality, signals, interfaces, boundary, table),
+            simulation_time=simulation_time,
+            dt=dt,
+            stable_dt=lambda r: self.calculate_dt(r, dx, cfl_factor, quality),
+            adaptive=adaptive,
+            cfl_every=cfl_every,
+            output_times=output_times,
+            save_interval=save_interval,
+            observer=recorder.record if recorder is not None else None
+        )
         
-        # Initialize result arrays
-        density = np.zeros((nt, nx))
-        velocity = np.zeros((nt, nx))
-        flow = np.zeros((nt, nx))
+        return x, rho, dt, integrator, recorder, quality, boundary
+    
+    def iter_simulate(self, initial_density, domain_length, simulation_time, dx, dt=None,
+                      cfl_factor=0.9, road_quality_func=None, adaptive=False, cfl_every=1,
+                      output_times=None, save_interval=None, dtype=None, signals=None,
+                      boundary_conditions=None, sources=None):
+        """
+        Solve the LWR model lazily, yielding one frame at each output time.
         
-        # Set initial conditions
-        density[0] = rho
-        velocity[0] = self.get_velocity(rho)
-        flow[0] = self.get_flow(rho)
+        Only the current density and one flux buffer are held in memory, so
+        long or unbounded runs (simulation_time=None) stream in fixed memory.
+        The yielded array is the live solver state and is overwritten by the
+        next step; copy it to keep it.
         
-        # Main time integration loop - simplified to just process one interface at a time
-        for n in range(nt - 1):
-            flux = np.zeros(nx + 1)
-            
-            # Process each interface individually
-            for j in range(1, nx):
-                try:
-                    # Simple scalar values for this interface
-                    flux[j] = self.godunov_flux(rho[j-1], rho[j])
-                except Exception as e:
-                    print(f"Error at timestep {n}, cell {j}: {e}")
-                    # Fallback: take minimum of left and right flows
-                    flux[j] = min(self.get_flow(rho[j-1]), self.get_flow(rho[j]))
-            
-            # Boundary conditions
-            flux[0] = flux[1]
-            flux[nx] = flux[nx-1]
-            
-            # Update density using conservative formula
-            rho = rho - dt / dx * (flux[1:] - flux[:-1])
+        Args:
+            initial_density: Initial density distribution (array or function)
+            domain_length: Length of the spatial domain (km)
+            simulation_time: Total simulation time (h), or None to run until
+                             the consumer stops iterating
+            dx: Spatial step size (km)
+            dt: Time step size (h), if None calculated from CFL
+            cfl_factor: Safety factor for CFL condition (0-1)
+            road_quality_func: Function returning road quality coefficient at position x,
+                               or coefficients sampled on the grid
+            adaptive: Recompute the CFL time step from the current state during the run
+            cfl_every: In adaptive mode, recompute the time step every cfl_every steps
+            output_times: Times (h) of the yielded frames
+            save_interval: Time (h) between yielded frames, an alternative to output_times
+            dtype: Floating point precision of the state and results, e.g. np.float32
+                   (None keeps the model's precision)
+            signals: TrafficSignals located by position (km), or None
+            boundary_conditions: (inflow, outflow) profiles (see simulate())
+            sources: SourceTerms located by position (km), or None
             
-            # Ensure non-negative density
-            rho = np.maximum(0, rho)
+        Yields:
+            tuple: (t, density) for each output frame
+        """
+        solver = self.with_dtype(dtype)
+        _, rho, _, integrator, _, _, _ = solver._setup(
+            initial_density, domain_length, simulation_time, dx, dt, cfl_factor,
+            road_quality_func, adaptive, cfl_every, output_times, save_interval, None, signals,
+            boundary_conditions, sources
+        )
+        for _, t, rho in integrator.run(rho):
+            yield t, rho
+    
+    def simulate(self, initial_density, domain_length, simulation_time, dx, dt=None, 
+                cfl_factor=0.9, road_quality_func=None, adaptive=False, cfl_every=1,
+                output_times=None, save_interval=None, detectors=None, output_dir=None,
+                dtype=None, signals=None, boundary_conditions=None, sources=None):
+        """
+        Solve the LWR model using Godunov's scheme.
+        
+        Args:
+            initial_density: Initial density distribution (array or function)
+            domain_length: Length of the spatial domain (km)
+            simulation_time: Total simulation time (h)
+            dx: Spatial step size (km)
+            dt: Time step size (h), if None calculated from CFL
+            cfl_factor: Safety factor for CFL condition (0-1)
+            road_quality_func: Function returning road quality coefficient at position x,
+                               or coefficients sampled on the grid
+            adaptive: Recompute the CFL time step from the current state during the run
+            cfl_every: In adaptive mode, recompute the time step every cfl_every steps
+            output_times: Times (h) at which results are stored; if None, every step
+                          is stored (fixed mode) or 101 evenly spaced frames (adaptive)
+            save_interval: Time (h) between stored frames, an alternative to output_times
+            detectors: Positions (km) of virtual detectors recorded at every time step
+            output_dir: If given, frames are written to memory-mapped .npy files
+                        in this directory (with a JSON sidecar) instead of RAM
+            dtype: Floating point precision of the state and results, e.g. np.float32
+                   (None keeps the model's precision)
+            signals: TrafficSignals located by position (km), capping the flux
+                     through the interfaces they control, or None
+            boundary_conditions: (inflow, outflow) pair of upstream demand and
+                                 downstream supply profiles (see
+                                 boundary_conditions.as_profile()), None
+                                 for a zero-gradient side
+            sources: SourceTerms located by position (km), on-ramps and side
+                     streets feeding the corridor and off-ramps leaving it,
+                     or None
             
+        Returns:
+            SimulationResults storing the densities, with velocities and flows
+            derived on first access (see lazy_results()); the fields keep the
+            leading axes of the state (e.g. the members of an ensemble)
+        """
+        if simulation_time is None:
+            raise ValueError("simulate() needs a finite simulation_time; use iter_simulate() to stream")
+        
+        solver = self.with_dtype(dtype)
+        x, rho, dt, integrator, recorder, quality, boundary = solver._setup(
+            initial_density, domain_length, simulation_time, dx, dt, cfl_factor,
+            road_quality_func, adaptive, cfl_every, output_times, save_interval, detectors, signals,
+            boundary_conditions, sources
+        )
+        t = integrator.output_times
+        nt = len(t)
+        nx = len(x)
+        
+        # Initialize result arrays, in memory or memory-mapped on disk; velocity
+        # and flow are derived from the density when requested. Leading state
+        # axes (e.g. ensemble members) come before the time axis
+        fields = {'density': rho.shape[:-1] + (nt, nx)}
+        if quality is not None:
+            fields['road_quality'] = quality.shape
+        writer, arrays = allocate_results(fields, output_dir, x, t, solver.dtype)
+        density = arrays['density']
+        if quality is not None:
+            arrays['road_quality'][...] = quality
+        
+        # Main time integration loop
+        for n, _, rho in integrator.run(rho):
             # Store results
-            density[n+1] = rho
-            velocity[n+1] = self.get_velocity(rho)
-            flow[n+1] = self.get_flow(rho)
-        
-        # Restore original v_max before returning
-        if v_max_original is not None:
-            self.v_max = v_max_original
+            density[..., n, :] = rho
         
         # Return results as dictionary
-        return {
+        results = {
             'density': density,
-            'velocity': velocity,
-            'flow': flow,
+            'road_quality': arrays.get('road_quality'),
             'grid_x': x,
             'grid_t': t,
+            **self._results_summary(),
             'parameters': {
-                'v_max': self.v_max,
-                'rho_max': self.rho_max,
+                **self._parameters_summary(),
                 'dx': dx,
                 'dt': dt,
+                'adaptive': adaptive,
                 'domain_length': domain_length,
-                'simulation_time': simulation_time
+                'simulation_time': simulation_time,
+                'dtype': solver.dtype.name,
+                **integrator.statistics()
+            }
+        }
+        if signals is not None:
+            results['parameters']['signals'] = signals.summary()
+        if sources is not None:
+            results['parameters']['sources'] = sources.summary()
+        if boundary is not None:
+            results['boundary_flows'] = corridor_flow_frames(boundary, t)
+        
+        if recorder is not None:
+            # Samples of shape (n_records, ..., n_detectors) are evaluated as
+            # recorded, so parameter columns broadcast against them, then the
+            # records axis is moved next to the detectors
+            detector_t, samples = recorder.time_series()
+            detector_quality = None if quality is None else quality[..., recorder.indices]
+            results['detectors'] = {
+                'x': recorder.positions,
+                'grid_t': detector_t,
+                'density': np.moveaxis(samples, 0, -2),
+                'velocity': np.moveaxis(solver.get_velocity(samples, detector_quality), 0, -2),
+                'flow': np.moveaxis(solver.get_flow(samples, detector_quality), 0, -2)
             }
+        
+        if writer is not None:
+            writer.finalize(results['parameters'], detectors=results.get('detectors'))
+            results['results_dir'] = output_dir
+        
+        return solver.lazy_results(results)
+    
+    def _results_summary(self):
+        """Entries describing the model at the top level of the results."""
+        return {}
+    
+    def _parameters_summary(self):
+        """Model parameters recorded with the results of a run."""
+        return {
+            'v_max': self.v_max,
+            'rho_max': self.rho_max,
+            'fundamental_diagram': type(self.fundamental_diagram).__name__,
+            **self.numerical_methods()
+        }
+    
+    def lazy_results(self, data):
+        """
+        Wrap density-only results with lazily derived velocity and flow.
+        
+        The fields are derived in the precision of the stored densities with a
+        copy of the model taken now, so later changes of its parameters do not
+        affect them.
+        
+        Args:
+            data: Results dictionary with 'density' of shape (..., nt, nx) and
+                  'road_quality' (None or missing for a perfect road)
+            
+        Returns:
+            SimulationResults with derived 'velocity' and 'flow'
+        """
+        density = data['density']
+        model = copy.deepcopy(self.with_dtype(density.dtype))
+        quality = data.get('road_quality')
+        axis = np.ndim(density) - 2
+        
+        derived = {
+            'velocity': lambda frames: map_frames(
+                lambda rho: model.get_velocity(rho, quality), density, frames, axis),
+            'flow': lambda frames: map_frames(
+                lambda rho: model.get_flow(rho, quality), density, frames, axis)
         }
+        return SimulationResults(data, derived, dict.fromkeys(('density', 'velocity', 'flow'), axis))
@@ -5,8 +5,18 @@ This module implements an extension of the classic LWR model to handle
 multiple vehicle classes with different characteristics and interactions.
 """
 
+import copy
+import warnings
 import numpy as np
-from .lwr_model import LWRModel
+from .lwr_model import LWRModel, evaluate_on_grid
+from ..utils.time_stepping import (
+    TimeIntegrator, VirtualDetectors, check_time_integration, clocked_step, ssp_runge_kutta
+)
+from ..utils.results_store import allocate_results
+from ..utils.simulation_results import SimulationResults, map_frames
+from ..utils.numerical_methods import get_flux_scheme
+from ..utils.reconstruction import check_reconstruction, reconstruct_states
+from ..utils.boundary_conditions import BoundaryFlows, apply_boundary_flows, corridor_flow_frames
 
 
 class VehicleClass:
@@ -54,7 +64,11 @@ class MulticlassLWRModel:
     particularly focusing on the special behaviors of motorcycles.
     """
     
-    def __init__(self, vehicle_classes=None, n_classes=2):
+    # Floating point type of the solver state and class parameter arrays
+    dtype = np.dtype(np.float64)
+    
+    def __init__(self, vehicle_classes=None, n_classes=2, flux_scheme='godunov',
+                 reconstruction='none', limiter='minmod', time_integration='euler'):
         """
         Initialize the multiclass LWR traffic model with specific vehicle classes.
         
@@ -69,6 +83,18 @@ class MulticlassLWRModel:
                            Each dictionary should contain parameters for VehicleClass.
                            
             n_classes: Number of vehicle classes to model (default: 2 - motorcycles and cars)
+            
+            flux_scheme: Numerical flux, a name of numerical_methods.FLUX_SCHEMES
+            
+            reconstruction: Interface reconstruction of the class densities, 'none'
+                            (first order), 'muscl' (second order) or 'weno5' (fifth order)
+            
+            limiter: Slope limiter of the MUSCL reconstruction, 'minmod' or 'van_leer'
+            
+            time_integration: 'euler', 'ssp_rk2' or 'ssp_rk3' (see LWRModel)
+        
+        Raises:
+            ValueError: If a numerical method is unknown
         
         Examples:
             # Create a model with default classes (motorcycles and cars)
@@ -90,6 +116,14 @@ class MulticlassLWRModel:
             model = MulticlassLWRModel(vehicle_classes=classes)
         """
         self.n_classes = n_classes
+        # Validate the numerical methods early
+        get_flux_scheme(flux_scheme)
+        check_reconstruction(reconstruction, limiter)
+        check_time_integration(time_integration)
+        self.flux_scheme = flux_scheme
+        self.reconstruction = reconstruction
+        self.limiter = limiter
+        self.time_integration = time_integration
         
         # Default parameters if none provided
         if vehicle_classes is None:
@@ -234,70 +268,297 @@ class MulticlassLWRModel:
             else:
                 return 0  # Vacuum state
     
-    def calculate_dt(self, rho_array, dx, cfl_factor=0.9):
+    def class_parameters(self):
+        """
+        Stack the vehicle class parameters into column vectors.
+        
+        Each array has shape (n_classes, 1) so that it broadcasts against a
+        structure-of-arrays state of shape (n_classes, nx), and has the model's
+        dtype. Ensembles override this method to add a leading member axis.
+        
+        Returns:
+            dict: Arrays for 'v_max', 'rho_max', 'eta', 'beta' and 'lambda_min'
+        """
+        return {
+            name: np.array([getattr(vc, name) for vc in self.vehicle_classes], dtype=self.dtype)[:, None]
+            for name in ('v_max', 'rho_max', 'eta', 'beta', 'lambda_min')
+        }
+    
+    def interaction_modulation(self, rho):
+        """
+        Calculate the motorcycle interaction factor of every class in every cell.
+        
+        Class 0 (motorcycles) is unmodulated; the other classes are slowed
+        down by interweaving, f_i = 1 - β_i ρ_m / ρ_max_i.
+        
+        Args:
+            rho: Class densities of shape (..., n_classes, nx)
+            
+        Returns:
+            Modulation factors of shape (..., n_classes, nx)
+        """
+        params = self.class_parameters()
+        modulation = 1.0 - params['beta'] * rho[..., :1, :] / params['rho_max']
+        modulation[..., 0, :] = 1.0
+        return modulation
+    
+    def class_flow(self, rho, modulation=None, quality=None):
+        """
+        Calculate the flux of each class as a function of its own density.
+        
+        This is the flux function used by the Godunov scheme: each class follows
+        a Greenshields law in its own density, scaled by the interaction factor
+        and by the class-specific road quality of the cell.
+        
+        Args:
+            rho: Class densities of shape (n_classes, nx)
+            modulation: Interaction factors of shape (n_classes, nx); computed
+                        from rho if None
+            quality: Road quality coefficients of shape (n_classes, nx), or None
+            
+        Returns:
+            Class flows of shape (n_classes, nx)
+        """
+        params = self.class_parameters()
+        if modulation is None:
+            modulation = self.interaction_modulation(rho)
+        velocity = np.maximum(0, params['v_max'] * (1.0 - rho / params['rho_max']) * modulation)
+        if quality is not None:
+            velocity = quality * velocity
+        return rho * velocity
+    
+    def demand(self, rho, modulation=None, quality=None):
+        """
+        Sending (demand) function of every class in every cell.
+        
+        Args:
+            rho: Class densities of shape (n_classes, nx)
+            modulation: Interaction factors (computed from rho if None)
+            quality: Road quality coefficients of shape (n_classes, nx), or None
+            
+        Returns:
+            Class demands of shape (n_classes, nx)
+        """
+        if modulation is None:
+            modulation = self.interaction_modulation(rho)
+        rho_c = self.class_parameters()['rho_max'] / 2.0
+        return self.class_flow(np.minimum(rho, rho_c), modulation, quality)
+    
+    def supply(self, rho, modulation=None, quality=None):
+        """
+        Receiving (supply) function of every class in every cell.
+        
+        Args:
+            rho: Class densities of shape (n_classes, nx)
+            modulation: Interaction factors (computed from rho if None)
+            quality: Road quality coefficients of shape (n_classes, nx), or None
+            
+        Returns:
+            Class supplies of shape (n_classes, nx)
+        """
+        if modulation is None:
+            modulation = self.interaction_modulation(rho)
+        rho_c = self.class_parameters()['rho_max'] / 2.0
+        return self.class_flow(np.maximum(rho, rho_c), modulation, quality)
+    
+    def numerical_methods(self):
+        """
+        Get the numerical methods of the solver.
+        
+        Returns:
+            dict: Flux scheme, reconstruction, limiter and time integration names
+        """
+        return {
+            'flux_scheme': self.flux_scheme,
+            'reconstruction': self.reconstruction,
+            'limiter': self.limiter,
+            'time_integration': self.time_integration
+        }
+    
+    def interface_flux(self, rho, quality=None, dt_dx=None):
+        """
+        Calculate the numerical flux of all classes at all interior interfaces.
+        
+        The interface states are the class densities of the cells, or
+        reconstructed ones for the higher-order schemes (see reconstruction.py).
+        
+        With the default Godunov scheme the interaction factor and the road
+        quality are frozen in each cell, so the flux of class i through an
+        interface is min(D_i(left cell), S_i(right cell)); at a quality change
+        this is the exact solution of the Riemann problem with discontinuous flux.
+        
+        Args:
+            rho: Class densities of shape (..., n_classes, nx)
+            quality: Road quality coefficients of shape (..., n_classes, nx), or None
+            dt_dx: Ratio of the time and space steps (h/km), needed by the
+                   Lax-Friedrichs flux only
+            
+        Returns:
+            Interface fluxes of shape (..., n_classes, nx-1)
+        """
+        states = reconstruct_states(rho, self.reconstruction, self.limiter, quality)
+        return get_flux_scheme(self.flux_scheme)(self, rho, quality, dt_dx, states)
+    
+    def cell_flux(self, rho, quality=None):
+        """
+        Physical class fluxes of each cell (flux protocol of numerical_methods.py).
+        
+        Args:
+            rho: Class densities of shape (..., n_classes, nx)
+            quality: Road quality coefficients of shape (..., n_classes, nx), or None
+            
+        Returns:
+            Class flows of shape (..., n_classes, nx)
+        """
+        return self.class_flow(rho, quality=quality)
+    
+    def wave_speed_bounds(self, rho, quality=None):
+        """
+        Slowest and fastest characteristic speeds of each cell.
+        
+        The bounds are the extreme real parts of the flux Jacobian eigenvalues,
+        shared by all classes of a cell.
+        
+        Args:
+            rho: Class densities of shape (..., n_classes, nx)
+            quality: Road quality coefficients of shape (..., n_classes, nx), or None
+            
+        Returns:
+            tuple: (slowest, fastest) wave speeds of shape (..., 1, nx) (km/h)
+        """
+        speeds, _ = self.characteristic_speeds(rho, quality=quality)
+        speeds = speeds.real
+        return np.min(speeds, axis=-2, keepdims=True), np.max(speeds, axis=-2, keepdims=True)
+    
+    def class_velocities(self, rho, quality=None):
+        """
+        Calculate the velocity of every class in every cell in one broadcast.
+        
+        Velocities follow the extended Greenshields law in the total density,
+        v_i = λ_i v_max_i (1 - ρ/ρ_max_i) f_i(ρ_m).
+        
+        Args:
+            rho: Class densities of shape (..., n_classes, nx)
+            quality: Road quality coefficients of shape (..., n_classes, nx), or None
+            
+        Returns:
+            Class velocities of shape (..., n_classes, nx)
+        """
+        params = self.class_parameters()
+        total_density = np.sum(rho, axis=-2, keepdims=True)
+        velocity = np.maximum(
+            0, params['v_max'] * (1.0 - total_density / params['rho_max']) * self.interaction_modulation(rho)
+        )
+        if quality is not None:
+            velocity = quality * velocity
+        return velocity
+    
+    def flux_jacobian(self, rho, quality=None):
+        """
+        Calculate the Jacobian of the coupled class fluxes in every cell.
+        
+        Entry [..., j, i, k] is ∂F_i/∂ρ_k in cell j, for the flux F_i of
+        class_flow(). Besides the diagonal, only the dependence of the
+        interacting classes on the motorcycle density (column 0) is non-zero.
+        
+        Args:
+            rho: Class densities of shape (..., n_classes, nx)
+            quality: Road quality coefficients of shape (..., n_classes, nx), or None
+            
+        Returns:
+            Jacobians of shape (..., nx, n_classes, n_classes)
+        """
+        rho = np.asarray(rho, dtype=float)
+        params = self.class_parameters()
+        modulation = self.interaction_modulation(rho)
+        # The road quality scales each class flux, i.e. each row of the Jacobian
+        v_max = params['v_max'] if quality is None else quality * params['v_max']
+        free_velocity = v_max * (1.0 - rho / params['rho_max'])
+        
+        # Cells where the velocity is clipped to zero carry no waves
+        active = free_velocity * modulation > 0
+        
+        n_classes, nx = rho.shape[-2:]
+        jacobian = np.zeros(rho.shape[:-2] + (nx, n_classes, n_classes))
+        diagonal = v_max * (1.0 - 2.0 * rho / params['rho_max']) * modulation
+        jacobian[..., np.arange(n_classes), np.arange(n_classes)] = np.swapaxes(
+            np.where(active, diagonal, 0.0), -1, -2
+        )
+        
+        # Interweaving: ∂F_i/∂ρ_m = -ρ_i v_i (1 - ρ_i/ρ_max_i) β_i / ρ_max_i
+        coupling = np.where(active, -rho * free_velocity * params['beta'] / params['rho_max'], 0.0)
+        coupling[..., 0, :] = 0.0
+        jacobian[..., 0] += np.swapaxes(coupling, -1, -2)
+        
+        return jacobian
+    
+    def characteristic_speeds(self, rho, tol=1e-9, quality=None):
+        """
+        Calculate the characteristic speeds (Jacobian eigenvalues) in every cell.
+        
+        Two classes use the closed-form eigenvalues of a 2x2 matrix, more
+        classes a batched np.linalg.eigvals over all cells.
+        
+        Args:
+            rho: Class densities of shape (..., n_classes, nx)
+            tol: Relative tolerance on the imaginary parts
+            quality: Road quality coefficients of shape (..., n_classes, nx), or None
+            
+        Returns:
+            tuple: (speeds, hyperbolic) where speeds is a complex array of shape
+                  (..., n_classes, nx) and hyperbolic a boolean array of shape
+                  (..., nx) that is False wherever the eigenvalues are not real
+        """
+        jacobian = self.flux_jacobian(rho, quality)
+        
+        if self.n_classes == 1:
+            speeds = jacobian[..., 0].astype(complex)
+        elif self.n_classes == 2:
+            a, b = jacobian[..., 0, 0], jacobian[..., 0, 1]
+            c, d = jacobian[..., 1, 0], jacobian[..., 1, 1]
+            half_trace = 0.5 * (a + d)
+            root = np.sqrt((0.25 * (a - d) ** 2 + b * c).astype(complex))
+            speeds = np.stack([half_trace - root, half_trace + root], axis=-1)
+        else:
+            speeds = np.linalg.eigvals(jacobian)
+        
+        hyperbolic = np.all(np.abs(speeds.imag) <= tol * (np.abs(speeds.real) + 1.0), axis=-1)
+        return np.swapaxes(speeds, -1, -2), hyperbolic
+    
+    def calculate_dt(self, rho_array, dx, cfl_factor=0.9, quality=None):
         """
         Calculate time step based on CFL condition for multiclass model.
         
+        The bound uses the largest characteristic speed of the current state,
+        i.e. the spectral radius of the flux Jacobian over all cells. Cells
+        whose characteristic speeds are not real raise a RuntimeWarning, as
+        the system is not hyperbolic there and the bound is not reliable.
+        
         Args:
             rho_array: Array of densities for all classes [n_classes, nx]
             dx: Spatial step size (km)
             cfl_factor: Safety factor for CFL condition (0-1)
+            quality: Road quality coefficients of shape (n_classes, nx), or None
             
         Returns:
             Time step (h)
         """
-        # Calculate total density
-        total_density = np.sum(rho_array, axis=0)
-        
-        # Motorcycle density (class 0)
-        motorcycle_density = rho_array[0]
-        
-        # Initialize maximum wave speed
-        max_wave_speed = 0
-        
-        for i in range(self.n_classes):
-            vc = self.vehicle_classes[i]
-            
-            # For each position in the domain
-            for j in range(total_density.shape[0]):
-                # Current densities at this position
-                rho_total = total_density[j]
-                rho_moto = motorcycle_density[j]
-                
-                # Base flux derivative for class i
-                base_derivative = vc.v_max * (1 - 2 * rho_total / vc.rho_max)
-                
-                # Additional modulation effects (for both gap-filling and interweaving)
-                if i == 0:  # Motorcycle class
-                    # Gap-filling effect modifies wave speed
-                    modulation = 1 + vc.eta * (rho_moto / vc.rho_max)
-                    wave_speed = base_derivative * modulation
-                    
-                    # Additional wave speed component from gap-filling function derivative
-                    if rho_total > 0:
-                        gap_filling_derivative = vc.v_max * vc.eta * (1 - rho_total / vc.rho_max) / vc.rho_max
-                        wave_speed += rho_moto * gap_filling_derivative
-                else:
-                    # Interweaving effect for other vehicle classes
-                    modulation = 1 - vc.beta * (rho_moto / vc.rho_max)
-                    wave_speed = base_derivative * modulation
-                    
-                    # Additional wave speed component from interweaving function derivative
-                    if rho_total > 0:
-                        interweaving_derivative = -vc.v_max * vc.beta * (1 - rho_total / vc.rho_max) / vc.rho_max
-                        wave_speed += rho_array[i, j] * interweaving_derivative
-                
-                # Update maximum wave speed
-                max_wave_speed = max(max_wave_speed, abs(wave_speed))
-        
-        # Ensure we don't miss the free-flow wave speed
-        for i in range(self.n_classes):
-            max_wave_speed = max(max_wave_speed, self.vehicle_classes[i].v_max)
+        speeds, hyperbolic = self.characteristic_speeds(np.asarray(rho_array, dtype=float), quality=quality)
+        if not np.all(hyperbolic):
+            cells = np.flatnonzero(~np.all(hyperbolic.reshape(-1, hyperbolic.shape[-1]), axis=0))
+            warnings.warn(f"The multiclass system is not hyperbolic in {len(cells)} cells "
+                          f"(first at index {cells[0]}); the CFL step may be unstable",
+                          RuntimeWarning, stacklevel=2)
+        max_wave_speed = float(np.max(np.abs(speeds)))
+        
+        # A fully stopped state carries no waves; fall back to free-flow speed
+        if max_wave_speed <= 0:
+            max_wave_speed = self.v_max
         
         # CFL condition: dt ≤ dx / max_wave_speed
         dt = cfl_factor * dx / max_wave_speed
         
-        return dt
+        return float(dt)
     
     def compute_road_quality(self, road_quality_func, x, class_idx):
         """
@@ -323,32 +584,128 @@ class MulticlassLWRModel:
         
         return scaled_quality
     
-    def simulate(self, initial_density, domain_length, simulation_time, dx, dt=None, 
-                cfl_factor=0.9, road_quality_func=None):
+    def road_quality_profile(self, road_quality_func, x):
         """
-        Solve the multiclass LWR model using Godunov's scheme.
+        Evaluate the class-specific road quality on the whole grid once.
+        
+        The resulting λ array scales the class fluxes cell by cell.
         
         Args:
-            initial_density: Initial density distribution (array [n_classes, nx] or function)
-            domain_length: Length of the spatial domain (km)
-            simulation_time: Total simulation time (h)
+            road_quality_func: Function that returns base road quality at position x,
+                               or base qualities already sampled on the grid
+            x: Grid positions of shape (nx,)
+            
+        Returns:
+            Road quality coefficients of shape (n_classes, nx)
+        """
+        if road_quality_func is None:
+            return np.ones((self.n_classes, len(x)))
+        
+        base_quality = evaluate_on_grid(road_quality_func, x)
+        lambda_min = self.class_parameters()['lambda_min']
+        return lambda_min + (1.0 - lambda_min) * base_quality
+    
+    def aggregate_fields(self, class_densities, class_velocities, axis=0):
+        """
+        Aggregate class fields into total density, mean velocity and total flow.
+        
+        Args:
+            class_densities: Class densities with the class along the given axis
+            class_velocities: Class velocities of the same shape
+            axis: Class axis (the first one by default)
+            
+        Returns:
+            tuple: (total density, density-weighted average velocity, total flow)
+        """
+        total_density = np.sum(class_densities, axis=axis)
+        total_flow = np.sum(class_densities * class_velocities, axis=axis)
+        
+        # Calculate average velocity weighted by density
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_velocity = total_flow / np.maximum(total_density, 1e-10)
+            avg_velocity = np.nan_to_num(avg_velocity)  # Replace NaNs with zeros
+        
+        return total_density, avg_velocity, total_flow
+    
+    def advance(self, rho, dt, dx, flux=None, out=None, quality=None, caps=None, boundary=None):
+        """
+        Advance all class densities by one time step (forward Euler or SSP
+        Runge-Kutta, see LWRModel.advance()).
+        
+        Args:
+            rho: Class densities of shape (..., n_classes, nx)
+            dt: Time step (h)
             dx: Spatial step size (km)
-            dt: Time step size (h), if None calculated from CFL
-            cfl_factor: Safety factor for CFL condition (0-1)
-            road_quality_func: Function returning road quality coefficient at position x
+            flux: Optional scratch buffer of shape (..., n_classes, nx+1)
+            out: Optional output array (may be rho itself for an in-place update)
+            quality: Road quality coefficients of shape (..., n_classes, nx), or None
+            caps: Optional (interfaces, factors) pair scaling the class fluxes
+                  through some interior interfaces (see LWRModel.advance())
+            boundary: Optional (inflow, outflow) row of BoundaryFlows with one
+                      flow per class, replacing the zero-gradient boundary fluxes
             
         Returns:
-            Dictionary containing simulation results
+            Updated class densities of shape (..., n_classes, nx)
         """
-        # Create spatial grid
-        nx = int(domain_length / dx) + 1
-        x = np.linspace(0, domain_length, nx)
+        nx = rho.shape[-1]
+        if flux is None:
+            flux = np.empty(rho.shape[:-1] + (nx + 1,), dtype=rho.dtype)
+        
+        def euler_step(state, out):
+            # Calculate fluxes at cell interfaces for all classes
+            flux[..., 1:nx] = self.interface_flux(state, quality, dt / dx)
+            
+            # Boundary conditions: zero gradient, or the boundary flows
+            flux[..., 0] = flux[..., 1]
+            flux[..., nx] = flux[..., nx-1]
+            if boundary is not None:
+                apply_boundary_flows(self, state, flux, boundary, quality)
+            
+            if caps is not None:
+                flux[..., caps[0]] *= caps[1]
+            
+            # Update density using conservative formula, ensuring non-negative density
+            np.subtract(flux[..., 1:], flux[..., :-1], out=flux[..., :-1])
+            flux[..., :-1] *= dt / dx
+            out = np.subtract(state, flux[..., :-1], out=out)
+            return np.maximum(out, 0, out=out)
+        
+        return ssp_runge_kutta(euler_step, rho, self.time_integration, out=out)
+    
+    def initial_state(self, initial_density, x):
+        """
+        Build the initial class densities on the grid.
+        
+        Functions are first called once with the whole grid, and may then
+        return an array of shape (nx,) for the first class or one row per
+        class; functions written for scalar positions fall back to one call
+        per grid point.
         
-        # Initialize densities for all classes
+        Args:
+            initial_density: Initial density distribution (array [n_classes, nx] or
+                             function of x returning one value per class)
+            x: Grid positions of shape (nx,)
+            
+        Returns:
+            Class densities of shape (n_classes, nx)
+        """
+        nx = len(x)
         rho = np.zeros((self.n_classes, nx))
         
-        # If initial_density is a function, call it for each position
         if callable(initial_density):
+            try:
+                values = np.asarray(initial_density(np.asarray(x)), dtype=float)
+            except (TypeError, ValueError):
+                values = None
+            if values is not None and values.shape in ((), (nx,)):
+                rho[0] = values
+                return rho
+            if values is not None and values.ndim == 2 and values.shape[1] == nx:
+                n = min(self.n_classes, values.shape[0])
+                rho[:n] = values[:n]
+                return rho
+            
+            # Scalar function: call it for each position
             for j in range(nx):
                 density_at_x = initial_density(x[j])
                 if isinstance(density_at_x, (list, tuple, np.ndarray)):
@@ -372,110 +729,347 @@ class MulticlassLWRModel:
                 # Scalar value, assign to first class
                 rho[0] = float(initial_density)
         
+        return rho
+    
+    def with_dtype(self, dtype):
+        """
+        Get the model computing in a given floating point precision.
+        
+        class_parameters() follows the model's dtype, so a float32 state is
+        not promoted back to float64 by the parameter columns.
+        
+        Args:
+            dtype: Floating point type, e.g. np.float32 or np.float64 (None
+                   keeps the model's precision)
+            
+        Returns:
+            The model itself if the precision is unchanged, else a shallow copy
+            
+        Raises:
+            ValueError: If dtype is not a floating point type
+        """
+        if dtype is None or np.dtype(dtype) == self.dtype:
+            return self
+        dtype = np.dtype(dtype)
+        if dtype.kind != 'f':
+            raise ValueError(f"dtype must be a floating point type, got {dtype}")
+        
+        model = copy.copy(self)
+        model.dtype = dtype
+        return model
+    
+    def _setup(self, initial_density, domain_length, simulation_time, dx, dt, cfl_factor,
+               road_quality_func, adaptive, cfl_every, output_times, save_interval, detectors,
+               signals=None, boundary_conditions=None, sources=None):
+        """
+        Build the grid, initial state and time integrator of a run.
+        
+        Shared by simulate() and iter_simulate(). The returned state owns its
+        memory and is updated in place, using the returned flux buffer as the
+        only scratch array. Source terms are applied by Strang splitting, half
+        a source step on each side of the transport step.
+        
+        Returns:
+            tuple: (x, rho, dt, integrator, recorder, quality, boundary)
+        """
+        # Create spatial grid
+        nx = int(domain_length / dx) + 1
+        x = np.linspace(0, domain_length, nx)
+        
+        # Initialize densities for all classes in the solver precision
+        rho = self.initial_state(initial_density, x).astype(self.dtype, copy=False)
+        
+        # Road quality is evaluated once per class and cell and scales the fluxes
+        quality = None
+        if road_quality_func is not None:
+            quality = self.road_quality_profile(road_quality_func, x).astype(self.dtype, copy=False)
+        
+        signalized = signals is not None and len(signals) > 0
+        bounded = boundary_conditions is not None and any(bc is not None for bc in boundary_conditions)
+        sourced = sources is not None and len(sources) > 0
+        
         # Calculate time step if not provided
         if dt is None:
-            dt = self.calculate_dt(rho, dx, cfl_factor)
+            dt = self.calculate_dt(rho, dx, cfl_factor, quality)
+            varying_quality = quality is not None and np.ptp(quality) > 0
+            if not adaptive and (varying_quality or signalized or bounded or sourced):
+                # Quality changes, red lights, boundary flows and sources break the
+                # maximum principle (queues grow beyond the initial densities), so
+                # bound a fixed step by the fastest wave
+                v_max = self.class_parameters()['v_max']
+                max_speed = float(np.max(v_max if quality is None else quality * v_max))
+                dt = min(dt, cfl_factor * dx / max_speed)
+        
+        # Virtual detectors sample the state at full temporal resolution
+        recorder = VirtualDetectors(detectors, x) if detectors is not None else None
         
-        # Create time grid
-        nt = int(simulation_time / dt) + 1
-        t = np.linspace(0, simulation_time, nt)
+        # Boundary flows are sampled once, one row per fixed step
+        boundary = None
+        if bounded:
+            boundary = BoundaryFlows(boundary_conditions, dt, simulation_time, self.n_classes, self.dtype)
         
-        # Initialize result arrays for all classes
-        densities = np.zeros((self.n_classes, nt, nx))
-        velocities = np.zeros((self.n_classes, nt, nx))
-        flows = np.zeros((self.n_classes, nt, nx))
+        # Source rates are sampled the same way, on sparse (cell, class, rate) entries
+        table = sources.table(x, dt, simulation_time, self.n_classes, self.dtype) if sourced else None
         
-        # Set initial conditions for all classes
-        for i in range(self.n_classes):
-            densities[i, 0] = rho[i]
+        # Time integration, with frames delivered on the output grid
+        flux = np.empty(rho.shape[:-1] + (nx + 1,), dtype=self.dtype)
+        advance = lambda r, h: self.advance(r, h, dx, flux=flux, out=r, quality=quality)
+        if signalized or bounded or sourced:
+            # Signals cap the class fluxes, motorcycles starting early
+            interfaces = signals.corridor_interfaces(x) if signalized else None
+            
+            def step(r, h, t):
+                caps = None if not signalized else (interfaces, signals.green(t, self.n_classes, self.dtype))
+                flows = None if boundary is None else boundary.at(t)
+                if sourced:
+                    table.apply(self, r, h / 2, t, quality)
+                r = self.advance(r, h, dx, flux=flux, out=r, quality=quality, caps=caps, boundary=flows)
+                if sourced:
+                    table.apply(self, r, h / 2, t, quality)
+                return r
+            
+            advance = clocked_step(step)
+        integrator = TimeIntegrator(
+            advance=advance,
+            simulation_time=simulation_time,
+            dt=dt,
+            stable_dt=lambda r: self.calculate_dt(r, dx, cfl_factor, quality),
+            adaptive=adaptive,
+            cfl_every=cfl_every,
+            output_times=output_times,
+            save_interval=save_interval,
+            observer=recorder.record if recorder is not None else None
+        )
+        return x, rho, dt, integrator, recorder, quality, boundary
+    
+    def iter_simulate(self, initial_density, domain_length, simulation_time, dx, dt=None,
+                      cfl_factor=0.9, road_quality_func=None, adaptive=False, cfl_every=1,
+                      output_times=None, save_interval=None, dtype=None, signals=None,
+                      boundary_conditions=None, sources=None):
+        """
+        Solve the multiclass LWR model lazily, yielding one frame at each output time.
         
-        # Calculate initial velocities and flows based on initial densities
-        total_density = np.sum(rho, axis=0)
+        Only the current (n_classes, nx) state and one flux buffer are held in
+        memory, so long or unbounded runs (simulation_time=None) stream in fixed
+        memory. The yielded array is the live solver state and is overwritten by
+        the next step; copy it to keep it.
         
-        for i in range(self.n_classes):
-            for j in range(nx):
-                # Apply road quality if provided
-                quality = self.compute_road_quality(road_quality_func, x[j], i) if road_quality_func else 1.0
-                
-                # Calculate velocity with road quality factor
-                velocities[i, 0, j] = quality * self.get_velocity(
-                    total_density[j], i, rho[0, j] if i > 0 else None
-                )
-                
-                flows[i, 0, j] = rho[i, j] * velocities[i, 0, j]
-        
-        # Main time integration loop
-        for n in range(nt - 1):
-            # Update density for each class
-            for i in range(self.n_classes):
-                # Calculate fluxes at cell interfaces
-                flux = np.zeros(nx + 1)
-                
-                for j in range(1, nx):
-                    # For fluxes that depend on motorcycle density
-                    if i > 0:  # Non-motorcycle classes
-                        flux[j] = self.godunov_flux(
-                            rho[i, j-1], rho[i, j], i, 
-                            rho[0, j-1], rho[0, j]
-                        )
-                    else:  # Motorcycle class
-                        flux[j] = self.godunov_flux(rho[i, j-1], rho[i, j], i)
-                
-                # Boundary conditions: zero gradient
-                flux[0] = flux[1]
-                flux[nx] = flux[nx-1]
-                
-                # Update density using conservative formula
-                rho[i] = rho[i] - dt / dx * (flux[1:] - flux[:-1])
-                
-                # Ensure non-negative density
-                rho[i] = np.maximum(0, rho[i])
-            
-            # Recalculate total density
-            total_density = np.sum(rho, axis=0)
-            
-            # Calculate velocities and flows for this time step
-            for i in range(self.n_classes):
-                for j in range(nx):
-                    # Apply road quality if provided
-                    quality = self.compute_road_quality(road_quality_func, x[j], i) if road_quality_func else 1.0
-                    
-                    # Calculate velocity with road quality factor
-                    velocities[i, n+1, j] = quality * self.get_velocity(
-                        total_density[j], i, rho[0, j] if i > 0 else None
-                    )
-                    
-                    flows[i, n+1, j] = rho[i, j] * velocities[i, n+1, j]
+        Args:
+            initial_density: Initial density distribution (array [n_classes, nx] or function)
+            domain_length: Length of the spatial domain (km)
+            simulation_time: Total simulation time (h), or None to run until
+                             the consumer stops iterating
+            dx: Spatial step size (km)
+            dt: Time step size (h), if None calculated from CFL
+            cfl_factor: Safety factor for CFL condition (0-1)
+            road_quality_func: Function returning road quality coefficient at position x,
+                               or coefficients sampled on the grid
+            adaptive: Recompute the CFL time step from the current state during the run
+            cfl_every: In adaptive mode, recompute the time step every cfl_every steps
+            output_times: Times (h) of the yielded frames
+            save_interval: Time (h) between yielded frames, an alternative to output_times
+            dtype: Floating point precision of the state and results, e.g. np.float32
+                   (None keeps the model's precision)
+            signals: TrafficSignals located by position (km), or None
+            boundary_conditions: (inflow, outflow) profiles (see simulate())
+            sources: SourceTerms with one vehicle class per source, or None
             
-            # Store results for this time step
-            for i in range(self.n_classes):
-                densities[i, n+1] = rho[i]
+        Yields:
+            tuple: (t, class_densities) for each output frame
+        """
+        solver = self.with_dtype(dtype)
+        _, rho, _, integrator, _, _, _ = solver._setup(
+            initial_density, domain_length, simulation_time, dx, dt, cfl_factor,
+            road_quality_func, adaptive, cfl_every, output_times, save_interval, None, signals,
+            boundary_conditions, sources
+        )
+        for _, t, rho in integrator.run(rho):
+            yield t, rho
+    
+    def simulate(self, initial_density, domain_length, simulation_time, dx, dt=None, 
+                cfl_factor=0.9, road_quality_func=None, adaptive=False, cfl_every=1,
+                output_times=None, save_interval=None, detectors=None, output_dir=None,
+                dtype=None, signals=None, boundary_conditions=None, sources=None):
+        """
+        Solve the multiclass LWR model using Godunov's scheme.
         
-        # Calculate aggregate measures
-        total_density = np.sum(densities, axis=0)
-        total_flow = np.sum(flows, axis=0)
+        Args:
+            initial_density: Initial density distribution (array [n_classes, nx] or function)
+            domain_length: Length of the spatial domain (km)
+            simulation_time: Total simulation time (h)
+            dx: Spatial step size (km)
+            dt: Time step size (h), if None calculated from CFL
+            cfl_factor: Safety factor for CFL condition (0-1)
+            road_quality_func: Function returning road quality coefficient at position x,
+                               or coefficients sampled on the grid
+            adaptive: Recompute the CFL time step from the current state during the run
+            cfl_every: In adaptive mode, recompute the time step every cfl_every steps
+            output_times: Times (h) at which results are stored; if None, every step
+                          is stored (fixed mode) or 101 evenly spaced frames (adaptive)
+            save_interval: Time (h) between stored frames, an alternative to output_times
+            detectors: Positions (km) of virtual detectors recorded at every time step
+            output_dir: If given, frames are written to memory-mapped .npy files
+                        in this directory (with a JSON sidecar) instead of RAM
+            dtype: Floating point precision of the state and results, e.g. np.float32
+                   (None keeps the model's precision)
+            signals: TrafficSignals located by position (km), capping the class
+                     fluxes through the interfaces they control, or None
+            boundary_conditions: (inflow, outflow) pair of upstream demand and
+                                 downstream supply profiles with one flow per
+                                 class, None for a zero-gradient side
+            sources: SourceTerms located by position (km), each feeding or
+                     draining one vehicle class, or None
+            
+        Returns:
+            SimulationResults storing the densities, with velocities and flows
+            derived on first access (see lazy_results()); the fields keep the
+            leading axes of the state (e.g. the members of an ensemble), and
+            parameters['non_hyperbolic_cells'] counts the cells whose
+            characteristic speeds are not real in some stored frame
+        """
+        if simulation_time is None:
+            raise ValueError("simulate() needs a finite simulation_time; use iter_simulate() to stream")
         
-        # Calculate average velocity weighted by density
-        with np.errstate(divide='ignore', invalid='ignore'):
-            avg_velocity = np.sum(densities * velocities, axis=0) / np.maximum(total_density, 1e-10)
-            avg_velocity = np.nan_to_num(avg_velocity)  # Replace NaNs with zeros
+        solver = self.with_dtype(dtype)
+        x, rho, dt, integrator, recorder, quality, boundary = solver._setup(
+            initial_density, domain_length, simulation_time, dx, dt, cfl_factor,
+            road_quality_func, adaptive, cfl_every, output_times, save_interval, detectors, signals,
+            boundary_conditions, sources
+        )
+        nx = len(x)
+        t = integrator.output_times
+        nt = len(t)
+        
+        # Initialize the class density arrays, in memory or memory-mapped on
+        # disk; velocities, flows and aggregates are derived when requested
+        fields = {'class_densities': rho.shape[:-1] + (nt, nx)}
+        if quality is not None:
+            fields['road_quality'] = quality.shape
+        writer, arrays = allocate_results(fields, output_dir, x, t, solver.dtype)
+        densities = arrays['class_densities']
+        if quality is not None:
+            arrays['road_quality'][...] = quality
+        
+        # Main time integration loop: the whole (..., n_classes, nx) state is
+        # advanced at once; the cells losing hyperbolicity are tracked on the
+        # stored frames
+        non_hyperbolic = np.zeros(nx, dtype=bool)
+        for n, _, rho in integrator.run(rho):
+            densities[..., n, :] = rho
+            _, hyperbolic = solver.characteristic_speeds(rho, quality=quality)
+            non_hyperbolic |= ~np.all(hyperbolic.reshape(-1, nx), axis=0)
         
         # Return results as dictionary
-        return {
-            'density': total_density,
-            'velocity': avg_velocity,
-            'flow': total_flow,
+        results = {
             'class_densities': densities,
-            'class_velocities': velocities,
-            'class_flows': flows,
+            'road_quality': arrays.get('road_quality'),
             'grid_x': x,
             'grid_t': t,
-            'n_classes': self.n_classes,
+            **self._results_summary(),
             'parameters': {
-                'vehicle_classes': [vc.__dict__ for vc in self.vehicle_classes],
+                **self._parameters_summary(),
                 'dx': dx,
                 'dt': dt,
+                'adaptive': adaptive,
                 'domain_length': domain_length,
-                'simulation_time': simulation_time
+                'simulation_time': simulation_time,
+                'dtype': solver.dtype.name,
+                'non_hyperbolic_cells': int(np.count_nonzero(non_hyperbolic)),
+                **integrator.statistics()
             }
         }
+        if signals is not None:
+            results['parameters']['signals'] = signals.summary()
+        if sources is not None:
+            results['parameters']['sources'] = sources.summary()
+        if boundary is not None:
+            results['boundary_flows'] = corridor_flow_frames(boundary, t)
+        
+        if recorder is not None:
+            detector_t, samples = recorder.time_series()
+            
+            # (n_records, ..., n_classes, n_detectors) -> (..., n_classes, n_records, n_detectors),
+            # evaluated at once on a flattened (..., n_classes, n_records*n_detectors) state
+            class_densities = np.moveaxis(samples, 0, -2)
+            flat_shape = class_densities.shape[:-2] + (-1,)
+            flat = class_densities.reshape(flat_shape)
+            flat_quality = None
+            if quality is not None:
+                flat_quality = np.broadcast_to(
+                    quality[..., None, recorder.indices], class_densities.shape
+                ).reshape(flat_shape)
+            class_flows = (flat * solver.class_velocities(flat, flat_quality)).reshape(class_densities.shape)
+            
+            results['detectors'] = {
+                'x': recorder.positions,
+                'grid_t': detector_t,
+                'density': np.sum(class_densities, axis=-3),
+                'flow': np.sum(class_flows, axis=-3),
+                'class_densities': class_densities,
+                'class_flows': class_flows
+            }
+        
+        if writer is not None:
+            writer.finalize(results['parameters'], detectors=results.get('detectors'))
+            results['results_dir'] = output_dir
+        
+        return solver.lazy_results(results)
+    
+    def _results_summary(self):
+        """Entries describing the model at the top level of the results."""
+        return {'n_classes': self.n_classes}
+    
+    def _parameters_summary(self):
+        """Model parameters recorded with the results of a run."""
+        return {
+            'vehicle_classes': [vc.__dict__ for vc in self.vehicle_classes],
+            **self.numerical_methods()
+        }
+    
+    def lazy_results(self, data):
+        """
+        Wrap class-density-only results with lazily derived fields.
+        
+        Class velocities and flows and the aggregate density, velocity and
+        flow are derived in the precision of the stored densities with a copy
+        of the model taken now, so later changes of its parameters do not
+        affect them.
+        
+        Args:
+            data: Results dictionary with 'class_densities' of shape
+                  (..., n_classes, nt, nx) and 'road_quality' of shape
+                  (..., n_classes, nx) (None or missing for a perfect road)
+            
+        Returns:
+            SimulationResults with derived 'class_velocities', 'class_flows',
+            'density', 'velocity' and 'flow'
+        """
+        class_densities = data['class_densities']
+        model = copy.deepcopy(self.with_dtype(class_densities.dtype))
+        quality = data.get('road_quality')
+        axis = np.ndim(class_densities) - 2
+        
+        def velocities(rho):
+            return model.class_velocities(rho, quality)
+        
+        def aggregate(index):
+            return lambda rho: model.aggregate_fields(rho, velocities(rho), axis=-2)[index]
+        
+        def class_field(func):
+            return lambda frames: map_frames(func, class_densities, frames, axis)
+        
+        def aggregate_field(func):
+            return lambda frames: map_frames(func, class_densities, frames, axis, axis - 1)
+        
+        derived = {
+            'class_velocities': class_field(velocities),
+            'class_flows': class_field(lambda rho: rho * velocities(rho)),
+            'density': aggregate_field(lambda rho: np.sum(rho, axis=-2)),
+            'velocity': aggregate_field(aggregate(1)),
+            'flow': aggregate_field(aggregate(2))
+        }
+        time_axes = {
+            **dict.fromkeys(('class_densities', 'class_velocities', 'class_flows'), axis),
+            **dict.fromkeys(('density', 'velocity', 'flow'), axis - 1)
+        }
+        return SimulationResults(data, derived, time_axes)
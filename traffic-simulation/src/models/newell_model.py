@@ -0,0 +1,330 @@
+"""
+Newell Link Model
+
+This module implements Newell's simplified kinematic wave model for the
+triangular fundamental diagram: only the cumulative counts at the link
+boundaries are computed, with time steps as long as a link's free-flow time.
+"""
+
+import numpy as np
+
+from .grid_free import GridFreeLWR
+from .fundamental_diagram import TriangularDiagram
+from ..utils.boundary_conditions import BoundaryFlows
+
+
+class CumulativeCurves:
+    """
+    Cumulative counts at the nodes of a corridor, advanced by Newell's method.
+
+    The count of a node is the smallest of the upstream count L/v_max
+    earlier, the downstream count L/w earlier plus ρ_max L, its own count a
+    step earlier plus a step at capacity, and the initial counts within
+    reach of the waves. The counts start at 0 at the upstream end of the
+    road and decrease downstream by the initial vehicles; they are stored at
+    every step, so the count at any position and earlier time is read back
+    from them. A zero-gradient side keeps the demand or supply of its
+    initial end state.
+    """
+
+    def __init__(self, diagram, edges, densities, nodes, dt, quality=1.0,
+                 boundary=None, end_flows=(0.0, 0.0)):
+        """
+        Set up the nodes of a corridor.
+
+        Args:
+            diagram: TriangularDiagram of the road
+            edges: Increasing cell interfaces (km), of shape (n_cells + 1,)
+            densities: Cell densities (vehicles/km), of shape (n_cells,)
+            nodes: Indices into edges of the link boundaries, from 0 to n_cells
+            dt: Time step (h), at most the free-flow travel time of every link
+            quality: Uniform road quality coefficient scaling the flux
+            boundary: BoundaryFlows of the (inflow, outflow) profiles, or None
+            end_flows: Demand entering and supply leaving the road (vehicles/h)
+                       at the zero-gradient sides
+
+        Raises:
+            ValueError: If the time step exceeds a free-flow travel time
+        """
+        self.v = quality * float(diagram.v_max)
+        self.w = quality * float(diagram.w)
+        self.rho_max = float(diagram.rho_max)
+        self.rho_c = float(diagram.critical_density())
+        self.capacity = self.v * self.rho_c
+
+        self.edges = np.asarray(edges, dtype=float)
+        densities = np.asarray(densities, dtype=float)
+        self.initial_counts = np.concatenate(([0.0], -np.cumsum(densities * np.diff(self.edges))))
+        self.positions = self.edges[nodes]
+        self.lengths = np.diff(self.positions)
+        self.dt = float(dt)
+        # Any path from the initial state reaching a link later than this
+        # passes one of its nodes, so the initial term no longer binds
+        self.memory = float(np.max(self.lengths)) * (1 / self.v + 1 / self.w)
+        if self.dt > np.min(self.lengths) / self.v * (1 + 1e-9):
+            raise ValueError(f"Time step {dt} h exceeds the free-flow travel time "
+                             f"{np.min(self.lengths) / self.v} h of the shortest link")
+
+        # Initial term: window minima of N0(y) + ρ_c y over the interfaces,
+        # answered from a sparse table of minima over 2^k interfaces
+        self._phi = self.initial_counts + self.rho_c * self.edges
+        rows = [self._phi]
+        while 2 ** len(rows) <= len(self._phi):
+            half = 2 ** (len(rows) - 1)
+            rows.append(np.minimum(rows[-1][:-half], rows[-1][half:]))
+        self._minima = np.full((len(rows), len(self._phi)), np.inf)
+        for k, row in enumerate(rows):
+            self._minima[k, :len(row)] = row
+
+        self.boundary = boundary
+        self.end_flows = np.asarray(end_flows, dtype=float)
+        self.n_steps = 0
+        self.counts = np.empty((64, len(self.positions)))
+        self.counts[0] = self.initial_counts[nodes]
+
+    def _window_minimum(self, lo, hi):
+        """Minimum of N0 + ρ_c y over the interfaces lo..hi, inf for an empty range."""
+        size = hi - lo + 1
+        k = np.floor(np.log2(np.maximum(size, 1))).astype(np.intp)
+        first = np.clip(lo, 0, len(self._phi) - 1)
+        second = np.clip(hi - 2 ** k + 1, 0, len(self._phi) - 1)
+        minimum = np.minimum(self._minima[k, first], self._minima[k, second])
+        return np.where(size > 0, minimum, np.inf)
+
+    def initial_term(self, x, t):
+        """
+        Counts carried from the initial state to (x, t) by the waves.
+
+        Args:
+            x: Positions (km)
+            t: Times (h), broadcasting against x
+
+        Returns:
+            Upper bounds of the counts, exact while the initial vehicles
+            determine them
+        """
+        x, t = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(t, dtype=float))
+        left = np.maximum(x - self.v * t, self.edges[0])
+        right = np.minimum(x + self.w * t, self.edges[-1])
+        # N0 is linear between interfaces, so the minimum is at an interface
+        # inside the window or at one of its ends
+        ends = np.minimum(np.interp(left, self.edges, self._phi), np.interp(right, self.edges, self._phi))
+        lo = np.searchsorted(self.edges, left, side='left')
+        hi = np.searchsorted(self.edges, right, side='right') - 1
+        inner = self._window_minimum(lo, hi)
+        return self.capacity * t - self.rho_c * x + np.minimum(ends, inner)
+
+    def _curve(self, nodes, tau):
+        """Counts of nodes at times tau (h), interpolated between steps, inf before 0."""
+        position = np.maximum(tau, 0.0) / self.dt
+        step = np.minimum(np.floor(position).astype(np.intp), max(self.n_steps - 1, 0))
+        fraction = np.minimum(position - step, 1.0)
+        following = np.minimum(step + 1, self.n_steps)
+        values = (1 - fraction) * self.counts[step, nodes] + fraction * self.counts[following, nodes]
+        return np.where(tau >= -1e-9 * self.dt, values, np.inf)
+
+    def advance_to(self, t):
+        """
+        Compute the node counts up to time t.
+
+        Args:
+            t: Time (h)
+        """
+        n_steps = int(np.ceil(t / self.dt - 1e-9))
+        if n_steps + 1 > len(self.counts):
+            extra = max(n_steps + 1, 2 * len(self.counts)) - len(self.counts)
+            self.counts = np.concatenate((self.counts, np.empty((extra, self.counts.shape[1]))))
+        upstream, downstream = np.arange(len(self.positions) - 1), np.arange(1, len(self.positions))
+        for n in range(self.n_steps, n_steps):
+            t_next = (n + 1) * self.dt
+            previous = self.counts[n]
+            bound = previous + self.capacity * self.dt
+            if t_next < self.memory:
+                bound = np.minimum(bound, self.initial_term(self.positions, t_next))
+            # Free-flow sending from upstream, congested receiving from downstream
+            bound[1:] = np.minimum(bound[1:], self._curve(upstream, t_next - self.lengths / self.v))
+            bound[:-1] = np.minimum(bound[:-1], self._curve(downstream, t_next - self.lengths / self.w)
+                                    + self.rho_max * self.lengths)
+            # Demand entering and supply leaving the road
+            flows = self.end_flows
+            if self.boundary is not None:
+                flows = self.boundary.at(n * self.dt)
+                flows = np.where(np.isnan(flows), self.end_flows, flows)
+            bound[0] = min(bound[0], previous[0] + self.dt * flows[0])
+            bound[-1] = min(bound[-1], previous[-1] + self.dt * flows[1])
+            self.counts[n + 1] = np.maximum(bound, previous)
+            self.n_steps = n + 1
+
+    def count(self, x, t):
+        """
+        Cumulative count N(x, t), from the nodes around x (three-detector method).
+
+        Args:
+            x: Positions (km) within the road
+            t: Times (h), broadcasting against x
+
+        Returns:
+            Counts (vehicles) of the broadcast shape of x and t
+        """
+        x, t = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(t, dtype=float))
+        if t.size:
+            self.advance_to(float(np.max(t)))
+        link = np.clip(np.searchsorted(self.positions, x, side='right') - 1, 0, len(self.lengths) - 1)
+        to_upstream = x - self.positions[link]
+        to_downstream = self.positions[link + 1] - x
+        counts = np.minimum(self._curve(link, t - to_upstream / self.v),
+                            self._curve(link + 1, t - to_downstream / self.w) + self.rho_max * to_downstream)
+        early = t < self.memory
+        if np.any(early):
+            counts[early] = np.minimum(counts[early], self.initial_term(x[early], t[early]))
+        return counts
+
+    def density(self, x, t, width):
+        """
+        Mean density over [x - width/2, x + width/2] at time t.
+
+        Args:
+            x: Positions (km)
+            t: Times (h), broadcasting against x
+            width: Length (km) of the road section, e.g. the cell width
+
+        Returns:
+            Densities (vehicles/km) of the broadcast shape of x and t
+        """
+        x = np.asarray(x, dtype=float)
+        return (self.count(x - 0.5 * width, t) - self.count(x + 0.5 * width, t)) / width
+
+    def flows(self, t_start, t_end):
+        """
+        Mean flows through the nodes between two step times.
+
+        Args:
+            t_start: Start time (h)
+            t_end: End time (h), later than t_start
+
+        Returns:
+            Flows (vehicles/h) of shape (n_nodes,)
+        """
+        nodes = np.arange(len(self.positions))
+        self.advance_to(t_end)
+        return (self._curve(nodes, t_end) - self._curve(nodes, t_start)) / (t_end - t_start)
+
+
+class NewellLinkModel(GridFreeLWR):
+    """
+    LWR model with a triangular diagram, solved on link cumulative curves.
+
+    The model has the simulation interface of LWRModel. The corridor is
+    divided into links of about link_length km, whose boundaries carry the
+    cumulative counts; simulate() reconstructs the densities of the output
+    grid from them, with the node counts under 'cumulative_counts', and
+    solve() returns the CumulativeCurves of a run. The road quality must be
+    uniform.
+    """
+
+    SOLVER_NAME = "Newell's method"
+
+    def __init__(self, v_max=100.0, rho_max=180.0, w=20.0, fundamental_diagram=None, link_length=1.0):
+        """
+        Initialize the model.
+
+        Args:
+            v_max: Free-flow speed (km/h)
+            rho_max: Jam density (vehicles/km)
+            w: Speed of the backward waves (km/h, positive)
+            fundamental_diagram: TriangularDiagram instance; None builds one from
+                                 v_max, rho_max and w
+            link_length: Length of the links (km), rounded to whole cells
+
+        Raises:
+            ValueError: If the diagram is not triangular or link_length is not
+                        positive
+        """
+        if fundamental_diagram is None:
+            fundamental_diagram = TriangularDiagram(v_max=v_max, rho_max=rho_max, w=w)
+        if not isinstance(fundamental_diagram, TriangularDiagram):
+            raise ValueError("Newell's method needs a TriangularDiagram, "
+                             f"got {type(fundamental_diagram).__name__}")
+        if link_length <= 0:
+            raise ValueError(f"link_length must be positive, got {link_length}")
+        super().__init__(v_max=fundamental_diagram.v_max, rho_max=fundamental_diagram.rho_max,
+                         fundamental_diagram=fundamental_diagram)
+        self.link_length = float(link_length)
+
+    def numerical_methods(self):
+        """
+        Get the numerical methods of the solver.
+
+        Returns:
+            dict: Solver name and link length (km)
+        """
+        return {'flux_scheme': 'newell', 'link_length': self.link_length}
+
+    def link_nodes(self, n_cells, dx):
+        """
+        Place the link boundaries on the cell interfaces.
+
+        A last link shorter than half a link joins the previous one.
+
+        Args:
+            n_cells: Number of grid cells
+            dx: Spatial step (km)
+
+        Returns:
+            Array of interface indices from 0 to n_cells
+        """
+        cells = max(1, int(round(self.link_length / dx)))
+        nodes = np.arange(0, n_cells, cells)
+        if len(nodes) > 1 and n_cells - nodes[-1] < 0.5 * cells:
+            nodes = nodes[:-1]
+        return np.append(nodes, n_cells)
+
+    def solve(self, initial_density, domain_length, dx, dt=None, cfl_factor=0.9,
+              road_quality_func=None, simulation_time=None, boundary_conditions=None):
+        """
+        Build the cumulative curves of a run.
+
+        See GridFreeLWR.solve(); dt is the link step, by default the
+        free-flow travel time of the shortest link, and cfl_factor is not
+        used.
+
+        Returns:
+            tuple: (CumulativeCurves, grid positions, road quality on the grid
+                   or None, time step, BoundaryFlows or None)
+
+        Raises:
+            ValueError: If the initial state is not one corridor, the road
+                        quality varies or dt exceeds the free-flow travel time
+                        of a link
+        """
+        x, rho, quality = self.corridor(initial_density, domain_length, dx, road_quality_func)
+        rho = np.clip(np.asarray(rho, dtype=float), 0.0, self.rho_max)
+        scale = 1.0 if quality is None else float(quality[0])
+
+        edges = np.r_[x - 0.5 * dx, x[-1] + 0.5 * dx]
+        nodes = self.link_nodes(len(x), dx)
+        if dt is None:
+            dt = float(np.min(np.diff(edges[nodes]))) / (scale * self.fundamental_diagram.v_max)
+        boundary = None
+        if boundary_conditions is not None and any(bc is not None for bc in boundary_conditions):
+            boundary = BoundaryFlows(boundary_conditions, dt, simulation_time)
+        # Zero-gradient sides keep the demand and supply of the end states
+        end_flows = (float(self.demand(rho[:1], quality=None if quality is None else quality[:1])[0]),
+                     float(self.supply(rho[-1:], quality=None if quality is None else quality[-1:])[0]))
+        curves = CumulativeCurves(self.fundamental_diagram, edges, rho, nodes, dt, scale,
+                                  boundary, end_flows)
+        return curves, x, quality, dt, boundary
+
+    def _solution_results(self, curves, dt):
+        """The node counts of the run, under 'cumulative_counts'."""
+        return {
+            'cumulative_counts': {
+                'x': curves.positions,
+                'grid_t': dt * np.arange(curves.n_steps + 1),
+                'counts': curves.counts[:curves.n_steps + 1].copy()
+            }
+        }
+
+    def _solution_parameters(self, curves):
+        """Link and step counts of the run."""
+        return {'n_links': len(curves.lengths), 'n_steps': curves.n_steps}
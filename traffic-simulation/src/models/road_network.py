@@ -0,0 +1,675 @@
+"""
+Road Network
+
+This module simulates networks of road links joined by junctions, e.g. the
+arterials of Cotonou with their merges, diverges and signalized crossings.
+
+Every link is a LWR (or multiclass LWR) segment discretized with the common
+cell size dx. The cells of all links are packed into one state array of
+shape (..., n_cells) and link k owns the cells offsets[k]:offsets[k+1], so a
+single vectorized step advances the whole network:
+
+    1. the demand and supply of every cell are evaluated at once,
+    2. the nodes inside the links get the ordinary CTM flow min(D, S),
+    3. the junctions share the supply of their outgoing links among the
+       demands of their incoming links (JunctionTable),
+    4. the links without an upstream or downstream junction get their
+       boundary flows, and all cells are updated conservatively.
+
+The junction node model is the first-in-first-out model with demand
+proportional supply sharing (Jin and Zhang): incoming link i sends the
+turning demands β_ij D_i, each outgoing link j accepts the fraction
+α_j = min(1, S_j / Σ_i β_ij D_i) of the demand towards it, and the most
+restrictive α_j among the turns of link i scales its whole outflow. It
+reduces to min(D, S) for a link-to-link junction, to the FIFO diverge for
+one incoming link and to the demand proportional merge for one outgoing
+link. Multiclass states apply it to every class.
+
+The road quality of a link comes from its road type in ROAD_TYPES. Traffic
+signals (TrafficSignals located by incoming link) scale the demand of the
+approaches they control, on top of the green set with set_green().
+"""
+
+import numpy as np
+
+from config.simulation_config import ROAD_TYPES
+from .lwr_model import LWRModel
+from .ctm_model import node_flux
+from ..utils.time_stepping import TimeIntegrator, clocked_step
+from ..utils.results_store import allocate_results
+from ..utils.boundary_conditions import BoundaryFlows, ConstantFlow, as_profile
+
+
+class Link:
+    """
+    Road link of a network.
+    """
+
+    def __init__(self, name, length, road_type='bitumen_good', inflow=None, outflow=None):
+        """
+        Initialize a link.
+
+        Args:
+            name: Unique name of the link
+            length: Length of the link (km)
+            road_type: Road type, a key of ROAD_TYPES
+            inflow: Upstream demand (vehicles/h) entering the link when no
+                    junction feeds it, a constant or a time profile (see
+                    boundary_conditions.as_profile()); None for a
+                    zero-gradient boundary
+            outflow: Downstream supply (vehicles/h) accepted from the link
+                     when no junction drains it, like inflow; None for a
+                     zero-gradient boundary
+
+        Raises:
+            ValueError: If the length is not positive or the road type is unknown
+        """
+        if length <= 0:
+            raise ValueError(f"Link {name!r} must have a positive length, got {length}")
+        if road_type not in ROAD_TYPES:
+            raise ValueError(f"Unknown road type {road_type!r}, expected one of {sorted(ROAD_TYPES)}")
+        self.name = name
+        self.length = float(length)
+        self.road_type = road_type
+        self.inflow = as_profile(inflow)
+        self.outflow = as_profile(outflow)
+
+    @property
+    def base_quality(self):
+        """Road quality coefficient of the road type."""
+        return ROAD_TYPES[self.road_type]['base_quality']
+
+
+class Junction:
+    """
+    Junction joining the downstream ends of its incoming links to the
+    upstream ends of its outgoing links.
+    """
+
+    def __init__(self, name, incoming, outgoing, turning_ratios=None):
+        """
+        Initialize a junction.
+
+        Args:
+            name: Unique name of the junction
+            incoming: Names of the incoming links
+            outgoing: Names of the outgoing links
+            turning_ratios: Fractions of the demand of each incoming link
+                            turning into each outgoing link, an array of shape
+                            (n_incoming, n_outgoing) or a dictionary
+                            {incoming: {outgoing: ratio}}; None splits the
+                            demand evenly
+
+        Raises:
+            ValueError: If the junction has no links or the turning ratios are
+                        negative or do not sum to one per incoming link
+        """
+        self.name = name
+        self.incoming = list(incoming)
+        self.outgoing = list(outgoing)
+        if not self.incoming or not self.outgoing:
+            raise ValueError(f"Junction {name!r} needs incoming and outgoing links")
+
+        if turning_ratios is None:
+            ratios = np.full((len(self.incoming), len(self.outgoing)), 1.0 / len(self.outgoing))
+        elif isinstance(turning_ratios, dict):
+            ratios = np.array([[turning_ratios.get(i, {}).get(o, 0.0) for o in self.outgoing]
+                               for i in self.incoming], dtype=float)
+        else:
+            ratios = np.array(turning_ratios, dtype=float).reshape(len(self.incoming), len(self.outgoing))
+        if np.any(ratios < 0) or not np.allclose(ratios.sum(axis=1), 1.0):
+            raise ValueError(f"Turning ratios of junction {name!r} must be non-negative "
+                             f"and sum to one for every incoming link")
+        self.turning_ratios = ratios
+
+        # Green state of each incoming link (1 for an unsignalized approach)
+        self.green = np.ones(len(self.incoming))
+
+
+class JunctionTable:
+    """
+    All turning movements of a network, vectorized over the junctions.
+
+    The movements are sorted by incoming link, and a permutation sorts them
+    by outgoing link, so the sums and minima per link are segment reductions.
+    """
+
+    def __init__(self, movements, n_links):
+        """
+        Initialize the table.
+
+        Args:
+            movements: List of (incoming link, outgoing link, turning ratio)
+                       index triples
+            n_links: Number of links of the network
+        """
+        movements = sorted(movements)
+        self.n_links = n_links
+        self.incoming = np.array([m[0] for m in movements], dtype=np.intp)
+        self.outgoing = np.array([m[1] for m in movements], dtype=np.intp)
+        self.ratios = np.array([m[2] for m in movements], dtype=float)
+
+        # Segments of the movements of each incoming link
+        self.in_starts = np.flatnonzero(np.r_[True, np.diff(self.incoming) != 0])
+        self.in_links = self.incoming[self.in_starts]
+        self.in_group = np.cumsum(np.r_[False, np.diff(self.incoming) != 0])
+
+        # Segments of the movements into each outgoing link
+        self.out_order = np.argsort(self.outgoing, kind='stable')
+        sorted_out = self.outgoing[self.out_order]
+        self.out_starts = np.flatnonzero(np.r_[True, np.diff(sorted_out) != 0])
+        self.out_links = sorted_out[self.out_starts]
+
+    def flows(self, demand, supply, green=None):
+        """
+        Evaluate the node model of all junctions at once.
+
+        Args:
+            demand: Demand of the last cell of every link, shape (..., n_links)
+            supply: Supply of the first cell of every link, shape (..., n_links)
+            green: Green state (0 to 1) of every incoming link of shape
+                   (n_incoming,), ordered as in_links, or None
+
+        Returns:
+            tuple: (outflows of the incoming links, ordered as in_links,
+                    inflows of the outgoing links, ordered as out_links)
+        """
+        link_demand = demand[..., self.in_links]
+        if green is not None:
+            link_demand = link_demand * green.astype(demand.dtype, copy=False)
+        turning = link_demand[..., self.in_group] * self.ratios.astype(demand.dtype, copy=False)
+
+        # Fraction of the demand towards each outgoing link that it accepts
+        requested = np.add.reduceat(turning[..., self.out_order], self.out_starts, axis=-1)
+        available = supply[..., self.out_links]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            accepted = np.where(requested > available, available / requested, 1.0)
+
+        # FIFO: the most restrictive turn holds back the whole incoming link
+        fractions = np.ones(demand.shape[:-1] + (self.n_links,), dtype=accepted.dtype)
+        fractions[..., self.out_links] = accepted
+        fractions = np.minimum.reduceat(fractions[..., self.outgoing], self.in_starts, axis=-1)
+
+        moved = turning * fractions[..., self.in_group]
+        outflows = np.add.reduceat(moved, self.in_starts, axis=-1)
+        inflows = np.add.reduceat(moved[..., self.out_order], self.out_starts, axis=-1)
+        return outflows, inflows
+
+
+class RoadNetwork:
+    """
+    Network of LWR or multiclass LWR links advanced as one packed state.
+    """
+
+    def __init__(self, model=None, dx=0.05):
+        """
+        Initialize an empty network.
+
+        Args:
+            model: LWRModel or MulticlassLWRModel shared by all links (a
+                   default LWRModel if None)
+            dx: Cell size (km); every link has at least two cells
+        """
+        self.model = model if model is not None else LWRModel()
+        self.dx = dx
+        self.links = {}
+        self.junctions = {}
+        self._packed = None
+
+    def add_link(self, name, length, road_type='bitumen_good', inflow=None, outflow=None):
+        """
+        Add a link (see Link for the arguments).
+
+        Returns:
+            The new Link
+
+        Raises:
+            ValueError: If the name is already used
+        """
+        if name in self.links:
+            raise ValueError(f"Duplicate link name {name!r}")
+        link = Link(name, length, road_type, inflow, outflow)
+        self.links[name] = link
+        self._packed = None
+        return link
+
+    def add_junction(self, name, incoming, outgoing, turning_ratios=None):
+        """
+        Add a junction (see Junction for the arguments).
+
+        Returns:
+            The new Junction
+
+        Raises:
+            ValueError: If the name is already used, a link is unknown or a
+                        link end is already attached to another junction
+        """
+        if name in self.junctions:
+            raise ValueError(f"Duplicate junction name {name!r}")
+        junction = Junction(name, incoming, outgoing, turning_ratios)
+        for end, names in (('downstream', junction.incoming), ('upstream', junction.outgoing)):
+            for link in names:
+                if link not in self.links:
+                    raise ValueError(f"Junction {name!r} refers to unknown link {link!r}")
+                for other in self.junctions.values():
+                    if link in (other.incoming if end == 'downstream' else other.outgoing):
+                        raise ValueError(f"The {end} end of link {link!r} is already "
+                                         f"attached to junction {other.name!r}")
+        self.junctions[name] = junction
+        self._packed = None
+        return junction
+
+    def set_green(self, junction, green):
+        """
+        Set the signal state of the incoming links of a junction.
+
+        Args:
+            junction: Junction name
+            green: Dictionary {incoming link: state} or a sequence with one
+                   state per incoming link, 1 (or True) for green and 0 for red
+        """
+        junction = self.junctions[junction]
+        if isinstance(green, dict):
+            for link, state in green.items():
+                junction.green[junction.incoming.index(link)] = float(state)
+        else:
+            junction.green[:] = np.asarray(green, dtype=float)
+        if self._packed is not None:
+            self._packed['green'][...] = self._green()
+
+    def signal_approaches(self, signals):
+        """
+        Map the signals to the junction approaches they control.
+
+        Args:
+            signals: TrafficSignals located by incoming link name
+
+        Returns:
+            Indices of the approaches in the green array of the junction table
+
+        Raises:
+            ValueError: If a signal is not on a link entering a junction
+        """
+        packed = self.build()
+        approaches = {}
+        if packed['table'] is not None:
+            approaches = {packed['names'][k]: i for i, k in enumerate(packed['table'].in_links)}
+        missing = [location for location in signals.locations if location not in approaches]
+        if missing:
+            raise ValueError(f"Signals must control links entering a junction, got {missing}")
+        return np.array([approaches[location] for location in signals.locations], dtype=np.intp)
+
+    def _green(self):
+        """Green state of the incoming links of all junctions, in junction table order."""
+        states = {}
+        for junction in self.junctions.values():
+            states.update(zip(junction.incoming, junction.green))
+        names = list(self.links)
+        return np.array([states[names[k]] for k in self._packed['table'].in_links], dtype=float)
+
+    def build(self):
+        """
+        Pack the links and junctions into the arrays used by the solver.
+
+        Called automatically by the solver methods after the network changed.
+
+        Returns:
+            dict: Packed network description
+
+        Raises:
+            ValueError: If the network has no links
+        """
+        if self._packed is not None:
+            return self._packed
+        if not self.links:
+            raise ValueError("The network has no links")
+
+        names = list(self.links)
+        index = {name: k for k, name in enumerate(names)}
+        n_cells = np.array([max(2, int(round(link.length / self.dx))) for link in self.links.values()])
+        offsets = np.concatenate(([0], np.cumsum(n_cells)))
+
+        # Cell centres along each link and the road quality of its type
+        x = np.concatenate([(np.arange(n) + 0.5) * self.dx for n in n_cells])
+        base_quality = np.repeat([link.base_quality for link in self.links.values()], n_cells)
+
+        movements = []
+        for junction in self.junctions.values():
+            for i, incoming in enumerate(junction.incoming):
+                for j, outgoing in enumerate(junction.outgoing):
+                    if junction.turning_ratios[i, j] > 0:
+                        movements.append((index[incoming], index[outgoing], junction.turning_ratios[i, j]))
+
+        drained = {index[link] for junction in self.junctions.values() for link in junction.incoming}
+        fed = {index[link] for junction in self.junctions.values() for link in junction.outgoing}
+        origins = np.array([k for k in range(len(names)) if k not in fed], dtype=np.intp)
+        destinations = np.array([k for k in range(len(names)) if k not in drained], dtype=np.intp)
+        boundary_profiles = ([self.links[names[k]].inflow for k in origins]
+                             + [self.links[names[k]].outflow for k in destinations])
+
+        self._packed = {
+            'names': names,
+            'offsets': offsets,
+            'first': offsets[:-1],
+            'last': offsets[1:] - 1,
+            'x': x,
+            'base_quality': base_quality,
+            'table': JunctionTable(movements, len(names)) if movements else None,
+            'origins': origins,
+            'destinations': destinations,
+            'boundary_profiles': boundary_profiles,
+            'time_dependent': any(profile is not None and not isinstance(profile, ConstantFlow)
+                                  for profile in boundary_profiles)
+        }
+        # Boundary flows at t = 0, used by steps without a boundary table
+        self._packed['boundary_flows'] = self.boundary_flows(1.0, 0.0).sample([0.0])[0]
+        if movements:
+            self._packed['green'] = self._green()
+        return self._packed
+
+    def boundary_flows(self, spacing, horizon=None, dtype=float):
+        """
+        Sample the inflow and outflow profiles of the network boundaries.
+
+        Args:
+            spacing: Time between table rows (h), the fixed time step
+            horizon: Simulated time (h), or None for an unbounded run
+            dtype: Floating point type of the table
+
+        Returns:
+            BoundaryFlows whose columns are the inflows of the origin links
+            followed by the outflows of the destination links
+        """
+        packed = self.build()
+        return BoundaryFlows(packed['boundary_profiles'], spacing, horizon,
+                             getattr(self.model, 'n_classes', None), dtype)
+
+    @property
+    def n_cells(self):
+        """Total number of cells of the network."""
+        return int(self.build()['offsets'][-1])
+
+    def link_slice(self, name):
+        """
+        Get the cells of a link in the packed state.
+
+        Args:
+            name: Link name
+
+        Returns:
+            slice over the last axis of the packed state
+        """
+        packed = self.build()
+        k = packed['names'].index(name)
+        return slice(int(packed['offsets'][k]), int(packed['offsets'][k + 1]))
+
+    def link_state(self, state, name):
+        """
+        Extract the cells of one link from a packed state or results array.
+
+        Args:
+            state: Array with the packed cells along the last axis
+            name: Link name
+
+        Returns:
+            View of the link's cells
+        """
+        return state[..., self.link_slice(name)]
+
+    def initial_state(self, initial_density):
+        """
+        Build the packed initial state.
+
+        Args:
+            initial_density: Dictionary {link: density} or one density for
+                             every link. A density is a function of the
+                             position along the link (km from its start), an
+                             array over the link's cells or a constant (one
+                             value per class for a multiclass model); missing
+                             links start empty
+
+        Returns:
+            Packed state of shape (..., n_cells)
+        """
+        packed = self.build()
+        parts = []
+        for k, name in enumerate(packed['names']):
+            x = packed['x'][packed['offsets'][k]:packed['offsets'][k + 1]]
+            density = initial_density.get(name, 0.0) if isinstance(initial_density, dict) else initial_density
+            if not callable(density):
+                density = np.asarray(density, dtype=float)
+                if hasattr(self.model, 'n_classes'):
+                    # One value per class is constant along the link
+                    if density.ndim == 1 and density.size == self.model.n_classes:
+                        density = density[:, None]
+                    density = np.broadcast_to(density, (self.model.n_classes, len(x)))
+                else:
+                    density = np.broadcast_to(density, x.shape)
+            parts.append(self.model.initial_state(density, x))
+        return np.concatenate(parts, axis=-1)
+
+    def road_quality(self):
+        """
+        Road quality coefficients of the packed cells.
+
+        Returns:
+            Array of shape (n_cells,), or (n_classes, n_cells) for a
+            multiclass model, whose classes scale the base quality
+        """
+        packed = self.build()
+        return self.model.road_quality_profile(packed['base_quality'], packed['x'])
+
+    def advance(self, rho, dt, out=None, quality=None, model=None, green=None, boundary=None):
+        """
+        Advance the whole network by one time step.
+
+        Args:
+            rho: Packed state of shape (..., n_cells)
+            dt: Time step (h)
+            out: Optional output array (may be rho itself for an in-place update)
+            quality: Road quality of the cells (computed if None)
+            model: Link model (the network's model if None)
+            green: Green state of the junction approaches, of shape
+                   (n_approaches,) or (n_classes, n_approaches), overriding
+                   the one set with set_green()
+            boundary: Row of boundary_flows() for this step (the flows at
+                      t = 0 if None)
+
+        Returns:
+            Updated packed state
+        """
+        packed = self.build()
+        model = self.model if model is None else model
+        if quality is None:
+            quality = self.road_quality()
+        first, last = packed['first'], packed['last']
+
+        demand = model.demand(rho, quality=quality)
+        supply = model.supply(rho, quality=quality)
+
+        # Ordinary nodes between consecutive cells; the values across link
+        # ends are replaced by the junction and boundary flows below
+        inflow = np.empty_like(rho)
+        outflow = np.empty_like(rho)
+        node_flux(demand[..., :-1], supply[..., 1:], out=outflow[..., :-1])
+        inflow[..., 1:] = outflow[..., :-1]
+
+        table = packed['table']
+        if table is not None:
+            green = packed['green'] if green is None else green
+            sent, received = table.flows(demand[..., last], supply[..., first], green)
+            outflow[..., last[table.in_links]] = sent
+            inflow[..., first[table.out_links]] = received
+
+        # Network boundaries: a given demand or supply, else zero gradient
+        origins, destinations = first[packed['origins']], last[packed['destinations']]
+        flows = packed['boundary_flows'] if boundary is None else boundary
+        demands, supplies = flows[..., :len(origins)], flows[..., len(origins):]
+        inflow[..., origins] = np.where(np.isnan(demands), outflow[..., origins],
+                                        np.minimum(demands, supply[..., origins]))
+        outflow[..., destinations] = np.where(np.isnan(supplies), inflow[..., destinations],
+                                              np.minimum(demand[..., destinations], supplies))
+
+        # Conservative update of all cells, keeping densities non-negative
+        change = np.subtract(outflow, inflow, out=outflow)
+        change *= dt / self.dx
+        out = np.subtract(rho, change, out=out)
+        return np.maximum(out, 0, out=out)
+
+    def calculate_dt(self, rho, cfl_factor=0.9, quality=None, model=None):
+        """
+        Calculate the CFL time step of a packed state.
+
+        Args:
+            rho: Packed state of shape (..., n_cells)
+            cfl_factor: Safety factor for CFL condition (0-1)
+            quality: Road quality of the cells (computed if None)
+            model: Link model (the network's model if None)
+
+        Returns:
+            Time step (h)
+        """
+        model = self.model if model is None else model
+        if quality is None:
+            quality = self.road_quality()
+        return model.calculate_dt(rho, self.dx, cfl_factor, quality=quality)
+
+    def _fastest_wave_dt(self, cfl_factor, quality, model):
+        """CFL time step of the fastest wave of the link model on the network."""
+        if hasattr(model, 'fundamental_diagram'):
+            max_speed = float(np.max(quality)) * model.fundamental_diagram.max_wave_speed()
+            return cfl_factor * self.dx / max_speed
+        # The multiclass characteristic speeds are largest on an empty road
+        return self.calculate_dt(np.zeros_like(quality), cfl_factor, quality, model)
+
+    def simulate(self, initial_density, simulation_time, dt=None, cfl_factor=0.9, adaptive=False,
+                 cfl_every=1, output_times=None, save_interval=None, output_dir=None, dtype=None,
+                 signals=None):
+        """
+        Simulate the network.
+
+        Args:
+            initial_density: Initial densities (see initial_state())
+            simulation_time: Total simulation time (h)
+            dt: Time step size (h), if None calculated from CFL
+            cfl_factor: Safety factor for CFL condition (0-1)
+            adaptive: Recompute the CFL time step from the current state during the run
+            cfl_every: In adaptive mode, recompute the time step every cfl_every steps
+            output_times: Times (h) at which results are stored; if None, every step
+                          is stored (fixed mode) or 101 evenly spaced frames (adaptive)
+            save_interval: Time (h) between stored frames, an alternative to output_times
+            output_dir: If given, frames are written to memory-mapped .npy files
+                        in this directory (with a JSON sidecar) instead of RAM
+            dtype: Floating point precision of the state and results, e.g. np.float32
+                   (None keeps the model's precision)
+            signals: TrafficSignals located by the incoming links they control,
+                     or None
+
+        Returns:
+            SimulationResults of the link model over the packed cells, with a
+            'links' entry giving the names, offsets, lengths and road types
+        """
+        packed = self.build()
+        model = self.model.with_dtype(dtype)
+        rho = self.initial_state(initial_density).astype(model.dtype)
+        quality = self.road_quality().astype(model.dtype)
+        if dt is None:
+            dt = self.calculate_dt(rho, cfl_factor, quality, model)
+            if not adaptive:
+                # Queues at junctions and quality changes break the maximum
+                # principle, so bound a fixed step by the fastest wave
+                dt = min(dt, self._fastest_wave_dt(cfl_factor, quality, model))
+
+        if signals is not None and len(signals) > 0:
+            approaches = self.signal_approaches(signals)
+        else:
+            signals = None
+
+        # Time-dependent boundary flows are sampled once, one row per fixed step
+        boundary = None
+        if packed['time_dependent']:
+            boundary = self.boundary_flows(dt, simulation_time, model.dtype)
+
+        advance = lambda r, h: self.advance(r, h, out=r, quality=quality, model=model)
+        if signals is not None or boundary is not None:
+            n_classes = getattr(model, 'n_classes', None)
+
+            def timed_step(r, h, t):
+                green = None
+                if signals is not None:
+                    # All signals are evaluated at once and held over the step
+                    states = signals.green(t, n_classes, model.dtype)
+                    green = np.array(np.broadcast_to(packed['green'], states.shape[:-1] + packed['green'].shape))
+                    green[..., approaches] *= states
+                flows = None if boundary is None else boundary.at(t)
+                return self.advance(r, h, out=r, quality=quality, model=model, green=green, boundary=flows)
+
+            advance = clocked_step(timed_step)
+
+        integrator = TimeIntegrator(
+            advance=advance,
+            simulation_time=simulation_time,
+            dt=dt,
+            stable_dt=lambda r: self.calculate_dt(r, cfl_factor, quality, model),
+            adaptive=adaptive,
+            cfl_every=cfl_every,
+            output_times=output_times,
+            save_interval=save_interval
+        )
+        t = integrator.output_times
+
+        # Packed densities over time, in the layout of the link model's results
+        multiclass = hasattr(model, 'n_classes')
+        name = 'class_densities' if multiclass else 'density'
+        shape = (model.n_classes, len(t), self.n_cells) if multiclass else (len(t), self.n_cells)
+        writer, arrays = allocate_results({name: shape, 'road_quality': quality.shape},
+                                          output_dir, packed['x'], t, model.dtype)
+        density = arrays[name]
+        arrays['road_quality'][...] = quality
+
+        for n, _, rho in integrator.run(rho):
+            density[..., n, :] = rho
+
+        links = {
+            'names': packed['names'],
+            'offsets': packed['offsets'],
+            'length': [link.length for link in self.links.values()],
+            'road_type': [link.road_type for link in self.links.values()]
+        }
+        results = {
+            name: density,
+            'road_quality': arrays['road_quality'],
+            'grid_x': packed['x'],
+            'grid_t': t,
+            'links': links,
+            'parameters': {
+                **model.numerical_methods(),
+                'dx': self.dx,
+                'dt': dt,
+                'adaptive': adaptive,
+                'n_links': len(self.links),
+                'n_junctions': len(self.junctions),
+                'simulation_time': simulation_time,
+                'dtype': model.dtype.name,
+                **integrator.statistics()
+            }
+        }
+        if signals is not None:
+            results['parameters']['signals'] = signals.summary()
+        if boundary is not None:
+            flows = boundary.sample(t)
+            n_origins = len(packed['origins'])
+            results['boundary_flows'] = {
+                'origins': [packed['names'][k] for k in packed['origins']],
+                'inflow': flows[..., :n_origins],
+                'destinations': [packed['names'][k] for k in packed['destinations']],
+                'outflow': flows[..., n_origins:]
+            }
+        if multiclass:
+            results['n_classes'] = model.n_classes
+
+        if writer is not None:
+            writer.finalize(results['parameters'])
+            results['results_dir'] = output_dir
+
+        return model.lazy_results(results)
@@ -0,0 +1,194 @@
+"""
+Traffic Signals
+
+This module implements fixed-time traffic signals as time-dependent caps on
+the flux through signalized interfaces (corridors) or junction approaches
+(road networks). Signal plans come from TRAFFIC_SIGNALS (cycle, green and
+yellow times, motorcycle anticipation and clearance time, in seconds).
+
+A signal lets traffic through during its green and yellow times and stops
+it during the rest of the cycle. The phases of all signals are evaluated
+together on arrays, so a step costs the same few array operations however
+many signals there are. Motorcycles (class 0 of multiclass models) start
+moto_anticipation seconds before the green, as they do at the stop lines of
+Cotonou.
+
+A cross approach of a crossing gets the complementary green: it starts
+clearing_time seconds after the yellow of the main approach ends and ends
+clearing_time seconds before the next main green, yellow included.
+"""
+
+import numpy as np
+
+from config.simulation_config import TRAFFIC_SIGNALS
+
+
+def signal_plan(plan):
+    """
+    Get the timing of a signal plan.
+
+    Args:
+        plan: Name of a plan in TRAFFIC_SIGNALS, or a dictionary with the same
+              keys (moto_anticipation and clearing_time default to 0)
+
+    Returns:
+        dict: cycle_time, green_time, yellow_time, moto_anticipation and
+              clearing_time (s)
+
+    Raises:
+        ValueError: If the plan is unknown or inconsistent
+    """
+    if isinstance(plan, str):
+        if plan not in TRAFFIC_SIGNALS:
+            raise ValueError(f"Unknown signal plan {plan!r}, expected one of {sorted(TRAFFIC_SIGNALS)}")
+        plan = TRAFFIC_SIGNALS[plan]
+    timing = {
+        'cycle_time': float(plan['cycle_time']),
+        'green_time': float(plan['green_time']),
+        'yellow_time': float(plan.get('yellow_time', 0.0)),
+        'moto_anticipation': float(plan.get('moto_anticipation', 0.0)),
+        'clearing_time': float(plan.get('clearing_time', 0.0))
+    }
+    if min(timing.values()) < 0 or timing['cycle_time'] <= 0:
+        raise ValueError(f"Signal times must be non-negative with a positive cycle, got {timing}")
+    red_time = timing['cycle_time'] - timing['green_time'] - timing['yellow_time']
+    if red_time < timing['moto_anticipation']:
+        raise ValueError(f"The red time ({red_time} s) is shorter than the motorcycle "
+                         f"anticipation ({timing['moto_anticipation']} s)")
+    return timing
+
+
+class TrafficSignals:
+    """
+    Set of fixed-time signals evaluated together.
+
+    Each signal is stored as the start of its first green (s), the length of
+    its green and yellow time, its cycle and its motorcycle anticipation, in
+    arrays with one entry per signal.
+    """
+
+    def __init__(self):
+        """Initialize an empty set of signals."""
+        self.locations = []
+        self.start = np.empty(0)
+        self.passing = np.empty(0)
+        self.cycle = np.empty(0)
+        self.anticipation = np.empty(0)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def _append(self, location, start, passing, cycle, anticipation):
+        """Store one signal."""
+        self.locations.append(location)
+        self.start = np.append(self.start, start)
+        self.passing = np.append(self.passing, passing)
+        self.cycle = np.append(self.cycle, cycle)
+        self.anticipation = np.append(self.anticipation, anticipation)
+
+    def add(self, location, plan='standard', offset=0.0, cross=False):
+        """
+        Add a signal with a periodic plan.
+
+        Args:
+            location: Position of the signal (km) on a corridor, or the name of
+                      the incoming link it controls in a road network
+            plan: Signal plan (see signal_plan())
+            offset: Start of the first green of the main approach (s)
+            cross: Whether the signal controls the cross approach, whose green
+                   is complementary to the main one
+
+        Raises:
+            ValueError: If the plan leaves no green time to the cross approach
+        """
+        timing = signal_plan(plan)
+        cycle = timing['cycle_time']
+        passing = timing['green_time'] + timing['yellow_time']
+        start = offset
+        if cross:
+            start = offset + passing + timing['clearing_time']
+            passing = cycle - passing - 2 * timing['clearing_time']
+            if passing <= 0:
+                raise ValueError(f"Signal plan {plan!r} leaves no green time to the cross approach")
+        self._append(location, start, passing, cycle, timing['moto_anticipation'])
+
+    def add_switch(self, location, green_time, plan='standard'):
+        """
+        Add a signal that is red until green_time and green afterwards.
+
+        Args:
+            location: Position of the signal (km), or an incoming link name
+            green_time: Time at which the light turns green (h)
+            plan: Signal plan giving the motorcycle anticipation
+        """
+        timing = signal_plan(plan)
+        self._append(location, 3600.0 * green_time, np.inf, np.inf, timing['moto_anticipation'])
+
+    def green(self, t, n_classes=None, dtype=float):
+        """
+        Evaluate the state of all signals.
+
+        Args:
+            t: Time (h)
+            n_classes: Number of classes of a multiclass model (class 0 being
+                       the motorcycles), or None for a single class
+            dtype: Floating point type of the result
+
+        Returns:
+            Array of shape (n_signals,), or (n_classes, n_signals), with 1
+            where traffic may pass and 0 where it is stopped
+        """
+        elapsed = 3600.0 * t - self.start
+        periodic = np.isfinite(self.cycle)
+        # A switch has no cycle: its phase is the time since the green
+        with np.errstate(invalid='ignore'):
+            phase = np.where(periodic, np.mod(elapsed, self.cycle), elapsed)
+            to_green = np.where(periodic, self.cycle - phase, -phase)
+        passing = (phase >= 0) & (phase < self.passing)
+        if n_classes is None:
+            return passing.astype(dtype)
+
+        states = np.broadcast_to(passing, (n_classes, len(self))).astype(dtype)
+        states[0] = passing | (to_green <= self.anticipation)
+        return states
+
+    def corridor_interfaces(self, x):
+        """
+        Map the signal positions to the interfaces of a corridor grid.
+
+        A signal at position p controls the interface just downstream of the
+        cells at or before p.
+
+        Args:
+            x: Cell positions of the grid (km)
+
+        Returns:
+            Indices of the controlled interfaces in a flux array of shape
+            (..., nx+1)
+
+        Raises:
+            ValueError: If a location is not a position inside the corridor
+        """
+        try:
+            positions = np.array(self.locations, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError("Corridor signals must be located by position (km)") from None
+        if np.any(positions < x[0]) or np.any(positions >= x[-1]):
+            raise ValueError(f"Signal positions must lie in [{x[0]}, {x[-1]}), got {positions}")
+        return np.searchsorted(x, positions, side='right')
+
+    def summary(self):
+        """
+        Describe the signals for the results.
+
+        Returns:
+            dict: Locations, first green (h), green and yellow time (s),
+                  cycle (s) and motorcycle anticipation (s) of each signal
+        """
+        return {
+            'locations': list(self.locations),
+            'start': (self.start / 3600.0).tolist(),
+            'green': self.passing.tolist(),
+            'cycle': self.cycle.tolist(),
+            'moto_anticipation': self.anticipation.tolist()
+        }
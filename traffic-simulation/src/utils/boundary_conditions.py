@@ -0,0 +1,342 @@
+"""
+Boundary Conditions
+
+This module provides time-dependent boundary conditions for the traffic
+solvers. The upstream boundary takes an inflow profile, the demand of the
+vehicles waiting to enter the road, and the downstream boundary an outflow
+profile, the supply of the road beyond it. With the demand/supply form of
+the Godunov scheme the boundary fluxes are
+
+    F_in = min(inflow(t), S(ρ_first)),    F_out = min(D(ρ_last), outflow(t)),
+
+so a queue builds up at the entrance when the inflow exceeds what the road
+accepts, and behind the exit when the outflow is restricted. A missing
+profile gives the zero-gradient boundary.
+
+Profiles (constant, piecewise, detector counts or any function of time) are
+sampled once per run on a uniform table of step times (BoundaryFlows), and
+the solvers read one row per step, without calling back into the profiles.
+Flows are in vehicles/h; for multiclass models a profile gives one flow per
+class, or a single flow applied to every class.
+"""
+
+import numpy as np
+
+# Number of samples added at a time to the tables of unbounded runs
+TABLE_CHUNK = 4096
+
+
+class FlowProfile:
+    """
+    Flow through a boundary as a function of time.
+    """
+
+    def sample(self, times):
+        """
+        Evaluate the profile at many times at once.
+
+        Args:
+            times: Array of times (h)
+
+        Returns:
+            Flows (vehicles/h) of shape (len(times),), or (len(times), n_classes)
+            with one value per class
+        """
+        raise NotImplementedError("Subclasses must implement sample")
+
+
+class ConstantFlow(FlowProfile):
+    """
+    Constant flow.
+    """
+
+    def __init__(self, flow):
+        """
+        Initialize the profile.
+
+        Args:
+            flow: Flow (vehicles/h), or one flow per class
+
+        Raises:
+            ValueError: If a flow is negative
+        """
+        self.flow = np.asarray(flow, dtype=float)
+        if np.any(self.flow < 0):
+            raise ValueError(f"Boundary flows must be non-negative, got {flow}")
+
+    def sample(self, times):
+        times = np.asarray(times, dtype=float)
+        return np.broadcast_to(self.flow, times.shape + self.flow.shape).copy()
+
+
+class PiecewiseFlow(FlowProfile):
+    """
+    Flow given at breakpoints, interpolated linearly or held constant.
+
+    Before the first breakpoint and after the last one the flow keeps its
+    end values.
+    """
+
+    def __init__(self, times, flows, interpolation='linear'):
+        """
+        Initialize the profile.
+
+        Args:
+            times: Increasing breakpoint times (h)
+            flows: Flows (vehicles/h) at the breakpoints, of shape (n,) or
+                   (n, n_classes)
+            interpolation: 'linear', or 'previous' to hold each value until
+                           the next breakpoint
+
+        Raises:
+            ValueError: If the breakpoints or flows are invalid
+        """
+        self.times = np.asarray(times, dtype=float)
+        self.flows = np.asarray(flows, dtype=float)
+        if self.times.ndim != 1 or self.times.size == 0 or np.any(np.diff(self.times) <= 0):
+            raise ValueError("Breakpoint times must be a non-empty increasing 1D sequence")
+        if self.flows.shape[:1] != self.times.shape:
+            raise ValueError(f"Expected one flow per breakpoint, got {self.flows.shape[0]} "
+                             f"flows for {self.times.size} breakpoints")
+        if np.any(self.flows < 0):
+            raise ValueError("Boundary flows must be non-negative")
+        if interpolation not in ('linear', 'previous'):
+            raise ValueError(f"Unknown interpolation {interpolation!r}, expected 'linear' or 'previous'")
+        self.interpolation = interpolation
+
+    def sample(self, times):
+        times = np.asarray(times, dtype=float)
+        if self.interpolation == 'previous':
+            index = np.clip(np.searchsorted(self.times, times, side='right') - 1, 0, None)
+            return self.flows[index]
+
+        # Linear interpolation of every class column at once
+        index = np.clip(np.searchsorted(self.times, times) - 1, 0, max(self.times.size - 2, 0))
+        upper = np.minimum(index + 1, self.times.size - 1)
+        span = self.times[upper] - self.times[index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.clip(np.where(span > 0, (times - self.times[index]) / span, 0.0), 0.0, 1.0)
+        weight = weight.reshape(weight.shape + (1,) * (self.flows.ndim - 1))
+        return (1 - weight) * self.flows[index] + weight * self.flows[upper]
+
+
+class DetectorCounts(PiecewiseFlow):
+    """
+    Flow from vehicle counts aggregated over consecutive intervals, held
+    constant over each interval.
+    """
+
+    def __init__(self, counts, interval, start=0.0):
+        """
+        Initialize the profile.
+
+        Args:
+            counts: Vehicles counted in each interval, of shape (n,) or
+                    (n, n_classes)
+            interval: Length of the counting intervals (h)
+            start: Start of the first interval (h)
+
+        Raises:
+            ValueError: If the interval is not positive
+        """
+        if interval <= 0:
+            raise ValueError(f"Counting interval must be positive, got {interval}")
+        counts = np.asarray(counts, dtype=float)
+        self.interval = float(interval)
+        times = start + self.interval * np.arange(len(counts))
+        super().__init__(times, counts / self.interval, interpolation='previous')
+
+    @classmethod
+    def from_csv(cls, path, interval, columns='count', start=0.0, delimiter=','):
+        """
+        Load counts from a CSV file with a header row.
+
+        Args:
+            path: Path of the CSV file, one row per counting interval
+            interval: Length of the counting intervals (h)
+            columns: Name of the count column, or a list of names with one
+                     column per class
+            start: Start of the first interval (h)
+            delimiter: Column delimiter
+
+        Returns:
+            DetectorCounts
+
+        Raises:
+            ValueError: If a column is missing
+        """
+        table = np.genfromtxt(path, delimiter=delimiter, names=True, dtype=float, ndmin=1)
+        names = [columns] if isinstance(columns, str) else list(columns)
+        missing = [name for name in names if name not in table.dtype.names]
+        if missing:
+            raise ValueError(f"Columns {missing} not found in {path}, available: {table.dtype.names}")
+        counts = np.column_stack([table[name] for name in names])
+        return cls(counts[:, 0] if isinstance(columns, str) else counts, interval, start)
+
+
+class FunctionFlow(FlowProfile):
+    """
+    Flow given by a function of time.
+    """
+
+    def __init__(self, func):
+        """
+        Initialize the profile.
+
+        Args:
+            func: Function of time t (h) returning the flow (vehicles/h), or
+                  one flow per class
+        """
+        self.func = func
+
+    def sample(self, times):
+        times = np.asarray(times, dtype=float)
+        # Try the vectorized call first; scalar functions are called per time
+        try:
+            flows = np.asarray(self.func(times), dtype=float)
+        except (TypeError, ValueError):
+            flows = None
+        if flows is None or flows.shape[:1] != times.shape:
+            flows = np.array([self.func(t) for t in times], dtype=float)
+        return flows
+
+
+def as_profile(value):
+    """
+    Convert a boundary condition to a flow profile.
+
+    Args:
+        value: None (zero gradient), a FlowProfile, a function of time or a
+               constant flow
+
+    Returns:
+        FlowProfile, or None for a zero-gradient boundary
+    """
+    if value is None or isinstance(value, FlowProfile):
+        return value
+    if callable(value):
+        return FunctionFlow(value)
+    return ConstantFlow(value)
+
+
+class BoundaryFlows:
+    """
+    Boundary flows of a run, sampled on a uniform table of step times.
+
+    Row n holds the flows at the middle of [n h, (n+1) h], h being the
+    spacing, and serves the steps starting in that interval. With the fixed
+    CFL step as spacing every step gets its own row. Zero-gradient
+    boundaries are NaN columns.
+    """
+
+    def __init__(self, profiles, spacing, horizon=None, n_classes=None, dtype=float):
+        """
+        Sample the profiles.
+
+        Args:
+            profiles: Sequence of boundary conditions (see as_profile())
+            spacing: Time between table rows (h)
+            horizon: Simulated time (h), or None to extend the table as the
+                     run goes on
+            n_classes: Number of classes of a multiclass model, or None
+            dtype: Floating point type of the table
+
+        Raises:
+            ValueError: If the spacing is not positive
+        """
+        if spacing <= 0:
+            raise ValueError(f"Table spacing must be positive, got {spacing}")
+        self.profiles = [as_profile(profile) for profile in profiles]
+        self.spacing = float(spacing)
+        self.n_classes = n_classes
+        self.dtype = np.dtype(dtype)
+        n_rows = TABLE_CHUNK if horizon is None else int(np.ceil(horizon / self.spacing)) + 1
+        self.table = self.sample(self.spacing * (np.arange(n_rows) + 0.5))
+
+    def sample(self, times):
+        """
+        Evaluate all profiles at many times.
+
+        Args:
+            times: Array of times (h)
+
+        Returns:
+            Array of shape (len(times), n_profiles), or (len(times),
+            n_classes, n_profiles) for multiclass models, NaN for
+            zero-gradient boundaries
+        """
+        times = np.asarray(times, dtype=float)
+        shape = times.shape + (() if self.n_classes is None else (self.n_classes,))
+        columns = []
+        for profile in self.profiles:
+            if profile is None:
+                columns.append(np.full(shape, np.nan))
+            else:
+                flows = profile.sample(times)
+                if self.n_classes is not None and flows.ndim == times.ndim:
+                    # A single flow applies to every class
+                    flows = flows[..., None]
+                try:
+                    columns.append(np.broadcast_to(flows, shape))
+                except ValueError:
+                    raise ValueError(f"Boundary flows of shape {flows.shape[1:]} do not match "
+                                     f"{self.n_classes or 1} class(es)") from None
+        return np.stack(columns, axis=-1).astype(self.dtype)
+
+    def at(self, t):
+        """
+        Get the flows of the step starting at time t.
+
+        Args:
+            t: Time (h)
+
+        Returns:
+            Row of the table, of shape (n_profiles,) or (n_classes, n_profiles)
+        """
+        row = int(t / self.spacing + 1e-9)
+        if row >= len(self.table):
+            extra = max(TABLE_CHUNK, row + 1 - len(self.table))
+            times = self.spacing * (np.arange(len(self.table), len(self.table) + extra) + 0.5)
+            self.table = np.concatenate((self.table, self.sample(times)))
+        return self.table[row]
+
+
+def corridor_flow_frames(boundary, times):
+    """
+    Sample the inflow and outflow of a corridor on an output time grid.
+
+    Args:
+        boundary: BoundaryFlows of the (inflow, outflow) profiles
+        times: Output times (h)
+
+    Returns:
+        dict: 'inflow' and 'outflow' flows of shape (nt,) or (nt, n_classes),
+              None for a zero-gradient side
+    """
+    flows = boundary.sample(times)
+    return {
+        side: None if profile is None else flows[..., k]
+        for k, (side, profile) in enumerate(zip(('inflow', 'outflow'), boundary.profiles))
+    }
+
+
+def apply_boundary_flows(model, state, flux, flows, quality=None):
+    """
+    Replace the zero-gradient boundary fluxes of a corridor by the boundary flows.
+
+    Args:
+        model: Model providing demand() and supply()
+        state: Density array of shape (..., nx) (class densities of shape
+               (..., n_classes, nx) for multiclass models)
+        flux: Flux array of shape (..., nx+1) with zero-gradient boundaries
+        flows: Row of BoundaryFlows for the (inflow, outflow) profiles, NaN
+               for zero gradient
+        quality: Road quality coefficients of the cells, or None
+    """
+    first = None if quality is None else quality[..., :1]
+    last = None if quality is None else quality[..., -1:]
+    inflow, outflow = flows[..., 0], flows[..., 1]
+    supply = model.supply(state[..., :1], quality=first)[..., 0]
+    demand = model.demand(state[..., -1:], quality=last)[..., 0]
+    flux[..., 0] = np.where(np.isnan(inflow), flux[..., 0], np.minimum(inflow, supply))
+    flux[..., -1] = np.where(np.isnan(outflow), flux[..., -1], np.minimum(demand, outflow))
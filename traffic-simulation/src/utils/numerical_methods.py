@@ -1,35 +1,241 @@
+"""
+Numerical Fluxes
+
+This module provides the numerical fluxes of the finite volume solvers. Every
+scheme evaluates all interior interfaces of a state at once: given cell
+densities of shape (..., nx) it returns the fluxes through the nx-1 interior
+interfaces, shape (..., nx-1). Leading axes (vehicle classes, ensemble
+members) are carried through.
+
+The schemes only rely on a small model protocol, implemented by LWRModel and
+MulticlassLWRModel:
+
+    cell_flux(rho, quality=None)          physical flux F(ρ) of each cell
+    demand(rho, quality=None)             sending function of each cell
+    supply(rho, quality=None)             receiving function of each cell
+    wave_speed_bounds(rho, quality=None)  (slowest, fastest) characteristic
+                                          speed of each cell
+
+where quality holds the road quality coefficients of the cells (or None).
+Higher-order solvers pass reconstructed interface states (see
+reconstruction.py); first-order ones use the cell densities directly.
+Only the Godunov (CTM) flux is exact at road quality changes; the other
+schemes are consistent but smear or misplace the queues forming there.
+"""
+
 import numpy as np
 
-def godunov_flux(rho_left, rho_right, model):
+
+def _interface_quality(quality):
+    """Split cell road qualities into their left and right interface values."""
+    if quality is None:
+        return None, None
+    return quality[..., :-1], quality[..., 1:]
+
+
+def _interface_values(func, rho, quality, states):
+    """
+    Evaluate a cell function on both sides of every interface.
+
+    Without reconstructed states the function is evaluated once on the cells
+    and sliced; otherwise it is evaluated on the left and right states, with
+    the road quality of the cell each state belongs to.
+
+    Returns:
+        tuple: (left values, right values)
+    """
+    if states is None:
+        values = func(rho, quality=quality)
+        if isinstance(values, tuple):
+            return tuple(value[..., :-1] for value in values), tuple(value[..., 1:] for value in values)
+        return values[..., :-1], values[..., 1:]
+    left_quality, right_quality = _interface_quality(quality)
+    return func(states[0], quality=left_quality), func(states[1], quality=right_quality)
+
+
+def _interface_states(rho, states):
+    """Get the left and right states of every interface."""
+    if states is None:
+        return rho[..., :-1], rho[..., 1:]
+    return states
+
+
+def godunov_flux(model, rho, quality=None, dt_dx=None, states=None):
+    """
+    Godunov flux in demand/supply form, F = min(D(ρ_L), S(ρ_R)).
+
+    This is also the flux of the Cell Transmission Model. It is the exact
+    Riemann solution for a unimodal flux, including at road quality changes.
+
+    Args:
+        model: Model implementing the flux protocol
+        rho: Cell densities of shape (..., nx)
+        quality: Road quality coefficients of the cells, or None
+        dt_dx: Ratio of the time and space steps (h/km), unused
+        states: Reconstructed (left, right) interface states of shape
+                (..., nx-1), or None to use the cell densities
+
+    Returns:
+        Interface fluxes of shape (..., nx-1)
+    """
+    left, right = _interface_states(rho, states)
+    left_quality, right_quality = _interface_quality(quality)
+    return np.minimum(
+        model.demand(left, quality=left_quality),
+        model.supply(right, quality=right_quality)
+    )
+
+
+# The Cell Transmission Model sends min(demand, supply) across each boundary
+ctm_flux = godunov_flux
+
+
+def lax_friedrichs_flux(model, rho, quality=None, dt_dx=None, states=None):
+    """
+    Lax-Friedrichs flux, F = (F_L + F_R)/2 - (Δx/Δt)(ρ_R - ρ_L)/2.
+
+    The numerical diffusion scales with the grid ratio, so the scheme is the
+    most diffusive of the library, especially for small time steps.
+
+    Args:
+        model: Model implementing the flux protocol
+        rho: Cell densities of shape (..., nx)
+        quality: Road quality coefficients of the cells, or None
+        dt_dx: Ratio of the time and space steps (h/km)
+        states: Reconstructed interface states (see godunov_flux()), or None
+
+    Returns:
+        Interface fluxes of shape (..., nx-1)
+
+    Raises:
+        ValueError: If dt_dx is not given
     """
-    Calculate the numerical flux at the interface between two cells using Godunov's scheme.
-    
+    if dt_dx is None:
+        raise ValueError("The Lax-Friedrichs flux requires the ratio dt_dx")
+    left, right = _interface_states(rho, states)
+    flux_left, flux_right = _interface_values(model.cell_flux, rho, quality, states)
+    return 0.5 * (flux_left + flux_right) - (0.5 / dt_dx) * (right - left)
+
+
+def rusanov_flux(model, rho, quality=None, dt_dx=None, states=None):
+    """
+    Rusanov (local Lax-Friedrichs) flux,
+    F = (F_L + F_R)/2 - a (ρ_R - ρ_L)/2 with a the largest local wave speed.
+
     Args:
-        rho_left: Density in the left cell (vehicles/km)
-        rho_right: Density in the right cell (vehicles/km)
-        model: An instance of the traffic model containing necessary methods.
-        
+        model: Model implementing the flux protocol
+        rho: Cell densities of shape (..., nx)
+        quality: Road quality coefficients of the cells, or None
+        dt_dx: Ratio of the time and space steps (h/km), unused
+        states: Reconstructed interface states (see godunov_flux()), or None
+
     Returns:
-        Numerical flux at the interface (vehicles/h)
+        Interface fluxes of shape (..., nx-1)
     """
-    if rho_left <= rho_right:
-        if rho_left <= model.densite_critique() and rho_right >= model.densite_critique():
-            return model.capacite()
-        else:
-            return min(model.flux(rho_left), model.flux(rho_right))
-    else:
-        return min(model.flux(rho_left), model.flux(rho_right))
+    left, right = _interface_states(rho, states)
+    flux_left, flux_right = _interface_values(model.cell_flux, rho, quality, states)
+    bounds_left, bounds_right = _interface_values(model.wave_speed_bounds, rho, quality, states)
+    speed = np.maximum(
+        np.maximum(np.abs(bounds_left[0]), np.abs(bounds_left[1])),
+        np.maximum(np.abs(bounds_right[0]), np.abs(bounds_right[1]))
+    )
+    return 0.5 * (flux_left + flux_right) - 0.5 * speed * (right - left)
+
+
+def hll_flux(model, rho, quality=None, dt_dx=None, states=None):
+    """
+    HLL (Harten-Lax-van Leer) flux with Davis wave speed estimates.
+
+    The signal speeds are s_L = min(λ_min(ρ_L), λ_min(ρ_R)) and
+    s_R = max(λ_max(ρ_L), λ_max(ρ_R)); the flux is upwinded when both have
+    the same sign and averaged over the Riemann fan otherwise.
+
+    Args:
+        model: Model implementing the flux protocol
+        rho: Cell densities of shape (..., nx)
+        quality: Road quality coefficients of the cells, or None
+        dt_dx: Ratio of the time and space steps (h/km), unused
+        states: Reconstructed interface states (see godunov_flux()), or None
+
+    Returns:
+        Interface fluxes of shape (..., nx-1)
+    """
+    left, right = _interface_states(rho, states)
+    flux_left, flux_right = _interface_values(model.cell_flux, rho, quality, states)
+    bounds_left, bounds_right = _interface_values(model.wave_speed_bounds, rho, quality, states)
+    s_left = np.minimum(np.minimum(bounds_left[0], bounds_right[0]), 0)
+    s_right = np.maximum(np.maximum(bounds_left[1], bounds_right[1]), 0)
+
+    # Clamping the speeds at zero gives the upwind fluxes when the fan does
+    # not contain the interface; a degenerate fan (both zero) has zero flux
+    width = s_right - s_left
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fan = (s_right * flux_left - s_left * flux_right + s_left * s_right * (right - left)) / width
+    return np.where(width > 0, fan, 0.5 * (flux_left + flux_right))
+
+
+def engquist_osher_flux(model, rho, quality=None, dt_dx=None, states=None):
+    """
+    Engquist-Osher flux, F = F⁺(ρ_L) + F⁻(ρ_R).
+
+    For a unimodal flux the increasing part is the demand, F⁺ = D, and the
+    decreasing part is F⁻ = F - D, so F = D(ρ_L) + F(ρ_R) - D(ρ_R).
+
+    Args:
+        model: Model implementing the flux protocol
+        rho: Cell densities of shape (..., nx)
+        quality: Road quality coefficients of the cells, or None
+        dt_dx: Ratio of the time and space steps (h/km), unused
+        states: Reconstructed interface states (see godunov_flux()), or None
+
+    Returns:
+        Interface fluxes of shape (..., nx-1)
+    """
+    demand_left, demand_right = _interface_values(model.demand, rho, quality, states)
+    right = _interface_states(rho, states)[1]
+    flux_right = model.cell_flux(right, quality=_interface_quality(quality)[1])
+    return demand_left + (flux_right - demand_right)
+
+
+# Numerical fluxes by name
+FLUX_SCHEMES = {
+    'godunov': godunov_flux,
+    'ctm': ctm_flux,
+    'lax_friedrichs': lax_friedrichs_flux,
+    'rusanov': rusanov_flux,
+    'hll': hll_flux,
+    'engquist_osher': engquist_osher_flux
+}
+
+
+def get_flux_scheme(name):
+    """
+    Look up a numerical flux by name.
+
+    Args:
+        name: One of FLUX_SCHEMES
+
+    Returns:
+        Flux function (model, rho, quality=None, dt_dx=None, states=None)
+        -> interface fluxes
+
+    Raises:
+        ValueError: If the scheme is unknown
+    """
+    if name not in FLUX_SCHEMES:
+        raise ValueError(f"Unknown flux scheme {name!r}, expected one of {sorted(FLUX_SCHEMES)}")
+    return FLUX_SCHEMES[name]
 
 
 def cfl_condition(dt, dx, v_max):
     """
     Check the CFL condition for stability in the numerical scheme.
-    
+
     Args:
         dt: Time step (h)
         dx: Space step (km)
         v_max: Maximum speed (km/h)
-        
+
     Returns:
         bool: True if CFL condition is satisfied, False otherwise.
     """
@@ -39,71 +245,15 @@ def cfl_condition(dt, dx, v_max):
 def update_density(density, flux_left, flux_right, dt, dx):
     """
     Update the density using the conservative form of the traffic equations.
-    
+
     Args:
         density: Current density array (vehicles/km)
         flux_left: Flux from the left cell (vehicles/h)
         flux_right: Flux from the right cell (vehicles/h)
         dt: Time step (h)
         dx: Space step (km)
-        
+
     Returns:
         Updated density array (vehicles/km)
     """
     return density - dt / dx * (flux_right - flux_left)
-
-
-def godunov_flux_multiclass(rho_left, rho_right, model):
-    """
-    Calculate the numerical flux at the interface between two cells for the multiclass model
-    using Godunov's scheme.
-    
-    Args:
-        rho_left: Array of densities for each class in the left cell
-        rho_right: Array of densities for each class in the right cell
-        model: An instance of the multiclass traffic model
-        
-    Returns:
-        Array of numerical fluxes for each class at the interface
-    """
-    n_classes = len(rho_left)
-    flux = np.zeros(n_classes)
-    
-    # Calculate total densities
-    total_density_left = np.sum(rho_left)
-    total_density_right = np.sum(rho_right)
-    
-    # Find motorcycle densities (assumed to be class 0)
-    moto_density_left = rho_left[0]
-    moto_density_right = rho_right[0]
-    
-    # Update speeds based on the total densities and motorcycle densities
-    v_left = model.speed(rho_left, total_density_left, moto_density_left)
-    v_right = model.speed(rho_right, total_density_right, moto_density_right)
-    
-    # Calculate the flux for each class using Godunov's method
-    for i in range(n_classes):
-        # Calculate fluxes
-        q_left = rho_left[i] * v_left[i]
-        q_right = rho_right[i] * v_right[i]
-        
-        # Apply Godunov's scheme
-        if rho_left[i] <= rho_right[i]:
-            # Case 1: Increasing density
-            v_c = model.critical_velocity_for_class(i)
-            rho_c = model.critical_density_for_class(i)
-            
-            if rho_left[i] >= rho_c:
-                # Left state is congested
-                flux[i] = q_left
-            elif rho_right[i] <= rho_c:
-                # Right state is free flow
-                flux[i] = q_right
-            else:
-                # Critical state in between
-                flux[i] = model.max_flux_for_class(i)
-        else:
-            # Case 2: Decreasing density - take minimum flux
-            flux[i] = min(q_left, q_right)
-    
-    return flux
\ No newline at end of file
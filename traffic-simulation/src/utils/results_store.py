@@ -0,0 +1,172 @@
+"""
+Results Store
+
+This module writes simulation results straight to disk as memory-mapped .npy
+files, so that runs whose (nt, nx) output exceeds the available RAM can still
+be produced and analyzed. Each results directory holds one .npy file per field
+and a small JSON sidecar with the grids, the array layout and the parameters.
+"""
+
+import json
+import os
+import numpy as np
+
+# Name of the JSON sidecar describing a results directory
+SIDECAR_NAME = "results.json"
+
+
+def _to_json(value):
+    """Convert NumPy scalars and arrays for the JSON encoder."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class MemmapResultsWriter:
+    """
+    Writer for preallocated memory-mapped result arrays.
+
+    The solver fills the arrays frame by frame; the operating system pages
+    the data out to disk, so only the frames being written stay in memory.
+    """
+
+    def __init__(self, directory, grid_x, grid_t, fields, dtype=np.float64):
+        """
+        Create the result files.
+
+        Args:
+            directory: Directory receiving the .npy files and the sidecar
+            grid_x: Spatial grid (km)
+            grid_t: Output time grid (h)
+            fields: Dictionary mapping field names to full array shapes
+            dtype: Data type of the stored arrays
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.grid_x = np.asarray(grid_x)
+        self.grid_t = np.asarray(grid_t)
+        self.dtype = np.dtype(dtype)
+        self.arrays = {
+            name: np.lib.format.open_memmap(
+                os.path.join(directory, f"{name}.npy"), mode='w+', dtype=self.dtype, shape=shape
+            )
+            for name, shape in fields.items()
+        }
+
+    def finalize(self, parameters, detectors=None):
+        """
+        Flush the arrays and write the JSON sidecar.
+
+        Args:
+            parameters: Simulation parameters to record
+            detectors: Optional dictionary of detector time series, saved as
+                       regular .npy files next to the fields
+
+        Returns:
+            str: Path of the sidecar file
+        """
+        for array in self.arrays.values():
+            array.flush()
+
+        detector_files = {}
+        if detectors is not None:
+            for name, values in detectors.items():
+                filename = f"detectors_{name}.npy"
+                np.save(os.path.join(self.directory, filename), np.asarray(values))
+                detector_files[name] = filename
+
+        sidecar = {
+            'grid_x': self.grid_x,
+            'grid_t': self.grid_t,
+            'dtype': self.dtype.str,
+            'fields': {
+                name: {'file': f"{name}.npy", 'shape': list(array.shape)}
+                for name, array in self.arrays.items()
+            },
+            'detectors': detector_files,
+            'parameters': parameters
+        }
+        path = os.path.join(self.directory, SIDECAR_NAME)
+        with open(path, 'w') as f:
+            json.dump(sidecar, f, indent=2, default=_to_json)
+        return path
+
+
+def allocate_results(fields, output_dir=None, grid_x=None, grid_t=None, dtype=np.float64):
+    """
+    Allocate result arrays in memory or as memory maps on disk.
+    
+    Args:
+        fields: Dictionary mapping field names to full array shapes
+        output_dir: Directory for memory-mapped files, or None to keep the
+                    arrays in memory
+        grid_x: Spatial grid (km), recorded in the sidecar
+        grid_t: Output time grid (h), recorded in the sidecar
+        dtype: Data type of the arrays
+        
+    Returns:
+        tuple: (writer, arrays) where writer is None for in-memory arrays
+    """
+    if output_dir is None:
+        return None, {name: np.zeros(shape, dtype=dtype) for name, shape in fields.items()}
+    writer = MemmapResultsWriter(output_dir, grid_x, grid_t, fields, dtype)
+    return writer, writer.arrays
+
+
+def update_sidecar(directory, **entries):
+    """
+    Add or replace top-level entries of a results sidecar.
+
+    Args:
+        directory: Results directory
+        **entries: Entries to store (must be JSON serializable)
+    """
+    path = os.path.join(directory, SIDECAR_NAME)
+    with open(path) as f:
+        sidecar = json.load(f)
+    sidecar.update(entries)
+    with open(path, 'w') as f:
+        json.dump(sidecar, f, indent=2, default=_to_json)
+
+
+def open_results(directory, mode='r'):
+    """
+    Open a results directory lazily.
+
+    The fields are returned as read-only memory maps, so only the slices that
+    are actually accessed are read from disk.
+
+    Args:
+        directory: Results directory (or the path of its sidecar)
+        mode: Memory-map mode ('r' read-only, 'r+' read-write)
+
+    Returns:
+        dict: Results with memory-mapped fields, grids, parameters and any
+              metadata stored in the sidecar
+    """
+    if os.path.basename(directory) == SIDECAR_NAME:
+        directory = os.path.dirname(directory)
+
+    with open(os.path.join(directory, SIDECAR_NAME)) as f:
+        sidecar = json.load(f)
+
+    results = {
+        name: np.load(os.path.join(directory, info['file']), mmap_mode=mode)
+        for name, info in sidecar.pop('fields').items()
+    }
+    results['grid_x'] = np.asarray(sidecar.pop('grid_x'))
+    results['grid_t'] = np.asarray(sidecar.pop('grid_t'))
+    sidecar.pop('dtype', None)
+
+    detector_files = sidecar.pop('detectors', {})
+    if detector_files:
+        results['detectors'] = {
+            name: np.load(os.path.join(directory, filename))
+            for name, filename in detector_files.items()
+        }
+
+    results.update(sidecar)
+    results['results_dir'] = directory
+    return results
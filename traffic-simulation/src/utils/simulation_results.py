@@ -0,0 +1,110 @@
+"""
+Simulation Results
+
+This module provides the results container returned by the solvers. The
+solvers store only the densities; velocities and flows are functions of the
+density through the model's fundamental diagram, so they are derived when
+first requested instead of being filled at every output frame.
+"""
+
+import numpy as np
+
+
+def map_frames(func, array, frames, axis, out_axis=None):
+    """
+    Apply a per-frame function to selected output frames of a field.
+
+    The frames are moved to the front so that the function sees states of
+    the usual solver layout (..., nx) stacked along a leading axis, which
+    broadcasts against per-member or per-class parameter columns.
+
+    Args:
+        func: Function of a state (or a stack of states along axis 0)
+        array: Stored field with the output frames along the given axis
+        frames: Index or slice of the output frames
+        axis: Time axis of the stored field
+        out_axis: Time axis of the result (the same axis by default)
+
+    Returns:
+        Array of function values for the selected frames
+    """
+    if out_axis is None:
+        out_axis = axis
+    selected = array[(slice(None),) * axis + (frames,)]
+    if selected.ndim < array.ndim:
+        # A single frame: the state already has the solver layout
+        return func(selected)
+    return np.moveaxis(func(np.moveaxis(selected, axis, 0)), 0, out_axis)
+
+
+class SimulationResults(dict):
+    """
+    Results dictionary with lazily derived fields.
+
+    Stored fields and metadata are regular dictionary entries. Derived fields
+    are registered with a function computing them for a selection of output
+    frames: indexing the results computes the whole field once and caches it,
+    while field() evaluates only the requested frames, e.g. to plot a few
+    snapshots of a memory-mapped run without materializing the full array.
+    """
+
+    def __init__(self, data, derived=None, time_axes=None):
+        """
+        Initialize the results.
+
+        Args:
+            data: Dictionary of stored fields and metadata
+            derived: Dictionary mapping derived field names to functions
+                     frames -> array
+            time_axes: Dictionary giving the time axis of stored fields
+                       (0 when not listed)
+        """
+        super().__init__(data)
+        self.derived = dict(derived or {})
+        self.time_axes = dict(time_axes or {})
+
+    def __missing__(self, name):
+        if name not in self.derived:
+            raise KeyError(name)
+        value = self.derived[name](slice(None))
+        self[name] = value
+        return value
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or name in self.derived
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def copy(self):
+        return SimulationResults(self, self.derived, self.time_axes)
+
+    def field(self, name, frames=slice(None)):
+        """
+        Get selected output frames of a stored or derived field.
+
+        Derived fields that are not cached yet are computed for the selected
+        frames only and are not cached.
+
+        Args:
+            name: Field name
+            frames: Index or slice of the output frames
+
+        Returns:
+            Array with the selected frames
+        """
+        if dict.__contains__(self, name):
+            axis = self.time_axes.get(name, 0)
+            return self[name][(slice(None),) * axis + (frames,)]
+        if name in self.derived:
+            return self.derived[name](frames)
+        raise KeyError(name)
+
+    def is_cached(self, name):
+        """Check whether a field is stored or has already been derived."""
+        return dict.__contains__(self, name)
+
+    def clear_cache(self):
+        """Drop the cached derived fields to release their memory."""
+        for name in self.derived:
+            self.pop(name, None)
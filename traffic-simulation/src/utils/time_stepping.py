@@ -0,0 +1,383 @@
+"""
+Time Stepping
+
+This module provides the explicit time-marching driver shared by the traffic
+solvers. It advances a state with either a fixed CFL time step or an adaptive
+one recomputed from the current state, and delivers the state on an output
+time grid that is independent of the time step.
+"""
+
+import itertools
+import numpy as np
+
+# Number of stored frames when an adaptive run gets no output grid
+DEFAULT_OUTPUT_FRAMES = 101
+
+
+def save_interval_grid(simulation_time, save_interval):
+    """
+    Build the output time grid for a given save interval.
+
+    Args:
+        simulation_time: Total simulation time (h)
+        save_interval: Time between stored frames (h)
+
+    Returns:
+        Array of output times from 0 to simulation_time inclusive
+
+    Raises:
+        ValueError: If save_interval is not positive
+    """
+    if save_interval <= 0:
+        raise ValueError(f"save_interval must be positive, got {save_interval}")
+
+    n_intervals = int(np.floor(simulation_time / save_interval + 1e-9))
+    times = save_interval * np.arange(n_intervals + 1)
+    if simulation_time - times[-1] > 1e-9 * max(1.0, simulation_time):
+        times = np.append(times, simulation_time)
+    return times
+
+
+def validate_output_times(output_times):
+    """
+    Check an output time grid.
+
+    Args:
+        output_times: Times (h) of the frames
+
+    Returns:
+        Array of the output times
+
+    Raises:
+        ValueError: If the times are not a non-empty increasing 1D sequence of
+                    times >= 0
+    """
+    output_times = np.asarray(output_times, dtype=float)
+    if (output_times.ndim != 1 or output_times.size == 0
+            or np.any(np.diff(output_times) <= 0) or output_times[0] < 0):
+        raise ValueError("output_times must be a non-empty increasing 1D sequence of times >= 0")
+    return output_times
+
+
+def output_time_grid(simulation_time, dt, adaptive=False, output_times=None, save_interval=None):
+    """
+    Build the output time grid of a bounded run.
+
+    Args:
+        simulation_time: Total simulation time (h)
+        dt: Fixed time step (h), giving one frame per step when no grid is given
+        adaptive: Whether the run is adaptive (DEFAULT_OUTPUT_FRAMES evenly
+                  spaced frames when no grid is given)
+        output_times: Times (h) of the frames, or None
+        save_interval: Time (h) between frames, an alternative to output_times
+
+    Returns:
+        Array of output times
+
+    Raises:
+        ValueError: If the grid is invalid
+    """
+    if save_interval is not None and output_times is not None:
+        raise ValueError("Specify either output_times or save_interval, not both")
+    if save_interval is not None:
+        return save_interval_grid(simulation_time, save_interval)
+    if output_times is None:
+        if adaptive:
+            return np.linspace(0, simulation_time, DEFAULT_OUTPUT_FRAMES)
+        # Legacy grid: one frame per fixed step, labelled on an even grid
+        return np.linspace(0, simulation_time, int(simulation_time / dt) + 1)
+    output_times = validate_output_times(output_times)
+    if output_times[-1] > simulation_time * (1 + 1e-12):
+        raise ValueError("output_times must lie within [0, simulation_time]")
+    return output_times
+
+
+def unbounded_time_grid(dt, adaptive=False, output_times=None, save_interval=None):
+    """
+    Build the output times of an unbounded run.
+
+    Args:
+        dt: Fixed time step (h), giving one frame per step when no grid is given
+        adaptive: Whether the run is adaptive (which needs a grid)
+        output_times: Times (h) of the frames, or None
+        save_interval: Time (h) between frames, an alternative to output_times
+
+    Returns:
+        The output times: the given grid, or an endless iterator of times every
+        save_interval or every step
+
+    Raises:
+        ValueError: If the grid is invalid or missing for an adaptive run
+    """
+    if save_interval is not None and output_times is not None:
+        raise ValueError("Specify either output_times or save_interval, not both")
+    if output_times is not None:
+        return validate_output_times(output_times)
+    if save_interval is None and adaptive:
+        raise ValueError("An unbounded adaptive run requires save_interval or output_times")
+    step = dt if save_interval is None else save_interval
+    return (step * n for n in itertools.count())
+
+
+# Shu-Osher coefficients (a_k, b_k) of the strong-stability-preserving
+# Runge-Kutta methods, u^(k) = a_k u^n + b_k E(u^(k-1)) with E a forward Euler
+# step and u^(0) = u^n
+SSP_RK_COEFFICIENTS = {
+    'euler': ((0.0, 1.0),),
+    'ssp_rk2': ((0.0, 1.0), (0.5, 0.5)),
+    'ssp_rk3': ((0.0, 1.0), (0.75, 0.25), (1.0 / 3.0, 2.0 / 3.0))
+}
+
+
+def check_time_integration(time_integration):
+    """
+    Validate the name of a time integration method.
+
+    Args:
+        time_integration: One of SSP_RK_COEFFICIENTS
+
+    Raises:
+        ValueError: If the method is unknown
+    """
+    if time_integration not in SSP_RK_COEFFICIENTS:
+        raise ValueError(f"Unknown time integration {time_integration!r}, "
+                         f"expected one of {sorted(SSP_RK_COEFFICIENTS)}")
+
+
+def ssp_runge_kutta(euler_step, rho, time_integration='euler', out=None):
+    """
+    Advance a state by one SSP Runge-Kutta step built from forward Euler stages.
+
+    Each stage is a convex combination of the initial state and an Euler
+    step, so the scheme keeps the stability (TVD, positivity) of the Euler
+    step under the same CFL condition.
+
+    Args:
+        euler_step: Function (rho, out) -> rho + dt L(rho), writing into out
+                    when given (out may be rho itself)
+        rho: State at the beginning of the step
+        time_integration: One of SSP_RK_COEFFICIENTS
+        out: Optional output array (may be rho itself)
+
+    Returns:
+        Updated state
+    """
+    coefficients = SSP_RK_COEFFICIENTS[time_integration]
+    if len(coefficients) == 1:
+        return euler_step(rho, out)
+
+    stage = euler_step(rho, None)
+    for a, b in coefficients[1:]:
+        stage = euler_step(stage, stage)
+        stage *= b
+        stage += a * rho
+    if out is None:
+        return stage
+    out[...] = stage
+    return out
+
+
+def clocked_step(step):
+    """
+    Turn a time-dependent step into a step function for TimeIntegrator.
+
+    The returned function keeps its own clock, starting at t = 0 and moving
+    on by dt with every call, so each run needs a fresh one.
+
+    Args:
+        step: Function (rho, dt, t) -> rho advancing the state from time t
+
+    Returns:
+        Function (rho, dt) -> rho
+    """
+    t = 0.0
+
+    def advance(rho, dt):
+        nonlocal t
+        rho = step(rho, dt, t)
+        t += dt
+        return rho
+
+    return advance
+
+
+class VirtualDetectors:
+    """
+    Point detectors recording the state at every time step.
+
+    Each detector samples the grid cell nearest to its position, so the
+    recorded time series have the full temporal resolution of the solver
+    while storing only a few values per step.
+    """
+
+    def __init__(self, positions, grid_x):
+        """
+        Initialize the detectors.
+
+        Args:
+            positions: Detector positions (km)
+            grid_x: Spatial grid of the solver (km)
+        """
+        positions = np.atleast_1d(np.asarray(positions, dtype=float))
+        self.indices = np.abs(grid_x[None, :] - positions[:, None]).argmin(axis=1)
+        self.positions = grid_x[self.indices]
+        self.times = []
+        self.samples = []
+
+    def record(self, t, rho):
+        """
+        Record the state at the detector cells.
+
+        Args:
+            t: Current time (h)
+            rho: Current state, with space along the last axis
+        """
+        self.times.append(t)
+        self.samples.append(rho[..., self.indices].copy())
+
+    def time_series(self):
+        """
+        Stack the recorded samples.
+
+        Returns:
+            tuple: (times of shape (n_records,), samples of shape
+                   (n_records, ..., n_detectors))
+        """
+        return np.asarray(self.times), np.stack(self.samples)
+
+
+class TimeIntegrator:
+    """
+    Explicit time-marching driver for conservative finite volume solvers.
+
+    The solver supplies two callables: advance(rho, dt), which performs one
+    explicit step, and stable_dt(rho), which returns the CFL time step of a
+    state. Frames are produced on the output grid; in the fixed-step mode
+    without an explicit grid every step is an output frame, as before.
+
+    With simulation_time=None the horizon is unbounded: frames are produced
+    every save_interval (or every fixed step) for as long as they are consumed.
+    """
+
+    def __init__(self, advance, simulation_time, dt, stable_dt=None, adaptive=False,
+                 cfl_every=1, output_times=None, save_interval=None, observer=None):
+        """
+        Initialize the integrator.
+
+        Args:
+            advance: Function (rho, dt) -> rho performing one time step
+            simulation_time: Total simulation time (h), or None for an unbounded run
+            dt: Time step (h); the initial time step in adaptive mode
+            stable_dt: Function rho -> dt giving the CFL time step of a state
+                       (required in adaptive mode)
+            adaptive: Whether to recompute the time step from the current state
+            cfl_every: Recompute the adaptive time step every cfl_every steps
+            output_times: Times (h) at which frames are stored; if None, every
+                          step is stored in fixed mode and DEFAULT_OUTPUT_FRAMES
+                          evenly spaced frames are stored in adaptive mode
+            save_interval: Time (h) between stored frames, an alternative to
+                           output_times; the final time is always stored
+            observer: Function (t, rho) called with the initial state and after
+                      every time step, e.g. to record virtual detectors
+
+        Raises:
+            ValueError: If the parameters are inconsistent
+        """
+        if dt is None or dt <= 0:
+            raise ValueError(f"Time step must be positive, got {dt}")
+        if adaptive and stable_dt is None:
+            raise ValueError("Adaptive time stepping requires a stable_dt function")
+        if cfl_every < 1:
+            raise ValueError(f"cfl_every must be at least 1, got {cfl_every}")
+        if save_interval is not None and output_times is not None:
+            raise ValueError("Specify either output_times or save_interval, not both")
+
+        self.advance = advance
+        self.stable_dt = stable_dt
+        self.simulation_time = simulation_time
+        self.dt = dt
+        self.adaptive = adaptive
+        self.cfl_every = int(cfl_every)
+        self.save_interval = save_interval
+        self.observer = observer
+        self.bounded = simulation_time is not None and np.isfinite(simulation_time)
+
+        # Legacy grid: one frame per fixed step, labelled on an even grid
+        self.every_step = output_times is None and save_interval is None and not adaptive
+        if not self.bounded:
+            if output_times is None and save_interval is None and adaptive:
+                raise ValueError("An unbounded adaptive run requires save_interval or output_times")
+            self.output_times = None if output_times is None else validate_output_times(output_times)
+        else:
+            self.output_times = output_time_grid(simulation_time, dt, adaptive, output_times, save_interval)
+
+        # Step statistics, filled while running
+        self.n_steps = 0
+        self.dt_min = np.inf
+        self.dt_max = 0.0
+
+    def _output_time_iter(self):
+        """Iterate over the output times, generating them lazily if unbounded."""
+        if self.output_times is not None:
+            return iter(self.output_times)
+        return unbounded_time_grid(self.dt, save_interval=self.save_interval)
+
+    def _step(self, rho, dt):
+        """Advance by one step and record its size."""
+        self.n_steps += 1
+        self.dt_min = min(self.dt_min, dt)
+        self.dt_max = max(self.dt_max, dt)
+        rho = self.advance(rho, dt)
+        if self.observer is not None:
+            self.observer(self._t + dt, rho)
+        return rho
+
+    def run(self, rho):
+        """
+        March the state and yield it at each output time.
+
+        Args:
+            rho: Initial state (array)
+
+        Yields:
+            tuple: (index, t, rho) for each output frame
+        """
+        self._t = 0.0
+        if self.observer is not None:
+            self.observer(0.0, rho)
+
+        if self.every_step:
+            for n, t_out in enumerate(self._output_time_iter()):
+                if n > 0:
+                    rho = self._step(rho, self.dt)
+                    self._t = t_out
+                yield n, t_out, rho
+            return
+
+        dt = self.dt
+        for n, t_out in enumerate(self._output_time_iter()):
+            while t_out - self._t > 1e-12 * max(1.0, t_out):
+                if self.adaptive and self.n_steps % self.cfl_every == 0:
+                    dt = self.stable_dt(rho)
+
+                # Shorten the step to land exactly on the output time
+                if self._t + dt >= t_out:
+                    rho = self._step(rho, t_out - self._t)
+                    self._t = t_out
+                else:
+                    rho = self._step(rho, dt)
+                    self._t += dt
+            yield n, t_out, rho
+
+    def statistics(self):
+        """
+        Summarize the time steps taken so far.
+
+        Returns:
+            dict: Number of steps and smallest/largest time step (h)
+        """
+        return {
+            'n_steps': self.n_steps,
+            'dt_min': float(self.dt_min) if self.n_steps else float(self.dt),
+            'dt_max': float(self.dt_max) if self.n_steps else float(self.dt)
+        }
@@ -9,6 +9,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 
+from ..models.fundamental_diagram import FundamentalDiagram
+
 
 class FundamentalDiagramPlotter:
     """Class for creating and visualizing fundamental traffic diagrams."""
@@ -30,18 +32,55 @@ class FundamentalDiagramPlotter:
         self.critical_color = 'red'
         self.grid_alpha = 0.3
     
+    @staticmethod
+    def get_diagram(model):
+        """
+        Get the fundamental diagram behind a model.
+        
+        Args:
+            model: FundamentalDiagram instance, or a model with a
+                   fundamental_diagram attribute (e.g. LWRModel)
+            
+        Returns:
+            FundamentalDiagram, or None for models without one (e.g. multiclass)
+        """
+        if isinstance(model, FundamentalDiagram):
+            return model
+        return getattr(model, 'fundamental_diagram', None)
+    
+    def evaluate_diagram(self, diagram, densities):
+        """
+        Evaluate a fundamental diagram on all densities at once.
+        
+        Args:
+            diagram: FundamentalDiagram instance
+            densities: Array of densities (veh/km)
+            
+        Returns:
+            tuple: (velocities, flows, (critical density, velocity, flow))
+        """
+        critical_density = diagram.critical_density()
+        critical_point = (
+            critical_density,
+            float(diagram.speed(critical_density)),
+            float(diagram.flow(critical_density))
+        )
+        return diagram.speed(densities), diagram.flow(densities), critical_point
+    
     def plot_fundamental_diagrams(self, model, density_range=None, n_points=100, 
-                                 show=True, save=True, filename=None):
+                                 show=True, save=True, filename=None, show_demand_supply=False):
         """
         Plot the three fundamental diagrams (density-flow, density-velocity, flow-velocity).
         
         Args:
-            model: Traffic model instance
+            model: Traffic model instance, or a FundamentalDiagram
             density_range: Range of densities to plot (min, max)
             n_points: Number of points to use for plotting
             show: Whether to display the plots
             save: Whether to save the plots to file
             filename: Filename for saved plot (without extension)
+            show_demand_supply: Whether to add the demand and supply curves
+                                of the model's diagram to the flow plot
             
         Returns:
             Matplotlib figure
@@ -63,7 +102,14 @@ class FundamentalDiagramPlotter:
         
         # Calculate flows and velocities
         # Adjust calculation based on model type
-        if hasattr(model, 'get_velocity') and hasattr(model, 'get_flow'):
+        diagram = self.get_diagram(model)
+        critical_point = None
+        if diagram is not None:
+            # Fundamental diagrams are vectorized (tabulated ones interpolate
+            # their precomputed tables)
+            velocities, flows, critical_point = self.evaluate_diagram(diagram, densities)
+            critical_density = critical_point[0]
+        elif hasattr(model, 'get_velocity') and hasattr(model, 'get_flow'):
             # Standard LWR model
             velocities = np.array([model.get_velocity(rho) for rho in densities])
             flows = np.array([model.get_flow(rho) for rho in densities])
@@ -114,8 +160,11 @@ class FundamentalDiagramPlotter:
             critical_idx = np.argmax(flows)
             critical_density = densities[critical_idx]
         
-        critical_velocity = model.get_velocity(critical_density) if hasattr(model, 'get_velocity') else flows[critical_idx] / critical_density
-        critical_flow = model.get_flow(critical_density) if hasattr(model, 'get_flow') else flows[critical_idx]
+        if critical_point is not None:
+            _, critical_velocity, critical_flow = critical_point
+        else:
+            critical_velocity = model.get_velocity(critical_density) if hasattr(model, 'get_velocity') else flows[critical_idx] / critical_density
+            critical_flow = model.get_flow(critical_density) if hasattr(model, 'get_flow') else flows[critical_idx]
         
         # Create figure with three subplots
         fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(15, 5))
@@ -128,6 +177,10 @@ class FundamentalDiagramPlotter:
                     xytext=(10, 10),
                     textcoords='offset points',
                     color=self.critical_color)
+        if show_demand_supply and diagram is not None:
+            ax1.plot(densities, diagram.demand(densities), '--', linewidth=1.5, label='Demande')
+            ax1.plot(densities, diagram.supply(densities), ':', linewidth=1.5, label='Offre')
+            ax1.legend()
         
         ax1.set_xlabel('Densité (véh/km)')
         ax1.set_ylabel('Flux (véh/h)')
@@ -178,7 +231,7 @@ class FundamentalDiagramPlotter:
         Compare fundamental diagrams for multiple models.
         
         Args:
-            models_dict: Dictionary of {name: model} to compare
+            models_dict: Dictionary of {name: model or FundamentalDiagram} to compare
             density_range: Range of densities to plot (min, max)
             n_points: Number of points to use for plotting
             show: Whether to display the plots
@@ -215,7 +268,11 @@ class FundamentalDiagramPlotter:
             color = colors[i]
             
             # Calculate flows and velocities (similar to plot_fundamental_diagrams)
-            if hasattr(model, 'get_velocity') and hasattr(model, 'get_flow'):
+            diagram = self.get_diagram(model)
+            critical_point = None
+            if diagram is not None:
+                velocities, flows, critical_point = self.evaluate_diagram(diagram, densities)
+            elif hasattr(model, 'get_velocity') and hasattr(model, 'get_flow'):
                 velocities = np.array([model.get_velocity(rho) for rho in densities])
                 flows = np.array([model.get_flow(rho) for rho in densities])
             else:
@@ -252,10 +309,13 @@ class FundamentalDiagramPlotter:
                         velocities[j] = np.mean(result['velocity'][0])
             
             # Find critical point
-            critical_idx = np.argmax(flows)
-            critical_density = densities[critical_idx]
-            critical_flow = flows[critical_idx]
-            critical_velocity = velocities[critical_idx]
+            if critical_point is not None:
+                critical_density, critical_velocity, critical_flow = critical_point
+            else:
+                critical_idx = np.argmax(flows)
+                critical_density = densities[critical_idx]
+                critical_flow = flows[critical_idx]
+                critical_velocity = velocities[critical_idx]
             
             # Plot on each subplot
             ax1.plot(densities, flows, '-', linewidth=2, color=color, label=name)
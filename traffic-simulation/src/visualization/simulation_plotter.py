@@ -285,6 +285,74 @@ class SimulationPlotter:
         plt.tight_layout()
         return fig, ani
     
+    def plot_live_density(self, frames, grid_x, rho_max=None, every=1, title=None,
+                          show=True, save=True):
+        """
+        Render the density profile while a streamed simulation runs.
+        
+        Frames are consumed one at a time from a generator such as
+        iter_simulate() or BaseScenario.iter_run(), so the figure updates as the
+        solver advances and no result array is stored.
+        
+        Args:
+            frames: Iterable of (t, state) frames; multiclass states of shape
+                    (n_classes, nx) are summed into the total density
+            grid_x: Spatial grid points
+            rho_max: Upper limit of the density axis (None for automatic)
+            every: Redraw every this many frames
+            title: Plot title
+            show: Whether to refresh the figure on screen while streaming
+            save: Whether to save the final frame to file
+            
+        Returns:
+            tuple: (figure, last time, copy of the last density profile)
+        """
+        fig, ax = plt.subplots(figsize=(10, 6))
+        line, = ax.plot([], [], 'b-', lw=2)
+        text_time = ax.text(0.02, 0.95, '', transform=ax.transAxes)
+        
+        ax.set_xlim(grid_x[0], grid_x[-1])
+        if rho_max is not None:
+            ax.set_ylim(0, rho_max * 1.1)
+        ax.set_xlabel('Position (km)')
+        ax.set_ylabel('Densité (véh/km)')
+        ax.set_title(title if title else f"{self.model_name} - Densité en direct")
+        ax.grid(True, alpha=0.3)
+        
+        def draw(t, state):
+            density = state.sum(axis=0) if state.ndim == 2 else state
+            line.set_data(grid_x, density)
+            text_time.set_text(f'Temps: {t:.3f} h')
+            if rho_max is None:
+                ax.relim()
+                ax.autoscale_view(scalex=False)
+            if show and plt.isinteractive():
+                plt.pause(0.001)
+            return np.array(density)
+        
+        t, density, drawn = None, None, True
+        for n, (t, state) in enumerate(frames):
+            drawn = n % every == 0
+            if drawn:
+                density = draw(t, state)
+            else:
+                last_state = state
+        
+        # Always finish on the last frame
+        if not drawn:
+            density = draw(t, last_state)
+        
+        if save:
+            filename = title.replace(" ", "_").lower() if title else "live_density"
+            filepath = f'{self.output_dir}/{filename}.png'
+            plt.savefig(filepath, bbox_inches='tight', dpi=300)
+            print(f"Figure saved as {os.path.abspath(filepath)}")
+        
+        if not show:
+            plt.close()
+        
+        return fig, t, density
+    
     def plot_multiclass_comparison(self, class_densities, class_names, grid_x, time_idx, title=None, show=False, save=True):
         """
         Plot density profiles for multiple vehicle classes at a specific time.
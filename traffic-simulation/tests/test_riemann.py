@@ -0,0 +1,62 @@
+"""
+Convergence of LWRModel to the exact Riemann solutions.
+
+The Riemann scenarios are run on halving grids and compared with the exact
+Greenshields solutions of src/analysis/riemann.py at half their simulation
+time, or earlier when a wave reaches an end of the road before (see
+examples/riemann_validation.py for the full table).
+"""
+
+import sys
+import numpy as np
+import pytest
+from pathlib import Path
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.models.lwr_model import LWRModel
+from src.analysis.riemann import l1_errors, scenario_exact_solution, scenario_exit_time
+from scenarios.shock_wave import ShockWaveScenario
+from scenarios.rarefaction_wave import RarefactionWaveScenario
+from scenarios.traffic_jam import TrafficJamScenario
+
+GRID_STEPS = (0.1, 0.05, 0.025)
+
+# Riemann scenarios, the parameters making them sharp and the smallest
+# accepted order: shocks converge at first order, the young fans compared
+# before they leave the road at about 0.75-0.8
+SCENARIOS = [
+    (ShockWaveScenario, {}, 0.95),
+    (RarefactionWaveScenario, {}, 0.7),
+    (TrafficJamScenario, {'smooth_transition': False}, 0.7)
+]
+
+
+def riemann_error(scenario_class, params, dx):
+    """
+    L1 error / ρ_max (km) of a scenario run before its waves leave the road.
+
+    Args:
+        scenario_class: Riemann scenario class
+        params: Scenario parameters
+        dx: Spatial step (km)
+
+    Returns:
+        float: Relative L1 error
+    """
+    scenario = scenario_class(LWRModel())
+    horizon = min(0.5 * {**scenario.default_params, **params}['simulation_time'],
+                  scenario_exit_time(scenario, params))
+    results = scenario.run({**params, 'dx': dx, 'output_times': [0.0, horizon]})
+    exact = scenario_exact_solution(scenario, results['grid_x'], results['grid_t'])
+    return l1_errors(results['density'][-1], exact[-1], dx) / scenario.model.rho_max
+
+
+@pytest.mark.parametrize('scenario_class, params, min_order', SCENARIOS,
+                         ids=[s[0].__name__ for s in SCENARIOS])
+def test_first_order_convergence(scenario_class, params, min_order):
+    errors = np.array([riemann_error(scenario_class, params, dx) for dx in GRID_STEPS])
+    orders = np.log2(errors[:-1] / errors[1:])
+    assert np.all(errors < 0.1)
+    assert np.all(orders >= min_order), f"observed orders {orders}"